@@ -1,10 +1,16 @@
-from flask import Blueprint, jsonify, render_template
+from flask import Blueprint, jsonify, render_template, request
 from flask_cors import CORS
+from contextlib import contextmanager
+from threading import Lock, BoundedSemaphore
 import pandas as pd
 import os
 from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from rollups import MISSING_KEY
+from traffic_series import (SeriesError, parse_window, query_series, query_type_totals, series_response,
+                            series_cache)
 
 app = Blueprint('analytics', __name__)
 CORS(app)
@@ -14,6 +20,9 @@ DB_NAME = "traffic_analytics"
 DB_USER = "postgres"
 DB_PASSWORD = "123456"
 DB_HOST = "localhost"
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 8  # concurrent analytics requests; more wait for a free connection
+POOL_WAIT_TIMEOUT = 10  # seconds a request waits for a connection before failing with PoolError
 
 # Initialize vehicle types
 vehicle_types = ["Cars", "Trucks", "Motorcycles", "Buses", "Emergency"]
@@ -30,6 +39,42 @@ def get_db_connection():
     )
     return conn
 
+_pool = None
+_pool_lock = Lock()
+# getconn() raises as soon as the pool is exhausted, so requests queue here instead
+_pool_slots = BoundedSemaphore(POOL_MAX_CONNECTIONS)
+
+def get_pool():
+    """Shared connection pool, created on first use so the app starts without a database"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS,
+                                           dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST)
+        return _pool
+
+@contextmanager
+def pooled_cursor():
+    """RealDictCursor on a pooled connection; the pool rolls back the read
+    transaction on return, and broken connections are discarded, not reused.
+    Waits up to POOL_WAIT_TIMEOUT for a free connection."""
+    if not _pool_slots.acquire(timeout=POOL_WAIT_TIMEOUT):
+        raise PoolError(f"No analytics database connection free within {POOL_WAIT_TIMEOUT} seconds")
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
+        broken = False
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                yield cur
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            pool.putconn(conn, close=broken or conn.closed != 0)
+    finally:
+        _pool_slots.release()
+
 def init_analytics_database():
     """Ensure the database exists and has the required tables"""
     try:
@@ -69,19 +114,51 @@ def init_analytics_database():
 # Initialize database when module is loaded
 database_ready = init_analytics_database()
 
-def update_vehicle_counts():
+# Both read traffic_totals, the all-time rollup maintained by the traffic_data
+# writer (see rollups.py), so their cost does not grow with the history.
+# Samples without an action (the MISSING_KEY bucket) are in no cell, as
+# `action != 'Ambulance'` left out NULL actions when this read traffic_data.
+CONFUSION_MATRIX_QUERY = """
+    SELECT
+        COALESCE(SUM(samples) FILTER (WHERE action = 'Ambulance'), 0) AS "True Positive",
+        COALESCE(SUM(samples) FILTER (WHERE action = 'Ambulance' AND NOT priority), 0) AS "False Positive",
+        COALESCE(SUM(samples) FILTER (WHERE action NOT IN ('Ambulance', %(missing)s)), 0) AS "True Negative",
+        COALESCE(SUM(samples) FILTER (WHERE action NOT IN ('Ambulance', %(missing)s) AND priority), 0)
+            AS "False Negative"
+    FROM traffic_totals
+"""
+CONFUSION_MATRIX_LABELS = ("True Positive", "False Positive", "True Negative", "False Negative")
+
+def query_vehicle_types(cur):
+    """Rows per vehicle type in one GROUP BY; types with no rows count 0"""
+    cur.execute("""
+        SELECT vehicle_type, SUM(samples) AS count FROM traffic_totals
+        WHERE vehicle_type = ANY(%s)
+        GROUP BY vehicle_type
+    """, (vehicle_types,))
+    counts = dict.fromkeys(vehicle_types, 0)
+    counts.update({row['vehicle_type']: int(row['count']) for row in cur.fetchall()})
+    return counts
+
+def query_confusion_matrix(cur):
+    """All four confusion matrix cells in one query"""
+    cur.execute(CONFUSION_MATRIX_QUERY, {"missing": MISSING_KEY})
+    row = cur.fetchone()
+    return [{"name": label, "value": int(row[label])} for label in CONFUSION_MATRIX_LABELS]
+
+def format_processing_time(processing_ms):
+    """"50ms" as the page has always shown it, from the numeric column"""
+    return f"{float(processing_ms):g}ms" if processing_ms is not None else None
+
+def update_vehicle_counts(cur=None):
     """Update vehicle counts from database"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        for vehicle_type in vehicle_types:
-            cur.execute("SELECT COUNT(*) FROM traffic_data WHERE vehicle_type = %s", (vehicle_type,))
-            count = cur.fetchone()['count']
-            vehicle_counts[vehicle_type] = count
-            
-        cur.close()
-        conn.close()
+        if cur is None:
+            with pooled_cursor() as cur:
+                counts = query_vehicle_types(cur)
+        else:
+            counts = query_vehicle_types(cur)
+        vehicle_counts.update(counts)
     except Exception as e:
         print(f"Database error in update_vehicle_counts: {e}")
         # Fallback to default values if database connection fails
@@ -96,65 +173,39 @@ def index():
 def get_traffic_data():
     """Get traffic data from database"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Get last 20 records
-        cur.execute("""
-            SELECT * FROM traffic_data 
-            ORDER BY id DESC 
-            LIMIT 20
-        """)
-        traffic_data = cur.fetchall()
+        with pooled_cursor() as cur:
+            # Get last 20 records; walks traffic_data_created_at_idx backwards from the newest partition
+            cur.execute("""
+                SELECT * FROM traffic_data 
+                ORDER BY created_at DESC 
+                LIMIT 20
+            """)
+            traffic_data = cur.fetchall()
+
+            # Same queries as /api/vehicle-types and /api/confusion-matrix, on this connection
+            update_vehicle_counts(cur)
+            matrix_data = query_confusion_matrix(cur)
         
         formatted_data = []
         for item in traffic_data:
             formatted_item = {
-                "Time": item["time"],
+                "Time": item["created_at"].astimezone().strftime("%H:%M"),
                 "Lane1": item["lane1"],
                 "Lane2": item["lane2"],
                 "Lane3": item["lane3"],
                 "Lane4": item["lane4"],
                 "Count": item["count"],
-                "ProcessingTime": item["processing_time"],
+                "ProcessingTime": format_processing_time(item["processing_ms"]),
                 "VehicleType": item["vehicle_type"],
                 "VehicleCount": item["vehicle_count"],
                 "Precision": item["precision"],
                 "Recall": item["recall"],
                 "F1Score": item["f1_score"],
                 "Action": item["action"],
-                "Priority": item["priority"]
+                "Priority": "TRUE" if item["priority"] else "FALSE"
             }
             formatted_data.append(formatted_item)
         
-        # Update vehicle counts
-        update_vehicle_counts()
-        
-        # Calculate confusion matrix from latest data
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action = 'Ambulance'")
-        true_positive = cur.fetchone()['count']
-        
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action = 'Ambulance' AND priority != 'TRUE'")
-        false_positive = cur.fetchone()['count']
-        
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action != 'Ambulance'")
-        true_negative = cur.fetchone()['count']
-        
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action != 'Ambulance' AND priority = 'TRUE'")
-        false_negative = cur.fetchone()['count']
-        
-        cur.close()
-        conn.close()
-        
-        confusion_matrix = {
-            "True Positive": true_positive,
-            "False Positive": false_positive,
-            "True Negative": true_negative,
-            "False Negative": false_negative
-        }
-        
-        matrix_data = [{"name": k, "value": v} for k, v in confusion_matrix.items()]
-        
         current_time = datetime.now().strftime("%H:%M:%S")
         
         return jsonify({
@@ -172,6 +223,27 @@ def get_traffic_data():
             "currentTime": datetime.now().strftime("%H:%M:%S")
         })
 
+@app.route('/api/traffic-series')
+def get_traffic_series():
+    """Per-bucket lane averages/peaks and type totals: ?from=<ISO>&to=<ISO>&bucket=1m|5m|15m|1h|6h|1d"""
+    try:
+        start, end, bucket = parse_window(request.args.get('from'), request.args.get('to'),
+                                          request.args.get('bucket'))
+    except SeriesError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with pooled_cursor() as cur:
+            points = query_series(cur, start, end, bucket)
+            types = query_type_totals(cur, start, end)
+    except Exception as e:
+        print(f"Database error in get_traffic_series: {e}")
+        return jsonify({"error": "Traffic data is unavailable"}), 503
+    return jsonify(series_response(points, types, start, end, bucket))
+
+@app.route('/api/traffic-series/stats')
+def get_traffic_series_stats():
+    return jsonify(series_cache.get_stats())
+
 @app.route('/api/vehicle-types')
 def get_vehicle_types():
     """Get vehicle type distribution"""
@@ -185,36 +257,8 @@ def get_vehicle_types():
 def get_confusion_matrix():
     """Get confusion matrix data"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action = 'Ambulance'")
-        true_positive = cur.fetchone()['count']
-        
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action = 'Ambulance' AND priority != 'TRUE'")
-        false_positive = cur.fetchone()['count']
-        
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action != 'Ambulance'")
-        true_negative = cur.fetchone()['count']
-        
-        cur.execute("SELECT COUNT(*) FROM traffic_data WHERE action != 'Ambulance' AND priority = 'TRUE'")
-        false_negative = cur.fetchone()['count']
-        
-        cur.close()
-        conn.close()
-        
-        result = [
-            {"name": "True Positive", "value": true_positive},
-            {"name": "False Positive", "value": false_positive},
-            {"name": "True Negative", "value": true_negative},
-            {"name": "False Negative", "value": false_negative}
-        ]
-        return jsonify(result)
+        with pooled_cursor() as cur:
+            return jsonify(query_confusion_matrix(cur))
     except Exception as e:
         print(f"Database error in get_confusion_matrix: {e}")
-        return jsonify([
-            {"name": "True Positive", "value": 0},
-            {"name": "False Positive", "value": 0},
-            {"name": "True Negative", "value": 0},
-            {"name": "False Negative", "value": 0}
-        ])
+        return jsonify([{"name": label, "value": 0} for label in CONFUSION_MATRIX_LABELS])
@@ -1,10 +1,17 @@
-from flask import Flask, render_template, jsonify, Response
+from flask import Flask, render_template, jsonify, Response, request
 from threading import Thread, Lock
 import time
 import os
 from detection import generate_frames
-from vehicle_counter import start_vehicle_counting, stop_vehicle_counting, get_vehicle_counts, get_ambulance_status
-from datetime import datetime, timedelta
+from jpeg_encoder import stream_profile, stream_fps
+from state_snapshot import StateSnapshot, event_stream
+from db_writer import DbWriter
+from rollups import ROLLUP_TABLES, create_rollup_tables, backfill_rollups, update_rollups
+from traffic_series import invalidate_rows
+from traffic_schema import MAINTENANCE_INTERVAL, create_traffic_table, migrate_legacy_table, maintain_partitions
+from lane_pipeline import stop_pipelines
+from vehicle_counter import add_counts_listener, start_vehicle_counting, stop_vehicle_counting, get_vehicle_counts, get_ambulance_status, get_throughput, get_queue_lengths
+from datetime import datetime, timedelta, timezone
 import random
 import psycopg2
 from ana import app as analytics_blueprint
@@ -34,16 +41,16 @@ DB_USER = "postgres"
 DB_PASSWORD = "root"
 DB_HOST = "localhost"
 DATA_COLLECTION_INTERVAL = 4  # 4 seconds
+# No port specified - will use default PostgreSQL port
+DB_CONNECT_PARAMS = dict(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST)
+INTERSECTION_ID = os.environ.get("INTERSECTION_ID", "main")
+TRAFFIC_DATA_COLUMNS = ("intersection", "created_at", "lane1", "lane2", "lane3", "lane4", "count",
+                        "processing_ms", "vehicle_type", "vehicle_count", "precision", "recall",
+                        "f1_score", "action", "priority")
 
 def get_db_connection():
     """Create a database connection"""
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST
-        # No port specified - will use default PostgreSQL port
-    )
+    conn = psycopg2.connect(**DB_CONNECT_PARAMS)
     return conn
 
 def init_database():
@@ -79,27 +86,23 @@ def init_database():
         
         cur = conn.cursor()
         
-        # Create traffic_data table if it doesn't exist
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS traffic_data (
-                id SERIAL PRIMARY KEY,
-                time VARCHAR(50),
-                lane1 INTEGER,
-                lane2 INTEGER,
-                lane3 INTEGER,
-                lane4 INTEGER,
-                count INTEGER,
-                processing_time VARCHAR(50),
-                vehicle_type VARCHAR(50),
-                vehicle_count INTEGER,
-                precision FLOAT,
-                recall FLOAT,
-                f1_score FLOAT,
-                action VARCHAR(50),
-                priority VARCHAR(10),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Partitioned traffic_data (see traffic_schema.py); a table from before
+        # the migration is converted once, and its rollups rebuilt from it
+        migrated = migrate_legacy_table(cur, ROLLUP_TABLES)
+        if migrated is not None:
+            print(f"Migrated {migrated} traffic_data rows to the partitioned schema")
+        create_traffic_table(cur)
+
+        # Rollups read by the analytics page; built from existing history the first time
+        for table in create_rollup_tables(cur):
+            print(f"Lane peaks of {table} rebuilt from traffic_data")
+        if backfill_rollups(cur):
+            print("Traffic rollups built from existing traffic_data")
+
+        # After the backfill, so expired days are still counted in the rollups
+        dropped = maintain_partitions(cur)
+        if dropped:
+            print(f"Dropped expired traffic_data partitions: {', '.join(dropped)}")
         
         conn.commit()
         cur.close()
@@ -108,6 +111,23 @@ def init_database():
     except Exception as e:
         print(f"Database initialization error: {e}")
 
+def maintain_traffic_partitions():
+    """Create upcoming day partitions and drop expired ones, every MAINTENANCE_INTERVAL"""
+    while True:
+        time.sleep(MAINTENANCE_INTERVAL)
+        try:
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    dropped = maintain_partitions(cur)
+                conn.commit()
+            finally:
+                conn.close()
+            if dropped:
+                print(f"Dropped expired traffic_data partitions: {', '.join(dropped)}")
+        except Exception as e:
+            print(f"Error maintaining traffic_data partitions: {e}")
+
 def get_green_duration(vehicle_count):
     if vehicle_count < 10: return 3
     elif vehicle_count < 20: return 3
@@ -130,11 +150,9 @@ def handle_ambulance_emergency():
                 traffic_states[lane].update({"color": "red", "timer": 00, "remaining_red":00, "emergency": False})
     return emergency_lane
 
-def save_traffic_data(counts, processing_time="50ms"):
+def save_traffic_data(counts, processing_ms=50):
     """Save traffic data to PostgreSQL database"""
     try:
-        current_time = datetime.now().strftime("%H:%M")
-        
         # Get vehicle types and their counts from detection
         vehicle_types = ["Cars", "Trucks", "Motorcycles", "Buses", "Emergency"]
         
@@ -159,25 +177,19 @@ def save_traffic_data(counts, processing_time="50ms"):
         # Determine if ambulance is present for action and priority
         ambulance_status = get_ambulance_status()
         action = "Ambulance" if any(ambulance_status.values()) else "Normal"
-        priority = "TRUE" if any(ambulance_status.values()) else "FALSE"
+        priority = any(ambulance_status.values())
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Insert data into the database
-        cur.execute("""
-            INSERT INTO traffic_data 
-            (time, lane1, lane2, lane3, lane4, count, processing_time, 
-             vehicle_type, vehicle_count, precision, recall, f1_score, action, priority)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            current_time, 
+        # Queued for the background writer: the controller loop never waits on the database.
+        # created_at is the sample time, not the time its batch reaches the database
+        traffic_data_writer.submit((
+            INTERSECTION_ID,
+            datetime.now(timezone.utc),
             counts.get('1', 0), 
             counts.get('2', 0), 
             counts.get('3', 0), 
             counts.get('4', 0),
             sum(int(count) for count in counts.values()),
-            processing_time,
+            processing_ms,
             vehicle_type,
             max_count,  # Use the actual count for the selected vehicle type
             precision,
@@ -186,14 +198,38 @@ def save_traffic_data(counts, processing_time="50ms"):
             action,
             priority
         ))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        print(f"Traffic data saved to database at {current_time}")
     except Exception as e:
         print(f"Error saving traffic data to database: {e}")
 
+# Combined signal/count/ambulance state for /state and /state/events, rebuilt
+# on every controller tick and whenever the vehicle counter sees a change
+state_snapshot = StateSnapshot()
+# Bumped after each batch of rows is written, so the analytics page knows when to refetch
+traffic_data_snapshot = StateSnapshot("traffic-data")
+# Rollup tables for analytics are updated in the same transaction as each batch,
+# and the series cache forgets the buckets a committed batch lands in
+traffic_data_writer = DbWriter("traffic_data", TRAFFIC_DATA_COLUMNS, DB_CONNECT_PARAMS,
+                               after_insert=update_rollups, after_commit=invalidate_rows)
+traffic_data_writer.add_listener(lambda: traffic_data_snapshot.publish(
+    {"traffic_data": {"written": traffic_data_writer.get_stats()["written"]}}))
+publish_lock = Lock()
+
+def publish_state():
+    # Serialized so a slower caller cannot publish an older state over a newer one
+    with publish_lock:
+        with state_lock:
+            states = {str(lane): dict(state) for lane, state in traffic_states.items()}
+        state_snapshot.publish({
+            "traffic_states": states,
+            "vehicle_counts": get_vehicle_counts(),
+            "ambulance_status": get_ambulance_status()
+        })
+
+def controller_tick():
+    """One second of the signal controller"""
+    publish_state()
+    time.sleep(1)
+
 def update_traffic_lights():
     current_lane = 1
     yellow_duration = 3
@@ -216,7 +252,7 @@ def update_traffic_lights():
                 saved_lane = current_lane  # Save the interrupted lane
                 
             while True:
-                time.sleep(1)
+                controller_tick()
                 if not get_ambulance_status().get(str(emergency_lane), False):
                     break
                 with state_lock:
@@ -230,7 +266,7 @@ def update_traffic_lights():
                 traffic_states[emergency_lane].update({"color": "yellow", "timer": yellow_duration})
             
             for _ in range(yellow_duration):
-                time.sleep(1)
+                controller_tick()
                 with state_lock:
                     for lane in traffic_states:
                         if traffic_states[lane]["timer"] > 0:
@@ -304,7 +340,7 @@ def update_traffic_lights():
                     traffic_states[lane]["remaining_red"] = total_wait 
 
         for _ in range(green_duration):
-            time.sleep(1)
+            controller_tick()
             with state_lock:
                 for lane in traffic_states:
                     if traffic_states[lane]["timer"] > 0:
@@ -317,7 +353,7 @@ def update_traffic_lights():
             traffic_states[current_lane]["timer"] = yellow_duration
 
         for _ in range(yellow_duration):
-            time.sleep(1)
+            controller_tick()
             with state_lock:
                 for lane in traffic_states:
                     if traffic_states[lane]["timer"] > 0:
@@ -345,8 +381,12 @@ def update_traffic_lights():
 
         current_lane = (current_lane % 4) + 1
 
+publish_state()
+add_counts_listener(publish_state)
+traffic_data_writer.start()
 thread = Thread(target=update_traffic_lights, daemon=True)
 thread.start()
+Thread(target=maintain_traffic_partitions, daemon=True).start()
 
 @app.route('/')
 def index():
@@ -361,8 +401,12 @@ def video_feed(lane_id):
     if lane_id < 1 or lane_id > len(VIDEO_PATHS):
         return "Invalid lane ID", 400
         
+    # Optional ?width=640&quality=60&fps=5 for operators on a slow uplink
+    profile = stream_profile(request.args.get('width', type=int), request.args.get('quality', type=int))
+    max_fps = stream_fps(request.args.get('fps', type=float))
+
     video_path = VIDEO_PATHS[lane_id - 1]
-    return Response(generate_frames(video_path),
+    return Response(generate_frames(video_path, lane_id, *profile, max_fps),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/traffic_states')
@@ -370,6 +414,33 @@ def get_traffic_states():
     with state_lock:
         return jsonify(traffic_states)
 
+@app.route('/state')
+def get_state():
+    # Replaces polling /traffic_states, /vehicle_counts and /ambulance_status separately
+    status, body, etag = state_snapshot.response(request.headers.get('If-None-Match'),
+                                                 state_snapshot.parse_cursor(request.args.get('since')))
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def event_response(snapshot):
+    # EventSource resends the last id it saw when it reconnects
+    since = snapshot.parse_cursor(request.headers.get('Last-Event-ID'))
+    response = Response(event_stream(snapshot, since), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/state/events')
+def state_events():
+    # Pushes /state deltas as they happen instead of being polled
+    return event_response(state_snapshot)
+
+@app.route('/api/traffic-data/events')
+def traffic_data_events():
+    return event_response(traffic_data_snapshot)
+
 @app.route('/vehicle_counts')
 def get_vehicle_counts_route():
     return jsonify(get_vehicle_counts())
@@ -378,6 +449,28 @@ def get_vehicle_counts_route():
 def get_ambulance_status_route():
     return jsonify(get_ambulance_status())
 
+@app.route('/throughput')
+def get_throughput_route():
+    return jsonify({
+        "throughput": get_throughput(),
+        "queue_lengths": get_queue_lengths()
+    })
+
+@app.route('/inference_stats')
+def get_inference_stats_route():
+    from inference_scheduler import scheduler
+    from lane_pipeline import get_pipelines
+    from mjpeg import get_broadcasters
+    return jsonify({
+        "scheduler": scheduler.get_stats(),
+        "lanes": {str(lane): pipeline.get_stats() for lane, pipeline in get_pipelines().items()},
+        "streams": {str(lane): broadcaster.get_stats() for lane, broadcaster in get_broadcasters().items()}
+    })
+
+@app.route('/db_writer_stats')
+def db_writer_stats():
+    return jsonify(traffic_data_writer.get_stats())
+
 @app.route('/analytics')
 def analytics():
     return render_template('ana.html')
@@ -401,14 +494,23 @@ def validate_videos():
         return False
     return True
 
-# Add this route to your app.py
 @app.route('/switch_model/<model_type>')
 def switch_model(model_type):
-    if model_type not in ["custom", "pretrained"]:
+    from model_registry import model_registry, MODEL_TYPES
+    if model_type not in MODEL_TYPES:
         return jsonify({"error": "Invalid model type. Use 'custom' or 'pretrained'"}), 400
     
-    set_model(model_type)
-    return jsonify({"success": f"Switched to {model_type} model"})
+    try:
+        report = model_registry.switch(model_type)
+    except Exception as e:
+        print(f"Error switching to {model_type} model: {e}")
+        return jsonify({"error": f"Could not switch to {model_type} model: {e}"}), 500
+    return jsonify({"success": f"Switched to {model_type} model", **report})
+
+@app.route('/model_status')
+def model_status():
+    from model_registry import model_registry
+    return jsonify(model_registry.get_status())
 
 if __name__ == "__main__":
     # Initialize database before starting the app
@@ -423,4 +525,6 @@ if __name__ == "__main__":
         try:
             app.run(debug=True)
         finally:
-            stop_vehicle_counting()
\ No newline at end of file
+            stop_vehicle_counting()
+            stop_pipelines()
+            traffic_data_writer.close()
\ No newline at end of file
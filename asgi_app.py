@@ -0,0 +1,180 @@
+"""ASGI serving mode: MJPEG streams and status JSON on one asyncio event loop.
+
+    python asgi_app.py            # or: uvicorn asgi_app:app --port 5000
+
+Each `/video_feed` viewer is an async generator fed by the lane's
+MjpegBroadcaster, so an open stream costs a coroutine instead of an OS
+thread, and the polled status endpoints answer from memory without leaving
+the loop (/state is served from a snapshot built once per controller
+tick, and /state/events pushes its deltas as Server-Sent Events). Every
+other route (pages, analytics API, model switching) is the unchanged Flask
+app, mounted behind a2wsgi's WSGIMiddleware. There is no debug reloader, so
+the model is only loaded once.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from app import (app as flask_app, VIDEO_PATHS, traffic_states, state_lock, state_snapshot,
+                 traffic_data_snapshot, traffic_data_writer, init_database, validate_videos)
+from jpeg_encoder import stream_profile, stream_fps
+from lane_pipeline import stop_pipelines
+from mjpeg import get_broadcaster
+from state_snapshot import KEEPALIVE, KEEPALIVE_INTERVAL
+from vehicle_counter import (start_vehicle_counting, stop_vehicle_counting, get_vehicle_counts,
+                             get_ambulance_status, get_throughput, get_queue_lengths)
+
+STREAM_TIMEOUT = 5  # seconds a viewer waits for a chunk before checking again
+
+class LoopNotifier:
+    """Wakes the coroutines waiting on a producer thread: a lane's broadcaster
+    when it has new chunks, or a state snapshot when it has a new version.
+
+    The producer thread calls `publish()`; waiters await the future from
+    `next()`, taken *before* they look for new data so none can be missed.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+
+    def publish(self):
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        future, self.future = self.future, self.loop.create_future()
+        future.set_result(None)
+
+    def next(self):
+        return self.future
+
+_notifiers = {}
+
+def _notifier(key, producer):
+    # Only called on the event loop thread
+    notifier = _notifiers.get(key)
+    if notifier is None:
+        notifier = _notifiers[key] = LoopNotifier(asyncio.get_running_loop())
+        producer.add_listener(notifier.publish)
+    return notifier
+
+def _query(request, name, convert):
+    try:
+        return convert(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+async def stream_chunks(broadcaster, notifier, profile, max_fps):
+    # Subscribed on the first iteration, so a client gone before the body starts leaves nothing behind
+    token = broadcaster.subscribe(*profile, max_fps)
+    try:
+        while True:
+            delay = broadcaster.time_until_due(token)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            update = notifier.next()
+            chunk = broadcaster.take_chunk(token)
+            if chunk is None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(update), STREAM_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            yield chunk
+    finally:
+        broadcaster.unsubscribe(token)
+
+async def video_feed(request):
+    lane_id = request.path_params['lane_id']
+    if lane_id < 1 or lane_id > len(VIDEO_PATHS):
+        return PlainTextResponse("Invalid lane ID", status_code=400)
+
+    profile = stream_profile(_query(request, 'width', int), _query(request, 'quality', int))
+    max_fps = stream_fps(_query(request, 'fps', float))
+    broadcaster = get_broadcaster(lane_id, VIDEO_PATHS[lane_id - 1])
+    notifier = _notifier(lane_id, broadcaster)
+    return StreamingResponse(stream_chunks(broadcaster, notifier, profile, max_fps),
+                             media_type='multipart/x-mixed-replace; boundary=frame')
+
+async def get_state(request):
+    status, body, etag = state_snapshot.response(request.headers.get('if-none-match'),
+                                                 state_snapshot.parse_cursor(request.query_params.get('since')))
+    return Response(body, status_code=status, media_type='application/json',
+                    headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+async def stream_events(snapshot, notifier, since):
+    # Same framing as state_snapshot.event_stream(), without a thread per client
+    while True:
+        update = notifier.next()
+        since, message = snapshot.event(since)
+        if message is not None:
+            yield message
+            continue
+        try:
+            await asyncio.wait_for(asyncio.shield(update), KEEPALIVE_INTERVAL)
+        except asyncio.TimeoutError:
+            yield KEEPALIVE
+
+def event_response(request, snapshot):
+    notifier = _notifier(snapshot.event_name, snapshot)
+    since = snapshot.parse_cursor(request.headers.get('last-event-id'))
+    return StreamingResponse(stream_events(snapshot, notifier, since), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+async def state_events(request):
+    return event_response(request, state_snapshot)
+
+async def traffic_data_events(request):
+    return event_response(request, traffic_data_snapshot)
+
+async def get_traffic_states(request):
+    with state_lock:
+        return JSONResponse(traffic_states)
+
+async def get_vehicle_counts_route(request):
+    return JSONResponse(get_vehicle_counts())
+
+async def get_ambulance_status_route(request):
+    return JSONResponse(get_ambulance_status())
+
+async def get_throughput_route(request):
+    return JSONResponse({
+        "throughput": get_throughput(),
+        "queue_lengths": get_queue_lengths()
+    })
+
+@asynccontextmanager
+async def lifespan(app):
+    init_database()
+    counting = validate_videos()
+    if counting:
+        start_vehicle_counting(VIDEO_PATHS)
+    try:
+        yield
+    finally:
+        if counting:
+            stop_vehicle_counting()
+        stop_pipelines()
+        traffic_data_writer.close()
+
+app = Starlette(
+    routes=[
+        Route('/video_feed/{lane_id:int}', video_feed),
+        Route('/state', get_state),
+        Route('/state/events', state_events),
+        Route('/api/traffic-data/events', traffic_data_events),
+        Route('/traffic_states', get_traffic_states),
+        Route('/vehicle_counts', get_vehicle_counts_route),
+        Route('/ambulance_status', get_ambulance_status_route),
+        Route('/throughput', get_throughput_route),
+        Mount('/', app=WSGIMiddleware(flask_app))
+    ],
+    lifespan=lifespan
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("HOST", "127.0.0.1"), port=int(os.environ.get("PORT", 5000)))
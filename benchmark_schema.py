@@ -0,0 +1,151 @@
+"""Compare time-range queries on the legacy and the partitioned traffic_data schema.
+
+    python benchmark_schema.py --days 30 --repeat 5
+
+Both tables are built in a scratch schema (dropped afterwards unless --keep)
+of the app's database and filled with one sample every 4 s, the app's
+DATA_COLLECTION_INTERVAL, i.e. 21,600 rows per day. The legacy table is the
+original unpartitioned layout with only its primary key; the new one is
+traffic_schema.create_traffic_table() with a partition per day. Each query
+is run --repeat times through EXPLAIN ANALYZE and the median execution
+time is printed per schema.
+"""
+import argparse
+import json
+import statistics
+from datetime import timedelta
+import psycopg2
+from traffic_schema import create_traffic_table, ensure_partitions, today_utc
+
+SCHEMA = "traffic_schema_benchmark"
+SAMPLE_INTERVAL = "4 seconds"
+
+LEGACY_TABLE = """
+    CREATE TABLE traffic_data_legacy (
+        id SERIAL PRIMARY KEY,
+        time VARCHAR(50),
+        lane1 INTEGER,
+        lane2 INTEGER,
+        lane3 INTEGER,
+        lane4 INTEGER,
+        count INTEGER,
+        processing_time VARCHAR(50),
+        vehicle_type VARCHAR(50),
+        vehicle_count INTEGER,
+        precision FLOAT,
+        recall FLOAT,
+        f1_score FLOAT,
+        action VARCHAR(50),
+        priority VARCHAR(10),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# (label, legacy query, partitioned query); %(end)s is the newest sample time
+QUERIES = [
+    ("latest 20 rows",
+     "SELECT * FROM traffic_data_legacy ORDER BY id DESC LIMIT 20",
+     "SELECT * FROM traffic_data ORDER BY created_at DESC LIMIT 20"),
+    ("last hour",
+     "SELECT COUNT(*), AVG(count) FROM traffic_data_legacy WHERE created_at >= %(end)s::timestamp - interval '1 hour'",
+     "SELECT COUNT(*), AVG(count) FROM traffic_data WHERE created_at >= %(end)s - interval '1 hour'"),
+    ("one hour, a week ago",
+     """SELECT COUNT(*), AVG(count) FROM traffic_data_legacy
+        WHERE created_at >= %(end)s::timestamp - interval '7 days 1 hour'
+          AND created_at < %(end)s::timestamp - interval '7 days'""",
+     """SELECT COUNT(*), AVG(count) FROM traffic_data
+        WHERE created_at >= %(end)s - interval '7 days 1 hour' AND created_at < %(end)s - interval '7 days'"""),
+    ("one full day",
+     "SELECT COUNT(*), SUM(count) FROM traffic_data_legacy WHERE created_at >= %(end)s::timestamp - interval '1 day'",
+     "SELECT COUNT(*), SUM(count) FROM traffic_data WHERE created_at >= %(end)s - interval '1 day'"),
+]
+
+def fill(cur, days):
+    """Both tables get the same generated samples, ending now"""
+    cur.execute(LEGACY_TABLE)
+    create_traffic_table(cur)
+    today = today_utc()
+    ensure_partitions(cur, today - timedelta(days=days), today)
+    cur.execute(f"""
+        CREATE TEMP TABLE samples AS
+        SELECT ts, (random() * 20)::int AS lane1, (random() * 20)::int AS lane2,
+               (random() * 20)::int AS lane3, (random() * 20)::int AS lane4,
+               (ARRAY['Cars', 'Trucks', 'Motorcycles', 'Buses', 'Emergency'])[1 + (random() * 4)::int] AS vehicle_type,
+               random() < 0.02 AS ambulance
+        FROM generate_series(now() - interval '{int(days)} days', now(), interval '{SAMPLE_INTERVAL}') AS ts
+    """)
+    cur.execute("""
+        INSERT INTO traffic_data_legacy
+            (time, lane1, lane2, lane3, lane4, count, processing_time, vehicle_type, vehicle_count,
+             precision, recall, f1_score, action, priority, created_at)
+        SELECT to_char(ts, 'HH24:MI'), lane1, lane2, lane3, lane4, lane1 + lane2 + lane3 + lane4, '50ms',
+               vehicle_type, 1, 95, 95, 95, CASE WHEN ambulance THEN 'Ambulance' ELSE 'Normal' END,
+               CASE WHEN ambulance THEN 'TRUE' ELSE 'FALSE' END, ts::timestamp
+        FROM samples ORDER BY ts
+    """)
+    cur.execute("""
+        INSERT INTO traffic_data
+            (created_at, lane1, lane2, lane3, lane4, count, processing_ms, vehicle_type, vehicle_count,
+             precision, recall, f1_score, action, priority)
+        SELECT ts, lane1, lane2, lane3, lane4, lane1 + lane2 + lane3 + lane4, 50, vehicle_type, 1,
+               95, 95, 95, CASE WHEN ambulance THEN 'Ambulance' ELSE 'Normal' END, ambulance
+        FROM samples ORDER BY ts
+    """)
+    cur.execute("SELECT COUNT(*), MAX(ts) FROM samples")
+    rows, end = cur.fetchone()
+    cur.execute("ANALYZE traffic_data_legacy")
+    cur.execute("ANALYZE traffic_data")
+    return rows, end
+
+def execution_ms(cur, query, params):
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, params)
+    return cur.fetchone()[0][0]["Execution Time"]
+
+def run(conn, days, repeat):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        cur.execute(f"SET search_path TO {SCHEMA}")
+        rows, end = fill(cur, days)
+        conn.commit()
+
+        results = []
+        for label, legacy_query, query in QUERIES:
+            params = {"end": end}
+            legacy = [execution_ms(cur, legacy_query, params) for _ in range(repeat)]
+            partitioned = [execution_ms(cur, query, params) for _ in range(repeat)]
+            results.append({
+                "query": label,
+                "legacy_ms": round(statistics.median(legacy), 2),
+                "partitioned_ms": round(statistics.median(partitioned), 2)
+            })
+    return rows, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark traffic_data range queries, legacy vs partitioned")
+    # Same defaults as app.py, which is not imported because that would start the controller
+    parser.add_argument("--dbname", default="vehicle_db")
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--password", default="root")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema for inspection")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(dbname=args.dbname, user=args.user, password=args.password, host=args.host)
+    try:
+        rows, results = run(conn, args.days, args.repeat)
+        print(f"{rows} rows per table over {args.days} days")
+        for result in results:
+            speedup = result["legacy_ms"] / max(result["partitioned_ms"], 0.001)
+            print(f"{result['query']:>22}: legacy {result['legacy_ms']:9.2f} ms | "
+                  f"partitioned {result['partitioned_ms']:8.2f} ms | x{speedup:.1f}")
+        print(json.dumps(results))
+    finally:
+        if not args.keep:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
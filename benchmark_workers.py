@@ -0,0 +1,68 @@
+"""Measure scheduler throughput for different numbers of inference worker processes.
+
+    python benchmark_workers.py --workers 0 1 2 4 --seconds 30
+
+Every run starts a fresh InferenceScheduler and has one thread per lane
+submit lane video frames as fast as results come back, like the lane
+pipelines do. 0 workers is the in-process mode. Frames per second and the
+mean and p95 request latency are printed for each worker count.
+"""
+import argparse
+import time
+from threading import Thread
+import numpy as np
+from inference_scheduler import InferenceScheduler
+from quantize_model import sample_frames
+
+def run(workers, frames, lanes, seconds):
+    scheduler = InferenceScheduler(adaptive_imgsz=False, workers=workers)
+    latencies = [[] for _ in range(lanes)]
+    for lane_id in range(lanes):
+        scheduler.register_lane(lane_id)
+    # Start timing once every worker has loaded its model
+    while scheduler.get_stats()["workers_ready"] < workers:
+        time.sleep(0.1)
+    scheduler.infer(0, frames[0])
+
+    deadline = time.time() + seconds
+
+    def submit(lane_id):
+        index = lane_id
+        while time.time() < deadline:
+            start_time = time.perf_counter()
+            scheduler.infer(lane_id, frames[index % len(frames)])
+            latencies[lane_id].append((time.perf_counter() - start_time) * 1000)
+            index += lanes
+
+    threads = [Thread(target=submit, args=(lane_id,)) for lane_id in range(lanes)]
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start_time
+    for lane_id in range(lanes):
+        scheduler.unregister_lane(lane_id)
+    scheduler.close()
+
+    latencies = np.concatenate([np.array(lane, dtype=np.float64) for lane in latencies])
+    return {
+        "workers": workers,
+        "frames": len(latencies),
+        "fps": round(len(latencies) / elapsed, 2),
+        "latency_ms": round(float(latencies.mean()), 2) if len(latencies) else 0.0,
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 2) if len(latencies) else 0.0
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark inference throughput against worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--lanes", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--frames", type=int, default=32)
+    args = parser.parse_args()
+
+    frames = sample_frames(args.frames)
+    for workers in args.workers:
+        report = run(workers, frames, args.lanes, args.seconds)
+        print(", ".join(f"{key}: {value}" for key, value in report.items()))
@@ -0,0 +1,248 @@
+from collections import deque
+from datetime import datetime
+from threading import Thread, Condition
+import json
+import os
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+BATCH_SIZE = int(os.environ.get("DB_BATCH_SIZE", 100))
+FLUSH_INTERVAL = float(os.environ.get("DB_FLUSH_INTERVAL", 10))  # seconds a sample may wait for its batch
+MAX_QUEUE = int(os.environ.get("DB_MAX_QUEUE", 10000))  # rows held in memory; the oldest are dropped beyond this
+SPILL_PATH = os.environ.get("DB_SPILL_PATH", "traffic_data.spill.jsonl")
+MAX_SPILL_BYTES = 50 * 1024 * 1024
+RETRY_INTERVAL = 5  # seconds between reconnection attempts while the database is down
+
+class DbWriter:
+    """Write-behind queue for one table.
+
+    `submit()` only appends to an in-memory queue, so callers such as the
+    signal controller never wait on the database. A single thread flushes
+    the queue through a small connection pool with one multi-row INSERT
+    (`execute_values`) per batch, either when BATCH_SIZE rows are waiting
+    or FLUSH_INTERVAL after the oldest one arrived. While the database is
+    unreachable, batches are appended to a JSON-lines spill file and
+    replayed, oldest first, once it is back. The queue is bounded by
+    MAX_QUEUE and the spill file by MAX_SPILL_BYTES; rows beyond either
+    are dropped and counted.
+
+    `after_insert(cur, columns, rows)`, if given, runs in the same
+    transaction as each batch's INSERT (used to maintain rollup tables).
+    `after_commit(columns, rows)` runs once the batch is committed, for
+    spilled rows replayed later too (used to drop cached aggregates).
+    """
+
+    def __init__(self, table, columns, connect_params, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_queue=MAX_QUEUE, spill_path=SPILL_PATH, max_spill_bytes=MAX_SPILL_BYTES, after_insert=None,
+                 after_commit=None):
+        self.table = table
+        self.columns = tuple(columns)
+        self.connect_params = connect_params
+        self.after_insert = after_insert
+        self.after_commit = after_commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_path = spill_path
+        self.max_spill_bytes = max_spill_bytes
+        self.condition = Condition()
+        self.queue = deque()
+        self.pool = None
+        self.listeners = []
+        self.running = False
+        self.thread = None
+        self.retry_time = 0
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "max_queued": 0,
+            "last_batch_ms": 0.0,
+            "last_error": None
+        }
+
+    def add_listener(self, callback):
+        """Call `callback()` from the writer thread after each batch is committed"""
+        with self.condition:
+            self.listeners.append(callback)
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def submit(self, row):
+        """Queue one row (a tuple in `columns` order); never blocks on I/O"""
+        with self.condition:
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.stats["dropped"] += 1
+            self.queue.append((time.time(), tuple(row)))
+            self.stats["submitted"] += 1
+            self.stats["max_queued"] = max(self.stats["max_queued"], len(self.queue))
+            # An idle writer waits without a deadline; the first row gives it one
+            if len(self.queue) == 1 or len(self.queue) >= self.batch_size:
+                self.condition.notify_all()
+
+    def close(self, timeout=10):
+        """Stop the writer thread after a last flush (spilling if the database is down)"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        if self.pool is not None:
+            self.pool.closeall()
+            self.pool = None
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats["queued"] = len(self.queue)
+            stats["oldest_queued_s"] = round(time.time() - self.queue[0][0], 1) if self.queue else 0
+        stats["max_queue"] = self.max_queue
+        stats["database_available"] = self.pool is not None
+        stats["spill_bytes"] = self._spill_size()
+        return stats
+
+    def _next_batch(self):
+        # Waits until a batch is due; None once closed and drained
+        with self.condition:
+            while True:
+                if self.queue:
+                    due = self.queue[0][0] + self.flush_interval
+                    if len(self.queue) >= self.batch_size or time.time() >= due or not self.running:
+                        count = min(len(self.queue), self.batch_size)
+                        return [self.queue.popleft()[1] for _ in range(count)]
+                    self.condition.wait(due - time.time())
+                elif not self.running:
+                    return None
+                else:
+                    self.condition.wait()
+
+    def _run(self):
+        while True:
+            rows = self._next_batch()
+            if rows is None:
+                break
+            if self._connect() and self._replay_spill() and self._write(rows):
+                continue
+            self._spill(rows)
+
+    def _connect(self):
+        if self.pool is not None:
+            return True
+        if time.time() < self.retry_time:
+            return False
+        try:
+            self.pool = ThreadedConnectionPool(1, 2, **self.connect_params)
+            return True
+        except psycopg2.Error as e:
+            self._failed(e)
+            return False
+
+    def _failed(self, error):
+        print(f"Error writing to {self.table}: {error}")
+        with self.condition:
+            self.stats["last_error"] = str(error).strip()
+        self.retry_time = time.time() + RETRY_INTERVAL
+        if self.pool is not None:
+            self.pool.closeall()
+            self.pool = None
+
+    def _insert(self, rows):
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                execute_values(cur, f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES %s",
+                               rows, page_size=self.batch_size)
+                if self.after_insert is not None:
+                    self.after_insert(cur, self.columns, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+    def _write(self, rows):
+        """False if the database could not be reached; rows it rejected are dropped, not retried"""
+        start_time = time.perf_counter()
+        try:
+            self._insert(rows)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            with self.condition:
+                self.stats["failed_batches"] += 1
+            self._failed(e)
+            return False
+        except psycopg2.Error as e:
+            print(f"Error writing to {self.table}, dropping {len(rows)} rows: {e}")
+            with self.condition:
+                self.stats["failed_batches"] += 1
+                self.stats["dropped"] += len(rows)
+                self.stats["last_error"] = str(e).strip()
+            return True
+        with self.condition:
+            self.stats["written"] += len(rows)
+            self.stats["batches"] += 1
+            self.stats["last_batch_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+            listeners = list(self.listeners)
+        if self.after_commit is not None:
+            try:
+                self.after_commit(self.columns, rows)
+            except Exception as e:
+                # The rows are written; a failing hook must not stop the writer
+                print(f"Error in {self.table} after_commit hook: {e}")
+        for listener in listeners:
+            listener()
+        return True
+
+    def _spill_size(self):
+        try:
+            return os.path.getsize(self.spill_path)
+        except OSError:
+            return 0
+
+    def _spill(self, rows):
+        if self._spill_size() >= self.max_spill_bytes:
+            with self.condition:
+                self.stats["dropped"] += len(rows)
+            return
+        try:
+            with open(self.spill_path, "a") as spill:
+                for row in rows:
+                    spill.write(json.dumps([value.isoformat() if isinstance(value, datetime) else value
+                                            for value in row]) + "\n")
+        except OSError as e:
+            print(f"Error spilling {self.table} rows to {self.spill_path}: {e}")
+            with self.condition:
+                self.stats["dropped"] += len(rows)
+            return
+        with self.condition:
+            self.stats["spilled"] += len(rows)
+
+    def _replay_spill(self):
+        """Write spilled rows back before anything newer; False if the database failed again"""
+        if not self._spill_size():
+            return True
+        with open(self.spill_path) as spill:
+            rows = [tuple(json.loads(line)) for line in spill if line.strip()]
+        for start in range(0, len(rows), self.batch_size):
+            if not self._write(rows[start:start + self.batch_size]):
+                # Keep what was not written yet for the next attempt
+                with open(self.spill_path, "w") as spill:
+                    spill.writelines(json.dumps(list(row)) + "\n" for row in rows[start:])
+                return False
+            with self.condition:
+                self.stats["replayed"] += len(rows[start:start + self.batch_size])
+        os.remove(self.spill_path)
+        return True
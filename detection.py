@@ -1,42 +1,68 @@
+import os
 import cv2
-from ultralytics import YOLO
+from detectors import create_detector, RemoteDetector, UltralyticsDetector, QuantizationGateError
+from inference_workers import INFERENCE_WORKERS
+from postprocess import TYPED_VEHICLES, EMERGENCY
+
+# Inference backend: "ultralytics" (PyTorch), "onnx" (onnxruntime), "onnx-int8"
+# (quantized, see quantize_model.py) or "openvino". Exported backends need
+# `python export_model.py <backend>` to be run once.
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", UltralyticsDetector.backend)
+DETECTOR_WEIGHTS = os.environ.get("DETECTOR_WEIGHTS", 'yolo12s.pt')  # Replace with your custom model if needed
+DETECTOR_THREADS = int(os.environ.get("DETECTOR_THREADS", 0)) or None
 
-model = YOLO('yolo12s.pt')  # Replace with your custom model if needed
 vehicle_classes = {0: "ambulance", 2: "car", 3: "motorbike", 5: "bus", 7: "truck"}
+if INFERENCE_WORKERS:
+    # Only the worker processes load the model (see inference_workers.py)
+    detector = RemoteDetector(DETECTOR_BACKEND, vehicle_classes)
+else:
+    try:
+        detector = create_detector(DETECTOR_BACKEND, DETECTOR_WEIGHTS, vehicle_classes, threads=DETECTOR_THREADS)
+    except QuantizationGateError as e:
+        # Never deploy an INT8 model that has not been shown to count like the FP32 one
+        print(f"Refusing quantized detector: {e}. Falling back to the FP32 model.")
+        detector = create_detector(UltralyticsDetector.backend, DETECTOR_WEIGHTS, vehicle_classes,
+                                   threads=DETECTOR_THREADS)
+# The raw ultralytics model, for code that still calls it directly (e.g. the tests)
+model = detector.model if isinstance(detector, UltralyticsDetector) else None
+# Lane results carry vehicle type ids as classes, whichever model produced them
+vehicle_type_table = TYPED_VEHICLES
+
+def annotate_frame(frame, detections):
+    """Draw vehicle boxes (and the ambulance label) onto the frame in place"""
+    boxes = detections.xyxy.astype(int).tolist()
+    is_ambulance = (detections.cls == EMERGENCY).tolist()
+    for (x1, y1, x2, y2), ambulance in zip(boxes, is_ambulance):
+        color = (0, 255, 0) if not ambulance else (0, 0, 255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        if ambulance:
+            cv2.putText(frame, 'AMBULANCE', (x1, y1-10),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,0,255), 2)
+    return frame
+
+def generate_frames(video_path, lane_id=None, width=None, quality=None, max_fps=None):
+    # Viewers share one encoded stream per lane instead of encoding every frame themselves
+    from mjpeg import get_broadcaster
 
-def generate_frames(video_path):
+    broadcaster = None
+    token = None
     try:
         if isinstance(video_path, list):
             video_path = video_path[0]
-            
+
         video_path = str(video_path)
-        cap = cv2.VideoCapture(video_path)
-        
+        broadcaster = get_broadcaster(lane_id if lane_id is not None else video_path, video_path)
+        token = broadcaster.subscribe(width, quality, max_fps)
+
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            chunk = broadcaster.wait_for_chunk(token)
+            if chunk is None:
                 continue
-                
-            results = model(frame)
-            
-            for r in results:
-                for box in r.boxes:
-                    class_id = int(box.cls.item())
-                    if class_id in vehicle_classes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                        color = (0, 255, 0) if class_id != 0 else (0, 0, 255)
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        if class_id == 0:
-                            cv2.putText(frame, 'AMBULANCE', (x1, y1-10), 
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,0,255), 2)
-            
-            _, buffer = cv2.imencode('.jpg', frame)
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-            
+            yield chunk
+
     except Exception as e:
         print(f"Error: {str(e)}")
         yield b''
     finally:
-        if 'cap' in locals():
-            cap.release()
\ No newline at end of file
+        if token is not None:
+            broadcaster.unsubscribe(token)
@@ -0,0 +1,250 @@
+import json
+import os
+import cv2
+import numpy as np
+from postprocess import Detections, build_type_table, to_vehicle_types
+
+DEFAULT_IMGSZ = 640
+CONF_THRESHOLD = 0.25  # same defaults as ultralytics predict
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+LETTERBOX_COLOR = 114
+# The INT8 model is only used if quantize_model.py measured at least this
+# per-frame vehicle count agreement with the FP32 model on the lane videos
+QUANTIZED_MIN_AGREEMENT = float(os.environ.get("QUANTIZED_MIN_AGREEMENT", 0.95))
+
+class QuantizationGateError(RuntimeError):
+    """The quantized model is missing its accuracy check or failed it"""
+
+class Detector:
+    """Common interface for every inference backend.
+
+    `predict(frames)` takes a list of BGR frames and returns one
+    `postprocess.Detections` per frame, with class ids from the weights the
+    detector was built from. `type_table` maps those class ids to vehicle
+    types, so counting code never needs to know which backend produced them.
+    `imgsz` overrides the input size for one call unless the backend was
+    built for a fixed size (`fixed_imgsz`).
+    """
+    backend = None
+    fixed_imgsz = False
+
+    def __init__(self, vehicle_classes, imgsz=DEFAULT_IMGSZ):
+        self.vehicle_classes = vehicle_classes
+        self.type_table = build_type_table(vehicle_classes)
+        self.imgsz = imgsz
+
+    def predict(self, frames, imgsz=None):
+        raise NotImplementedError
+
+    def predict_vehicles(self, frames, imgsz=None):
+        """Vehicle boxes only, classed by vehicle type id (see postprocess.to_vehicle_types)"""
+        return [to_vehicle_types(detections, self.type_table) for detections in self.predict(frames, imgsz)]
+
+    def input_size(self, imgsz=None):
+        """The size a call asking for `imgsz` will actually run at"""
+        if imgsz is None or self.fixed_imgsz:
+            return self.imgsz
+        return imgsz
+
+    def warmup(self):
+        self.predict([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+class UltralyticsDetector(Detector):
+    """PyTorch weights run through the ultralytics stack"""
+    backend = "ultralytics"
+
+    def __init__(self, weights, vehicle_classes, imgsz=DEFAULT_IMGSZ, threads=None, device=None):
+        super().__init__(vehicle_classes, imgsz)
+        from ultralytics import YOLO
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(weights)
+        if device:
+            self.model.to(device)
+
+    def predict(self, frames, imgsz=None):
+        results = self.model(frames, imgsz=self.input_size(imgsz), verbose=False)
+        return [Detections.from_results([r]) for r in results]
+
+def letterbox(frame, size):
+    """Resize keeping aspect ratio and pad to size x size; returns (image, ratio, (pad_x, pad_y))"""
+    height, width = frame.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_width) // 2, (size - new_height) // 2
+    image = np.full((size, size, 3), LETTERBOX_COLOR, dtype=np.uint8)
+    image[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = frame
+    return image, ratio, (pad_x, pad_y)
+
+class ExportedDetector(Detector):
+    """Shared pre/post-processing for exported YOLO graphs whose raw output is
+    (batch, 4 + classes, anchors) with xywh boxes and per-class scores."""
+
+    def preprocess(self, frames, imgsz=None):
+        size = self.input_size(imgsz)
+        images, transforms = [], []
+        for frame in frames:
+            image, ratio, pad = letterbox(frame, size)
+            images.append(image)
+            transforms.append((ratio, pad, frame.shape[:2]))
+        batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)  # BGR -> RGB, NHWC -> NCHW
+        return np.ascontiguousarray(batch, dtype=np.float32) / 255.0, transforms
+
+    def postprocess(self, output, transforms):
+        detections = []
+        for prediction, (ratio, (pad_x, pad_y), (height, width)) in zip(output, transforms):
+            prediction = prediction.T
+            scores = prediction[:, 4:]
+            class_ids = scores.argmax(axis=1)
+            confidences = scores[np.arange(len(scores)), class_ids]
+            keep = confidences >= CONF_THRESHOLD
+            boxes, confidences, class_ids = prediction[keep, :4], confidences[keep], class_ids[keep]
+            if len(boxes) == 0:
+                detections.append(Detections.empty())
+                continue
+
+            xywh = boxes.copy()
+            xywh[:, :2] -= xywh[:, 2:] / 2  # centre -> top-left for NMS
+            indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(),
+                                              CONF_THRESHOLD, IOU_THRESHOLD)
+            indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:MAX_DETECTIONS]
+
+            xyxy = np.concatenate([xywh[indices, :2], xywh[indices, :2] + xywh[indices, 2:]], axis=1)
+            xyxy -= np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)
+            xyxy /= ratio
+            xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+            xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+            detections.append(Detections(xyxy, confidences[indices], class_ids[indices]))
+        return detections
+
+    def predict(self, frames, imgsz=None):
+        batch, transforms = self.preprocess(frames, imgsz)
+        return self.postprocess(self.run(batch), transforms)
+
+    def run(self, batch):
+        raise NotImplementedError
+
+class OnnxDetector(ExportedDetector):
+    """Exported ONNX graph run with onnxruntime on the CPU"""
+    backend = "onnx"
+
+    def __init__(self, weights, vehicle_classes, imgsz=DEFAULT_IMGSZ, threads=None):
+        super().__init__(vehicle_classes, imgsz)
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(weights, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        fixed_size = self.session.get_inputs()[0].shape[-1]
+        if isinstance(fixed_size, int):
+            self.imgsz = fixed_size
+            self.fixed_imgsz = True
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+class QuantizedOnnxDetector(OnnxDetector):
+    """INT8 ONNX graph produced by quantize_model.py"""
+    backend = "onnx-int8"
+
+class OpenVinoDetector(ExportedDetector):
+    """Exported OpenVINO IR (the directory written by `export_model.py openvino`)"""
+    backend = "openvino"
+
+    def __init__(self, weights, vehicle_classes, imgsz=DEFAULT_IMGSZ, threads=None):
+        super().__init__(vehicle_classes, imgsz)
+        import openvino
+        if os.path.isdir(weights):
+            weights = next(os.path.join(weights, name) for name in sorted(os.listdir(weights))
+                           if name.endswith(".xml"))
+        core = openvino.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.model = core.compile_model(core.read_model(weights), "CPU", config)
+        fixed_size = self.model.input(0).get_partial_shape()[-1]
+        if fixed_size.is_static:
+            self.imgsz = fixed_size.get_length()
+            self.fixed_imgsz = True
+
+    def run(self, batch):
+        return self.model(batch)[self.model.output(0)]
+
+class RemoteDetector(Detector):
+    """Stands in for a model that only the inference worker processes load.
+
+    It has the backend and class mapping but no weights, so the web process
+    does not hold a copy of the model next to the workers' copies.
+    """
+
+    def __init__(self, backend, vehicle_classes, imgsz=DEFAULT_IMGSZ):
+        super().__init__(vehicle_classes, imgsz)
+        self.backend = backend
+
+    def predict(self, frames, imgsz=None):
+        raise RuntimeError(f"The {self.backend} model runs in the inference worker processes")
+
+    def warmup(self):
+        pass
+
+DETECTOR_BACKENDS = {
+    UltralyticsDetector.backend: UltralyticsDetector,
+    OnnxDetector.backend: OnnxDetector,
+    QuantizedOnnxDetector.backend: QuantizedOnnxDetector,
+    OpenVinoDetector.backend: OpenVinoDetector
+}
+
+def exported_path(weights, backend):
+    """Where `export_model.py` writes the artifact for `weights` and `backend`"""
+    stem = os.path.splitext(weights)[0]
+    if backend == OnnxDetector.backend:
+        return f"{stem}.onnx"
+    if backend == QuantizedOnnxDetector.backend:
+        return f"{stem}.int8.onnx"
+    if backend == OpenVinoDetector.backend:
+        return f"{stem}_openvino_model"
+    return weights
+
+def quantized_manifest_path(weights):
+    """Accuracy report written by quantize_model.py for the INT8 model"""
+    return f"{os.path.splitext(weights)[0]}.int8.json"
+
+def check_quantized_model(weights, min_agreement=QUANTIZED_MIN_AGREEMENT):
+    """Raise QuantizationGateError unless the INT8 model passed its comparison with FP32"""
+    manifest_path = quantized_manifest_path(weights)
+    if not os.path.exists(manifest_path):
+        raise QuantizationGateError(f"{manifest_path} not found. Run: python quantize_model.py --weights {weights}")
+    with open(manifest_path) as f:
+        report = json.load(f)
+    agreement = report.get("count_agreement", 0)
+    if agreement < min_agreement:
+        raise QuantizationGateError(
+            f"INT8 count agreement {agreement} is below the required {min_agreement}")
+    return report
+
+def create_detector(backend, weights, vehicle_classes, imgsz=DEFAULT_IMGSZ, threads=None):
+    """Build the detector for `backend` from the PyTorch `weights` (or their exported artifact)"""
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}'. Use one of: {', '.join(DETECTOR_BACKENDS)}")
+    path = exported_path(weights, backend)
+    if backend == QuantizedOnnxDetector.backend:
+        check_quantized_model(weights)
+    if not os.path.exists(path) and backend != UltralyticsDetector.backend:
+        raise FileNotFoundError(f"{path} not found. Run: python export_model.py {backend} --weights {weights}")
+    return DETECTOR_BACKENDS[backend](path, vehicle_classes, imgsz=imgsz, threads=threads)
+
+def load_detector(backend, weights, vehicle_classes, imgsz=DEFAULT_IMGSZ, threads=None):
+    """create_detector(), falling back to the ultralytics backend when `weights`
+    have no usable artifact for `backend`"""
+    try:
+        return create_detector(backend, weights, vehicle_classes, imgsz=imgsz, threads=threads)
+    except (FileNotFoundError, QuantizationGateError) as e:
+        print(f"{weights} has no usable {backend} artifact ({e}); loading it with ultralytics")
+        return create_detector(UltralyticsDetector.backend, weights, vehicle_classes, imgsz=imgsz, threads=threads)
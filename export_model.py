@@ -0,0 +1,33 @@
+"""Export detector weights for the ONNX Runtime or OpenVINO backends.
+
+    python export_model.py onnx --weights yolo12s.pt
+    python export_model.py openvino --weights yolo12s.pt --imgsz 640
+
+The artifact is written where `detectors.create_detector` looks for it, so
+switching backends is then only a matter of setting DETECTOR_BACKEND.
+"""
+import argparse
+import os
+import shutil
+from ultralytics import YOLO
+from detectors import exported_path, DEFAULT_IMGSZ, OnnxDetector, OpenVinoDetector
+
+def export(backend, weights, imgsz=DEFAULT_IMGSZ):
+    model = YOLO(weights)
+    # Dynamic axes so the inference scheduler can send batches of any size
+    path = model.export(format=backend, imgsz=imgsz, dynamic=True)
+    target = exported_path(weights, backend)
+    if os.path.abspath(path) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        shutil.move(path, target)
+    return target
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export YOLO weights for a CPU inference backend")
+    parser.add_argument("backend", choices=[OnnxDetector.backend, OpenVinoDetector.backend])
+    parser.add_argument("--weights", default="yolo12s.pt")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    args = parser.parse_args()
+
+    print(f"Exported {args.weights} to {export(args.backend, args.weights, args.imgsz)}")
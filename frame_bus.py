@@ -0,0 +1,120 @@
+from multiprocessing import shared_memory, resource_tracker
+from threading import Lock
+import atexit
+import numpy as np
+
+# Blocks this process created and has not unlinked yet, freed at exit whoever forgot to
+_owned_buses = set()
+_owned_lock = Lock()
+
+def attach_memory(name):
+    """Open a shared memory block created by another (unrelated) process"""
+    memory = shared_memory.SharedMemory(name=name)
+    # The creator owns the block; stop this process's tracker from unlinking it at exit
+    resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+class FrameBus:
+    """Fixed number of frame slots of one shape in a single shared memory block.
+
+    The block starts with one int64 sequence number per slot followed by the
+    slots themselves, so its size is fixed for the lifetime of the bus. A
+    writer fills `slot(sequence)` in place and then calls `publish(sequence)`;
+    readers take NumPy views (no copies) and use `intact(sequence)` to check
+    that the slot was not reused while they were working on it. Other
+    processes attach by name with `FrameBus.attach()` or map a single frame
+    with `locate()` / `frame_from()`. The creating process unlinks the block
+    on `close()`, or at exit for buses nobody closed.
+    """
+
+    def __init__(self, slots, shape, dtype=np.uint8, name=None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.header_bytes = slots * np.dtype(np.int64).itemsize
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=self.header_bytes + slots * self.frame_bytes)
+            self.owner = True
+            with _owned_lock:
+                _owned_buses.add(self)
+        else:
+            self.memory = attach_memory(name)
+            self.owner = False
+        self.sequences = np.ndarray((slots,), dtype=np.int64, buffer=self.memory.buf)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.memory.buf,
+                                 offset=self.header_bytes)
+        if self.owner:
+            self.sequences[:] = 0
+
+    @classmethod
+    def attach(cls, name, slots, shape, dtype=np.uint8):
+        return cls(slots, shape, dtype, name=name)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @property
+    def nbytes(self):
+        return self.memory.size
+
+    def slot(self, sequence):
+        """Writable view of the slot that will hold frame `sequence`.
+
+        The slot stops being `intact` for the frame it held until `publish()`.
+        """
+        self.sequences[sequence % self.slots] = 0
+        return self.frames[sequence % self.slots]
+
+    def publish(self, sequence):
+        self.sequences[sequence % self.slots] = sequence
+
+    @property
+    def closed(self):
+        return self.sequences is None
+
+    def view(self, sequence):
+        """View of frame `sequence`, or None if its slot has been reused or the bus closed"""
+        frames = self.frames
+        return frames[sequence % self.slots] if frames is not None and self.intact(sequence) else None
+
+    def intact(self, sequence):
+        # Readers may still hold results of a bus that was closed under them
+        sequences = self.sequences
+        return sequences is not None and int(sequences[sequence % self.slots]) == sequence
+
+    def locate(self, frame):
+        """(name, offset, shape, strides) of a view into this bus, for another process; None otherwise"""
+        base = self.frames.__array_interface__["data"][0] - self.header_bytes
+        start = frame.__array_interface__["data"][0] - base
+        end = start + (np.array(frame.shape) - 1) @ np.array(frame.strides) + frame.itemsize
+        if frame.dtype != self.dtype or start < self.header_bytes or end > self.nbytes:
+            return None
+        return self.name, int(start), frame.shape, frame.strides
+
+    def close(self):
+        # Views handed out must be gone before the mapping can be closed
+        if self.closed:
+            return
+        self.sequences = self.frames = None
+        try:
+            self.memory.close()
+        except BufferError:
+            pass
+        if self.owner:
+            self.memory.unlink()
+            with _owned_lock:
+                _owned_buses.discard(self)
+
+@atexit.register
+def close_owned_buses():
+    """Unlink every block still owned by this process"""
+    with _owned_lock:
+        buses = list(_owned_buses)
+    for bus in buses:
+        bus.close()
+
+def frame_from(buffer, offset, shape, strides, dtype=np.uint8):
+    """Rebuild a frame located with FrameBus.locate() on an attached buffer"""
+    return np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset, strides=strides)
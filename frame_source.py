@@ -0,0 +1,212 @@
+from threading import Thread, Condition
+import os
+import time
+import cv2
+from frame_bus import FrameBus
+
+DEFAULT_FPS = 25
+HISTORY_SIZE = 4  # decoded frames kept on the bus (newest is what consumers read)
+SEEK_THRESHOLD_SECONDS = 2  # beyond this much lag, seek instead of grabbing frame by frame
+MAX_DECODE_INTERVAL = 0.2  # never let the buffered frame get older than this
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 30
+
+class FrameSource:
+    """Per-lane frame grabber running on its own thread.
+
+    The grabber keeps the capture at wall-clock pace and decodes straight into
+    the slots of a shared memory `FrameBus` of `history` frames, so memory
+    per lane is constant and `read()` returns the newest
+    frame immediately instead of blocking on I/O. Frames that fell behind are
+    skipped with `cap.grab()` (or a direct seek for large gaps in files), and
+    grabbed frames are only decoded as often as the consumer needs them.
+    Files loop like the old `CAP_PROP_POS_FRAMES` rewind; live sources
+    (camera index, RTSP/HTTP URL) are reopened with backoff when they drop.
+    """
+
+    def __init__(self, source, history=HISTORY_SIZE):
+        self.source = source
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.history = history
+        self.condition = Condition()
+        self.bus = None
+        self.sequence = 0  # sequence number of the newest decoded frame
+        self.last_read_sequence = 0
+        self.decode_interval = 0
+        self.running = True
+        self.position = 0  # frames the capture has advanced through, across loops
+        self.stats = {
+            "frames_grabbed": 0,
+            "frames_decoded": 0,
+            "frames_skipped": 0,
+            "reconnects": 0
+        }
+        self._open()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.is_file else 0
+        self.start_time = time.time()
+        self.position = 0
+
+    def _reconnect(self, delay):
+        self.cap.release()
+        time.sleep(delay)
+        self._open()
+        self.stats["reconnects"] += 1
+        return self.cap.isOpened()
+
+    def set_consumer_interval(self, interval):
+        """Decode only as often as the consumer reads, bounded by MAX_DECODE_INTERVAL"""
+        self.decode_interval = min(interval, MAX_DECODE_INTERVAL)
+
+    def _rewind(self):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _skip(self, frames):
+        """Advance the capture without decoding the frames passed over"""
+        if self.is_file and self.frame_count > 0:
+            local = self.position % self.frame_count
+            target = self.position + frames
+            if target // self.frame_count != self.position // self.frame_count:
+                self._rewind()
+                local = 0
+            local_target = target % self.frame_count
+            if local_target - local > SEEK_THRESHOLD_SECONDS * self.fps:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, local_target)
+                self.position = target
+                self.stats["frames_skipped"] += frames
+                return
+            frames = local_target - local
+            self.position = target - frames
+        for _ in range(frames):
+            if not self.cap.grab():
+                break
+            self.position += 1
+            self.stats["frames_skipped"] += 1
+
+    def _store(self, frame_sequence):
+        if self.bus is None:
+            ok, frame = self.cap.retrieve()
+            if not ok:
+                return False
+            self.bus = FrameBus(self.history, frame.shape, frame.dtype)
+            self.bus.slot(frame_sequence)[...] = frame
+            return True
+        ok, frame = self.cap.retrieve(self.bus.slot(frame_sequence))
+        if ok and frame.shape != self.bus.shape:
+            # Stream resolution changed (e.g. after a reconnect): reallocate
+            with self.condition:
+                old_bus, self.bus = self.bus, FrameBus(self.history, frame.shape, frame.dtype)
+                self.bus.slot(frame_sequence)[...] = frame
+            old_bus.close()
+        return ok
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        last_decode_time = 0
+        while self.running:
+            if not self.cap.isOpened():
+                if not self._reconnect(delay):
+                    delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+
+            if self.is_file:
+                # Pace the file to wall-clock time, skipping whatever we fell behind by
+                wait = self.start_time + self.position / self.fps - time.time()
+                if wait > 0:
+                    time.sleep(min(wait, 0.1))
+                    continue
+                behind = int((time.time() - self.start_time) * self.fps) - self.position
+                if behind > 0:
+                    self._skip(behind)
+
+            if not self.cap.grab():
+                if self.is_file:
+                    self._rewind()
+                    if self.frame_count <= 0 or self.position % self.frame_count:
+                        # Frame count was off: learn the real length and resync the clock
+                        self.frame_count = self.position % self.frame_count if self.frame_count > 0 else self.position
+                        self.start_time = time.time()
+                        self.position = 0
+                else:
+                    self.cap.release()
+                continue
+            self.position += 1
+            self.stats["frames_grabbed"] += 1
+            delay = RECONNECT_DELAY
+
+            now = time.time()
+            if now - last_decode_time < self.decode_interval:
+                continue
+            if self._store(self.sequence + 1):
+                last_decode_time = now
+                with self.condition:
+                    self.sequence += 1
+                    self.bus.publish(self.sequence)
+                    self.stats["frames_decoded"] += 1
+                    self.condition.notify_all()
+
+    def _wait_for_frame(self, timeout):
+        # Caller holds the condition
+        self.condition.wait_for(
+            lambda: self.sequence > self.last_read_sequence or not self.running,
+            timeout=timeout
+        )
+        if self.sequence <= self.last_read_sequence:
+            return False
+        self.last_read_sequence = self.sequence
+        return True
+
+    def read(self, timeout=5):
+        """Return (True, copy of the newest frame not yet read) or (False, None) on timeout"""
+        with self.condition:
+            if not self._wait_for_frame(timeout):
+                return False, None
+            return True, self.bus.view(self.sequence).copy()
+
+    def read_into(self, target_for_shape, timeout=5):
+        """Copy the newest frame not yet read into the array returned by
+        `target_for_shape(shape)`; returns (True, that array) or (False, None).
+
+        The grabber never writes the slot being read, so this is the only copy
+        the frame needs on its way to the consumer's own buffer.
+        """
+        with self.condition:
+            if not self._wait_for_frame(timeout):
+                return False, None
+            frame = self.bus.view(self.sequence)
+            target = target_for_shape(frame.shape)
+            target[...] = frame
+            return True, target
+
+    def get_history(self, count=HISTORY_SIZE):
+        """Copies of up to `count` most recent decoded frames, oldest first"""
+        with self.condition:
+            if self.bus is None:
+                return []
+            sequences = range(max(self.sequence - min(count, self.history) + 1, 1), self.sequence + 1)
+            return [self.bus.view(sequence).copy() for sequence in sequences if self.bus.intact(sequence)]
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats.update({
+                "fps": self.fps,
+                "position": self.position,
+                "buffer_bytes": self.bus.nbytes if self.bus is not None else 0
+            })
+            return stats
+
+    def release(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join(timeout=5)
+        self.cap.release()
+        if self.bus is not None and not self.thread.is_alive():
+            self.bus.close()
+            self.bus = None
@@ -0,0 +1,288 @@
+from threading import Thread, Condition, Event
+import os
+import time
+from model_registry import model_registry
+from postprocess import EMERGENCY
+from resolution import ResolutionPolicy, LoadMonitor
+from inference_workers import InferenceWorker, INFERENCE_WORKERS, worker_threads
+
+INFERENCE_MAX_BATCH_SIZE = 4
+INFERENCE_MAX_WAIT = 0.05  # seconds the first frame of a batch may wait for the others
+# Pick the detector input size per lane from its density and the system load
+ADAPTIVE_IMGSZ = os.environ.get('ADAPTIVE_IMGSZ', '1') != '0'
+PRELOAD_POLL_INTERVAL = 0.1  # seconds between checks on a worker loading a new model
+
+class InferenceRequest:
+    __slots__ = ("lane_id", "frame", "location", "imgsz", "submitted", "done", "result", "error")
+
+    def __init__(self, lane_id, frame, location=None, imgsz=None):
+        self.lane_id = lane_id
+        self.frame = frame
+        self.location = location
+        self.imgsz = imgsz
+        self.submitted = time.time()
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+class InferenceScheduler:
+    """Collects the latest frame from each lane and runs them through the
+    detector as one batched call instead of one forward pass per lane.
+
+    A batch is dispatched as soon as every active lane has submitted a frame,
+    when `max_batch_size` frames are waiting, or when the oldest frame has
+    waited `max_wait` seconds, whichever comes first.
+
+    With `adaptive_imgsz`, each lane's input size comes from its
+    `resolution.ResolutionPolicy` and a batch only holds frames of one size.
+
+    With `workers` > 0 there is one dispatch thread per worker process (see
+    inference_workers), so that many batches run in parallel. A model switch
+    first has every worker load and warm up the new model in the background
+    (`preload_workers`), so the first batch after the swap does not stall.
+    """
+
+    def __init__(self, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_wait=INFERENCE_MAX_WAIT,
+                 adaptive_imgsz=ADAPTIVE_IMGSZ, workers=INFERENCE_WORKERS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.adaptive_imgsz = adaptive_imgsz
+        self.workers = workers
+        self.condition = Condition()
+        self.pending = []
+        self.active_lanes = set()
+        self.policies = {}
+        self.load = LoadMonitor()
+        self.lane_stats = {}
+        self.threads = []
+        self.preloads = []
+        self.closed = False
+        self.stats = {
+            "workers": workers,
+            "workers_ready": 0,
+            "batches": 0,
+            "frames": 0,
+            "last_batch_size": 0,
+            "last_batch_latency_ms": 0.0,
+            "avg_batch_latency_ms": 0.0
+        }
+        if workers:
+            model_registry.add_preloader(self.preload_workers)
+
+    def register_lane(self, lane_id):
+        with self.condition:
+            self.active_lanes.add(lane_id)
+            if lane_id not in self.policies:
+                self.policies[lane_id] = ResolutionPolicy()
+            if not self.threads:
+                for index in range(max(self.workers, 1)):
+                    thread = Thread(target=self._run, args=(index,), daemon=True)
+                    thread.start()
+                    self.threads.append(thread)
+
+    def unregister_lane(self, lane_id):
+        with self.condition:
+            self.active_lanes.discard(lane_id)
+            self.condition.notify_all()
+
+    def infer(self, lane_id, frame, location=None):
+        """Queue a frame and block until its batch has run; returns that frame's vehicle Detections.
+
+        `location` (see FrameBus.locate) lets worker processes map the frame
+        instead of receiving a copy.
+        """
+        with self.condition:
+            request = InferenceRequest(lane_id, frame, location, self._lane_imgsz(lane_id))
+            self.pending.append(request)
+            self.condition.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def preload_workers(self, spec, timeout):
+        """Load and warm up `spec` on every worker process; returns the slowest worker's timings.
+
+        None if there are no worker processes (yet); those start on the active model.
+        """
+        with self.condition:
+            if self.closed or not self.workers or not self.threads:
+                return None
+            job = {"spec": spec, "remaining": set(range(len(self.threads))), "next_poll": {},
+                   "timings": [], "errors": []}
+            self.preloads.append(job)
+            self.condition.notify_all()
+            finished = self.condition.wait_for(lambda: not job["remaining"], timeout)
+            self.preloads.remove(job)
+        if not finished:
+            raise TimeoutError(f"Inference workers did not load {spec['name']} within {timeout} seconds")
+        if job["errors"]:
+            raise RuntimeError(job["errors"][0])
+        return {
+            "load_ms": max(timings["load_ms"] for timings in job["timings"]),
+            "warmup_ms": max(timings["warmup_ms"] for timings in job["timings"])
+        }
+
+    def close(self):
+        """Stop the dispatch threads and their worker processes"""
+        model_registry.remove_preloader(self.preload_workers)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats["overloaded"] = self.load.overloaded
+            stats["avg_request_latency_ms"] = round(self.load.latency * 1000, 2)
+            stats["lanes"] = {lane_id: dict(lane) for lane_id, lane in self.lane_stats.items()}
+            return stats
+
+    def _lane_imgsz(self, lane_id):
+        # None lets the detector use its own size
+        policy = self.policies.get(lane_id)
+        return policy.imgsz if self.adaptive_imgsz and policy is not None else None
+
+    def _batch_requests(self):
+        # Frames of the oldest request's size, oldest first
+        imgsz = self.pending[0].imgsz
+        return [request for request in self.pending if request.imgsz == imgsz][:self.max_batch_size]
+
+    def _batch_ready(self):
+        if not self.pending:
+            return False
+        imgsz = self.pending[0].imgsz
+        lanes = sum(1 for lane_id in self.active_lanes if self._lane_imgsz(lane_id) == imgsz)
+        target = min(self.max_batch_size, max(lanes, 1))
+        if len(self._batch_requests()) >= target:
+            return True
+        return time.time() - self.pending[0].submitted >= self.max_wait
+
+    def _preload_due(self, index):
+        # Caller holds the condition; the first preload this dispatch thread should check on now
+        for job in self.preloads:
+            if index in job["remaining"] and job["next_poll"].get(index, 0) <= time.time():
+                return job
+        return None
+
+    def _next_wake(self, index):
+        # Caller holds the condition; seconds until a batch deadline or preload check, None for no timeout
+        times = [job["next_poll"][index] for job in self.preloads
+                 if index in job["remaining"] and index in job["next_poll"]]
+        if self.pending:
+            times.append(self.pending[0].submitted + self.max_wait)
+        return max(min(times) - time.time(), 0.001) if times else None
+
+    def _take_job(self, index):
+        """(preload job, None) or (None, batch); (None, None) once closed"""
+        with self.condition:
+            while True:
+                job = None if self.closed else self._preload_due(index)
+                if job is not None:
+                    return job, None
+                if self._batch_ready():
+                    break
+                if self.closed:
+                    return None, None
+                self.condition.wait(timeout=self._next_wake(index))
+            batch = self._batch_requests()
+            self.pending = [request for request in self.pending if request not in batch]
+            return None, batch
+
+    def _preload(self, worker, job, index):
+        try:
+            reply = worker.preload(job["spec"])
+        except Exception as e:
+            reply = {"error": str(e)}
+        with self.condition:
+            if "error" in reply:
+                job["errors"].append(reply["error"])
+                job["remaining"].discard(index)
+            elif reply["loaded"]:
+                job["timings"].append(reply)
+                job["remaining"].discard(index)
+            else:
+                job["next_poll"][index] = time.time() + PRELOAD_POLL_INTERVAL
+            self.condition.notify_all()
+
+    def _start_worker(self):
+        worker = InferenceWorker(worker_threads(self.workers))
+        try:
+            worker.load(model_registry.get_spec())
+        except Exception as e:
+            print(f"Error loading model in inference worker {worker.pid}: {e}")
+        return worker
+
+    def _run(self, index):
+        worker = self._start_worker() if self.workers else None
+        if worker is not None:
+            with self.condition:
+                self.stats["workers_ready"] += 1
+        while True:
+            job, batch = self._take_job(index)
+            if job is not None:
+                self._preload(worker, job, index)
+                continue
+            if batch is None:
+                break
+            imgsz = batch[0].imgsz
+            start_time = time.time()
+            try:
+                # Looked up per batch so a model switch applies to the very next batch
+                detector = model_registry.get()
+                imgsz = detector.input_size(imgsz)
+                frames = [request.frame for request in batch]
+                if worker is not None:
+                    results = worker.predict_vehicles(frames, imgsz, model_registry.get_spec(),
+                                                      [request.location for request in batch])
+                else:
+                    results = detector.predict_vehicles(frames, imgsz)
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                print(f"Error in batched inference: {e}")
+                for request in batch:
+                    request.error = e
+                if worker is not None and worker.process.poll() is not None:
+                    worker.close()
+                    worker = self._start_worker()
+            finish_time = time.time()
+            latency_ms = (finish_time - start_time) * 1000
+
+            with self.condition:
+                for request in batch:
+                    self._observe(request, imgsz, latency_ms, finish_time)
+                self.stats["batches"] += 1
+                self.stats["frames"] += len(batch)
+                self.stats["last_batch_size"] = len(batch)
+                self.stats["last_batch_latency_ms"] = round(latency_ms, 2)
+                self.stats["avg_batch_latency_ms"] = round(
+                    self.stats["avg_batch_latency_ms"] * 0.9 + latency_ms * 0.1, 2)
+
+            for request in batch:
+                request.done.set()
+        if worker is not None:
+            worker.close()
+
+    def _observe(self, request, imgsz, latency_ms, now):
+        # Caller holds the condition
+        request_latency = now - request.submitted
+        overloaded = self.load.observe(request_latency)
+        policy = self.policies.get(request.lane_id)
+        if policy is None or request.result is None:
+            return
+        vehicles = len(request.result)
+        ambulance = bool((request.result.cls == EMERGENCY).any())
+        policy.update(vehicles, ambulance, overloaded, now)
+        self.lane_stats[request.lane_id] = {
+            "imgsz": imgsz,
+            "next_imgsz": self._lane_imgsz(request.lane_id) or imgsz,
+            "reason": policy.reason if self.adaptive_imgsz else "fixed",
+            "vehicles": vehicles,
+            "inference_latency_ms": round(latency_ms, 2),
+            "request_latency_ms": round(request_latency * 1000, 2)
+        }
+
+scheduler = InferenceScheduler()
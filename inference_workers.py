@@ -0,0 +1,209 @@
+"""Inference worker processes for the batched scheduler.
+
+With INFERENCE_WORKERS > 0 every scheduler dispatch thread owns one worker
+process holding its own copy of the model, so pre/post-processing of
+different batches no longer shares one GIL and each model gets a fixed
+share of the cores (`torch.set_num_threads` via the detector `threads`).
+
+Frames that live on a lane's FrameBus are mapped by the worker in place;
+any other frame is copied into the worker's own shared memory block. Only
+block names, offsets and shapes travel over the connection; results come
+back as three concatenated arrays plus per-frame box counts. Workers are
+started as plain
+`python inference_workers.py` subprocesses rather than multiprocessing
+children, because spawning would re-import the web app (and load its model)
+in every worker.
+
+Before a model switch the scheduler has each worker preload the new model
+on a background thread (`InferenceWorker.preload`), so the worker keeps
+serving batches on its current model until the swap.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from threading import Thread
+from multiprocessing import shared_memory
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from frame_bus import attach_memory, frame_from
+
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))  # 0 runs inference in-process
+# Intra-op threads per worker; by default the cores are split evenly between workers
+INFERENCE_WORKER_THREADS = int(os.environ.get("INFERENCE_WORKER_THREADS", 0)) or None
+MIN_SHARED_BYTES = 4 * 1920 * 1080 * 3  # a full batch of 1080p frames
+AUTHKEY_VARIABLE = "INFERENCE_WORKER_AUTHKEY"
+MAX_ATTACHED_BLOCKS = 16  # shared memory blocks a worker keeps mapped
+
+def worker_threads(workers):
+    return INFERENCE_WORKER_THREADS or max((os.cpu_count() or 1) // max(workers, 1), 1)
+
+class InferenceWorker:
+    """Parent-side handle of one worker process; one batch at a time"""
+
+    def __init__(self, threads):
+        authkey = os.urandom(16)
+        listener = Listener(("127.0.0.1", 0), authkey=authkey)
+        env = dict(os.environ, **{AUTHKEY_VARIABLE: authkey.hex()})
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--port", str(listener.address[1]),
+             "--threads", str(threads)],
+            env=env, cwd=os.getcwd())
+        self.connection = listener.accept()
+        listener.close()
+        self.threads = threads
+        self.memory = None
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def _buffer(self, size):
+        if self.memory is None or self.memory.size < size:
+            if self.memory is not None:
+                self.memory.close()
+                self.memory.unlink()
+            self.memory = shared_memory.SharedMemory(create=True, size=max(size, MIN_SHARED_BYTES))
+        return self.memory
+
+    def load(self, spec):
+        """Load and warm up the model described by `spec` (see ModelRegistry.get_spec)"""
+        self._call({"model": spec, "frames": []})
+
+    def preload(self, spec):
+        """Start loading `spec` in the background, or report on it.
+
+        Returns {"loaded": False} while the worker is still loading (it keeps
+        serving batches on its current model meanwhile) and then, once,
+        {"loaded": True, "load_ms": ..., "warmup_ms": ...}.
+        """
+        return self._call({"model": spec, "frames": [], "preload": True})
+
+    def predict_vehicles(self, frames, imgsz, spec, locations=None):
+        """`locations` (FrameBus.locate() per frame, or None) avoids copying those frames"""
+        from postprocess import Detections
+
+        locations = locations or [None] * len(frames)
+        copied = [frame for frame, location in zip(frames, locations) if location is None]
+        memory = self._buffer(sum(frame.nbytes for frame in copied)) if copied else None
+        layout, offset = [], 0
+        for frame, location in zip(frames, locations):
+            if location is None:
+                target = np.ndarray(frame.shape, dtype=np.uint8, buffer=memory.buf, offset=offset)
+                target[...] = frame
+                location = (memory.name, offset, frame.shape, target.strides)
+                offset += frame.nbytes
+            layout.append(location)
+
+        reply = self._call({"model": spec, "frames": layout, "imgsz": imgsz})
+        bounds = np.cumsum([0] + reply["counts"])
+        return [Detections(reply["xyxy"][start:end], reply["conf"][start:end], reply["cls"][start:end])
+                for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def _call(self, job):
+        self.connection.send(job)
+        reply = self.connection.recv()
+        if "error" in reply:
+            raise RuntimeError(f"Inference worker {self.pid}: {reply['error']}")
+        return reply
+
+    def close(self):
+        try:
+            self.connection.close()
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+def serve(port, threads):
+    # Connect before the heavy imports so the parent's accept() returns quickly
+    connection = Client(("127.0.0.1", port), authkey=bytes.fromhex(os.environ[AUTHKEY_VARIABLE]))
+    from detectors import load_detector
+
+    detectors = {}  # model name -> detector, so switching back does not reload
+    loading = {}  # model name -> result of its background preload, filled in when done
+    attached = {}  # shared memory blocks by name, oldest first
+
+    def load(spec):
+        start_time = time.perf_counter()
+        detector = load_detector(spec["backend"], spec["weights"], spec["vehicle_classes"], threads=threads)
+        load_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        start_time = time.perf_counter()
+        detector.warmup()
+        warmup_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        return detector, {"load_ms": load_ms, "warmup_ms": warmup_ms}
+
+    def preload(spec, result):
+        try:
+            detector, timings = load(spec)
+            result.update(detector=detector, timings=timings)
+        except Exception as e:
+            result.update(error=str(e))
+
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+        try:
+            spec = job["model"]
+            if job.get("preload"):
+                connection.send(preload_status(spec, detectors, loading, preload))
+                continue
+            detector = detectors.get(spec["name"])
+            if detector is None:
+                detector, _ = load(spec)
+                detectors[spec["name"]] = detector
+            if not job["frames"]:
+                connection.send({"counts": []})
+                continue
+
+            frames = []
+            for name, offset, shape, strides in job["frames"]:
+                if name not in attached:
+                    if len(attached) >= MAX_ATTACHED_BLOCKS:
+                        attached.pop(next(iter(attached))).close()
+                    attached[name] = attach_memory(name)
+                frames.append(frame_from(attached[name].buf, offset, shape, strides))
+            results = detector.predict_vehicles(frames, job["imgsz"])
+            del frames  # release the views so old blocks can be closed
+            connection.send({
+                "counts": [len(result) for result in results],
+                "xyxy": np.concatenate([result.xyxy for result in results]),
+                "conf": np.concatenate([result.conf for result in results]),
+                "cls": np.concatenate([result.cls for result in results])
+            })
+        except Exception as e:
+            connection.send({"error": str(e)})
+    for memory in attached.values():
+        memory.close()
+
+def preload_status(spec, detectors, loading, preload):
+    # Loading runs on its own thread so batches on the current model are not held up
+    name = spec["name"]
+    result = loading.get(name)
+    if result is None:
+        if name in detectors:
+            return {"loaded": True, "load_ms": 0.0, "warmup_ms": 0.0}
+        loading[name] = result = {}
+        Thread(target=preload, args=(spec, result), daemon=True).start()
+        return {"loaded": False}
+    if "error" in result:
+        del loading[name]
+        return {"error": result["error"]}
+    if "detector" in result:
+        del loading[name]
+        detectors[name] = result["detector"]
+        return dict(result["timings"], loaded=True)
+    return {"loaded": False}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference worker process (started by the scheduler)")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+    serve(args.port, args.threads)
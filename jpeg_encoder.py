@@ -0,0 +1,51 @@
+import cv2
+
+# Stream profiles are snapped to these values, so each lane only ever encodes
+# a handful of distinct variants however many clients ask for odd sizes
+STREAM_WIDTHS = (320, 480, 640, 960, 1280)
+STREAM_QUALITIES = (40, 60, 75, 85, 95)
+DEFAULT_QUALITY = 95  # cv2.imencode's default, used when a client asks for nothing
+MAX_STREAM_FPS = 30
+
+try:
+    from turbojpeg import TurboJPEG
+    _turbo = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    # PyTurboJPEG not installed, or libjpeg-turbo not found
+    _turbo = None
+
+def encoder_name():
+    return "turbojpeg" if _turbo is not None else "opencv"
+
+def _snap_down(value, choices):
+    return max([choice for choice in choices if choice <= value] or [choices[0]])
+
+def stream_profile(width=None, quality=None):
+    """(width, quality) variant for a client's request; width None means full resolution"""
+    if width is not None:
+        width = _snap_down(int(width), STREAM_WIDTHS)
+    quality = DEFAULT_QUALITY if quality is None else _snap_down(int(quality), STREAM_QUALITIES)
+    return width, quality
+
+def stream_fps(fps=None):
+    """Client frame rate cap, None for as fast as frames arrive"""
+    if fps is None:
+        return None
+    return min(max(float(fps), 0.1), MAX_STREAM_FPS)
+
+def resize_to_width(frame, width):
+    height, frame_width = frame.shape[:2]
+    if width is None or width >= frame_width:
+        return frame
+    return cv2.resize(frame, (width, max(int(round(height * width / frame_width)), 1)),
+                      interpolation=cv2.INTER_AREA)
+
+def encode_jpeg(frame, quality=DEFAULT_QUALITY):
+    """JPEG bytes of a BGR frame, through libjpeg-turbo when PyTurboJPEG is available"""
+    if _turbo is not None:
+        return _turbo.encode(frame, quality=quality)
+    # Huffman table optimisation costs an extra pass for a few percent of size
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 0])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer
@@ -0,0 +1,49 @@
+# Per-lane settings for the counting pipeline. Coordinates are normalized
+# (x, y) fractions of the frame so they survive changes of video resolution.
+
+# Seconds between detector runs for the counter; VehicleTracker predicts the
+# tracks' positions in between, so vehicles are followed across the gap
+COUNTER_DETECTION_INTERVAL = 3
+
+# While someone watches the MJPEG stream, run the detector on every Nth frame
+# and move the boxes with optical flow on the frames in between
+DEFAULT_DETECT_EVERY_N = 5
+DETECT_EVERY_N = {
+    1: DEFAULT_DETECT_EVERY_N,
+    2: DEFAULT_DETECT_EVERY_N,
+    3: DEFAULT_DETECT_EVERY_N,
+    4: DEFAULT_DETECT_EVERY_N
+}
+
+# Skip inference while less than this fraction of the (downscaled) lane
+# changed since the last detection, but always detect every MAX_SKIP_SECONDS
+MOTION_THRESHOLD = 0.01
+MAX_SKIP_SECONDS = 10
+
+# Polygon of the road area belonging to each lane. Inference runs on its
+# bounding rectangle and only boxes inside the polygon count for the lane.
+# None means the whole frame.
+LANE_ROIS = {
+    1: None,
+    2: None,
+    3: None,
+    4: None
+}
+
+# Vehicles are counted once when their track centre crosses this segment
+DEFAULT_COUNTING_LINE = ((0.0, 0.6), (1.0, 0.6))
+COUNTING_LINES = {
+    1: DEFAULT_COUNTING_LINE,
+    2: DEFAULT_COUNTING_LINE,
+    3: DEFAULT_COUNTING_LINE,
+    4: DEFAULT_COUNTING_LINE
+}
+
+def get_counting_line(lane_id):
+    return COUNTING_LINES.get(lane_id, DEFAULT_COUNTING_LINE)
+
+def get_detect_every_n(lane_id):
+    return max(int(DETECT_EVERY_N.get(lane_id, DEFAULT_DETECT_EVERY_N)), 1)
+
+def get_lane_roi(lane_id):
+    return LANE_ROIS.get(lane_id)
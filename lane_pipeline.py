@@ -0,0 +1,250 @@
+from threading import Thread, Lock, Condition
+import atexit
+import itertools
+import time
+from frame_source import FrameSource
+from frame_bus import FrameBus
+from detection import annotate_frame
+from inference_scheduler import scheduler
+from tracker import OpticalFlowPropagator
+from motion import MotionGate
+from roi import LaneRegion
+from lane_config import get_detect_every_n, get_lane_roi, MOTION_THRESHOLD, MAX_SKIP_SECONDS
+
+OUTPUT_SLOTS = 4  # annotated frames kept on each lane's bus for slow readers
+
+class LaneResult:
+    """One decoded and annotated frame published by a lane pipeline.
+
+    `detected` is False when the boxes were propagated from an earlier
+    detection instead of coming from the model. `frame` is a view into the
+    lane's FrameBus slot; readers that take long over it should check
+    `intact()` afterwards, as the slot is reused OUTPUT_SLOTS frames later.
+    """
+    __slots__ = ("sequence", "frame", "detections", "timestamp", "detected", "bus")
+
+    def __init__(self, sequence, frame, detections, timestamp, detected=True, bus=None):
+        self.sequence = sequence
+        self.frame = frame
+        self.detections = detections
+        self.timestamp = timestamp
+        self.detected = detected
+        self.bus = bus
+
+    def intact(self):
+        return self.bus is None or self.bus.intact(self.sequence)
+
+class LanePipeline:
+    """Single producer per lane: decodes, infers and annotates each frame once
+    and fans the result out to every subscriber (MJPEG viewers, the counter).
+
+    The producer thread only runs while somebody is subscribed, and it runs at
+    the fastest rate any subscriber asked for, so inference cost depends on
+    the lanes being watched rather than on how many clients watch them. While
+    a live stream is subscribed, the detector only runs every
+    `detect_every_n` frames and boxes are propagated with optical flow in
+    between, so the stream plays at source FPS. A motion gate skips the
+    detector altogether (reusing the last boxes) while the lane is static,
+    and a configured lane polygon limits inference to the lane's road area.
+    """
+
+    def __init__(self, lane_id, video_path):
+        self.lane_id = lane_id
+        self.video_path = str(video_path)
+        self.condition = Condition()
+        self.latest = None
+        self.subscribers = {}
+        self.tokens = itertools.count(1)
+        self.running = False
+        self.thread = None
+        self.inference_count = 0
+        self.propagated_count = 0
+        self.reused_count = 0
+        self.motion_gate = MotionGate(MOTION_THRESHOLD, MAX_SKIP_SECONDS)
+        self.detect_every_n = get_detect_every_n(lane_id)
+        self.roi = get_lane_roi(lane_id)
+        self.source = None
+        self.bus = None  # kept across restarts, so a lane's frame memory stays constant; freed by stop()
+
+    def subscribe(self, interval=0):
+        """Register a consumer wanting a new result at most every `interval` seconds"""
+        with self.condition:
+            token = next(self.tokens)
+            self.subscribers[token] = interval
+            if not self.running:
+                self.running = True
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+            return token
+
+    def set_interval(self, token, interval):
+        with self.condition:
+            if token in self.subscribers:
+                self.subscribers[token] = interval
+                self.condition.notify_all()
+
+    def unsubscribe(self, token):
+        with self.condition:
+            self.subscribers.pop(token, None)
+            self.condition.notify_all()
+
+    def wait_for_result(self, last_sequence, timeout=5):
+        """Block until a result newer than `last_sequence` is published; None on timeout"""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.latest is not None and self.latest.sequence > last_sequence,
+                timeout=timeout
+            )
+            if self.latest is not None and self.latest.sequence > last_sequence:
+                return self.latest
+            return None
+
+    def get_latest(self):
+        with self.condition:
+            return self.latest
+
+    def get_stats(self):
+        with self.condition:
+            stats = {
+                "running": self.running,
+                "subscribers": len(self.subscribers),
+                "inference_count": self.inference_count,
+                "propagated_count": self.propagated_count,
+                "reused_count": self.reused_count,
+                "detect_every_n": self.detect_every_n,
+                "motion": self.motion_gate.get_stats(),
+                "output_buffer_bytes": self.bus.nbytes if self.bus is not None else 0
+            }
+        if self.source is not None:
+            stats.update(self.source.get_stats())
+        stats["frame_memory_bytes"] = stats.get("buffer_bytes", 0) + stats["output_buffer_bytes"]
+        return stats
+
+    def stop(self):
+        """Stop the producer and free the lane's shared memory"""
+        with self.condition:
+            self.subscribers.clear()
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        with self.condition:
+            # Unless a new subscriber restarted the producer meanwhile
+            if self.running or self.bus is None:
+                return
+            bus, self.bus = self.bus, None
+        # Results still held by readers stop being intact()
+        bus.close()
+
+    def _next_interval(self):
+        # Caller holds the condition; None means nobody is listening any more
+        if not self.subscribers:
+            self.running = False
+            return None
+        return min(self.subscribers.values())
+
+    def _output_slot(self, sequence, shape):
+        # Frames are annotated in place, so the decoded frame is copied once into our own slot
+        if self.bus is None or self.bus.shape != shape:
+            old_bus, self.bus = self.bus, FrameBus(OUTPUT_SLOTS, shape)
+            if old_bus is not None:
+                old_bus.close()
+        return self.bus.slot(sequence)
+
+    def _run(self):
+        source = self.source = FrameSource(self.video_path)
+        propagator = OpticalFlowPropagator()
+        last_frame_time = 0
+        frames_since_detection = 0
+        last_detections = None
+        region = None
+        sequence = self.latest.sequence if self.latest is not None else 0
+        scheduler.register_lane(self.lane_id)
+        try:
+            while True:
+                with self.condition:
+                    interval = self._next_interval()
+                    if interval is None:
+                        break
+                    delay = last_frame_time + interval - time.time()
+                    if delay > 0:
+                        # Woken early if a faster subscriber joins or everyone leaves
+                        self.condition.wait(timeout=delay)
+                        continue
+
+                source.set_consumer_interval(interval)
+                ret, frame = source.read_into(lambda shape: self._output_slot(sequence + 1, shape), timeout=1)
+                if not ret:
+                    continue
+
+                last_frame_time = time.time()
+                if self.roi is not None and (region is None or region.frame_shape != frame.shape[:2]):
+                    region = LaneRegion(self.roi, frame.shape)
+                    self.motion_gate.set_mask(region.mask)
+                # Propagation only makes sense between consecutive frames of a live stream
+                detect = (interval > 0 or propagator.lost
+                          or frames_since_detection + 1 >= self.detect_every_n)
+                inferred = False
+                if detect:
+                    if self.motion_gate.should_infer(frame, last_frame_time) or last_detections is None:
+                        if region is not None:
+                            detections = region.to_frame(scheduler.infer(self.lane_id, region.crop(frame)))
+                        else:
+                            # Worker processes read the frame straight from the bus
+                            detections = scheduler.infer(self.lane_id, frame, self.bus.locate(frame))
+                        last_detections = detections
+                        inferred = True
+                    else:
+                        # Nothing moved in the lane: the previous boxes still hold
+                        detections = last_detections
+                    propagator.reset(frame, detections)
+                    frames_since_detection = 0
+                else:
+                    detections = propagator.propagate(frame)
+                    frames_since_detection += 1
+                annotate_frame(frame, detections)
+                if region is not None:
+                    region.draw(frame)
+
+                sequence += 1
+                with self.condition:
+                    self.bus.publish(sequence)
+                    self.latest = LaneResult(sequence, frame, detections, last_frame_time, detect, self.bus)
+                    if inferred:
+                        self.inference_count += 1
+                    elif detect:
+                        self.reused_count += 1
+                    else:
+                        self.propagated_count += 1
+                    self.condition.notify_all()
+        except Exception as e:
+            print(f"Error in lane {self.lane_id} pipeline: {e}")
+            with self.condition:
+                self.running = False
+        finally:
+            scheduler.unregister_lane(self.lane_id)
+            source.release()
+
+_pipelines = {}
+_pipelines_lock = Lock()
+
+def get_pipeline(lane_id, video_path):
+    """Return the shared pipeline for a lane, creating it on first use"""
+    with _pipelines_lock:
+        pipeline = _pipelines.get(lane_id)
+        if pipeline is None:
+            pipeline = LanePipeline(lane_id, video_path)
+            _pipelines[lane_id] = pipeline
+        return pipeline
+
+def get_pipelines():
+    with _pipelines_lock:
+        return dict(_pipelines)
+
+# Runs before frame_bus's exit cleanup, so no producer still writes a bus being freed
+@atexit.register
+def stop_pipelines(lane_ids=None):
+    """Stop the pipelines of `lane_ids` (all of them by default) and free their shared memory"""
+    for lane_id, pipeline in get_pipelines().items():
+        if lane_ids is None or lane_id in lane_ids:
+            pipeline.stop()
@@ -0,0 +1,252 @@
+from threading import Thread, Lock, Condition
+import itertools
+import time
+from lane_pipeline import get_pipeline
+from jpeg_encoder import encode_jpeg, resize_to_width, stream_profile, encoder_name
+
+CHUNK_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+CHUNK_TRAILER = b'\r\n'
+MAX_VARIANTS = 4  # distinct (width, quality) encodings per lane; further profiles share the closest one
+
+class StreamVariant:
+    """Newest chunk of one (width, quality) profile"""
+    __slots__ = ("profile", "chunk", "sequence", "viewers", "encoded", "encode_ms")
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.chunk = None
+        self.sequence = 0
+        self.viewers = 0
+        self.encoded = 0
+        self.encode_ms = 0.0
+
+    @property
+    def name(self):
+        width, quality = self.profile
+        return f"{width or 'full'}@q{quality}"
+
+class StreamViewer:
+    __slots__ = ("profile", "interval", "sequence", "next_time", "bytes_sent", "frames_sent", "dropped", "started")
+
+    def __init__(self, profile, max_fps):
+        self.profile = profile
+        self.interval = 1 / max_fps if max_fps else 0
+        self.sequence = 0
+        self.next_time = 0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.dropped = 0
+        self.started = time.time()
+
+class MjpegBroadcaster:
+    """Encodes each annotated frame of one lane once per stream profile and
+    shares the result.
+
+    A single thread subscribes to the lane pipeline while anybody is
+    watching and, for every new frame, encodes each profile in use (at most
+    MAX_VARIANTS) into a complete multipart chunk held as one immutable bytes
+    object. Viewers only ever get the newest chunk of their profile, no more
+    often than their FPS cap, so a slow client skips frames instead of
+    queueing them, and the number of viewers does not change how much
+    encoding is done. When every viewer has an FPS cap, the pipeline is only
+    asked for frames at the fastest of those rates.
+    """
+
+    def __init__(self, lane_id, video_path):
+        self.lane_id = lane_id
+        self.video_path = str(video_path)
+        self.condition = Condition()
+        self.variants = {}
+        self.viewers = {}
+        self.tokens = itertools.count(1)
+        self.running = False
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Call `callback()` from the broadcaster thread whenever new chunks are ready"""
+        with self.condition:
+            self.listeners.append(callback)
+
+    def subscribe(self, width=None, quality=None, max_fps=None):
+        with self.condition:
+            profile = self._variant_profile(stream_profile(width, quality))
+            variant = self.variants.get(profile)
+            if variant is None:
+                variant = self.variants[profile] = StreamVariant(profile)
+            variant.viewers += 1
+            token = next(self.tokens)
+            self.viewers[token] = StreamViewer(profile, max_fps)
+            if not self.running:
+                self.running = True
+                Thread(target=self._run, daemon=True).start()
+            return token
+
+    def _variant_profile(self, profile):
+        # Caller holds the condition
+        if profile in self.variants or len(self.variants) < MAX_VARIANTS:
+            return profile
+        width, quality = profile
+
+        def distance(candidate):
+            candidate_width, candidate_quality = candidate
+            return abs((candidate_width or 10000) - (width or 10000)) + abs(candidate_quality - quality)
+
+        return min(self.variants, key=distance)
+
+    def unsubscribe(self, token):
+        with self.condition:
+            viewer = self.viewers.pop(token, None)
+            if viewer is not None:
+                variant = self.variants[viewer.profile]
+                variant.viewers -= 1
+                if variant.viewers == 0:
+                    del self.variants[viewer.profile]
+            self.condition.notify_all()
+
+    def time_until_due(self, token):
+        """Seconds until this viewer's FPS cap allows its next chunk"""
+        with self.condition:
+            viewer = self.viewers.get(token)
+            return max(viewer.next_time - time.time(), 0) if viewer is not None else 0
+
+    def wait_for_chunk(self, token, timeout=5):
+        """Newest chunk of this viewer's profile it has not had yet; None on timeout"""
+        delay = self.time_until_due(token)
+        if delay > 0:
+            # FPS cap: whatever is encoded meanwhile is skipped for this viewer
+            time.sleep(delay)
+        with self.condition:
+            viewer = self.viewers.get(token)
+            variant = self.variants.get(viewer.profile) if viewer is not None else None
+            if variant is None:
+                return None
+            self.condition.wait_for(lambda: variant.sequence > viewer.sequence, timeout=timeout)
+            return self._take(token)
+
+    def take_chunk(self, token):
+        """Non-blocking wait_for_chunk() for event loops: the chunk, or None if
+        there is nothing new (or the FPS cap is not due yet)"""
+        with self.condition:
+            viewer = self.viewers.get(token)
+            if viewer is None or viewer.next_time > time.time():
+                return None
+            return self._take(token)
+
+    def _take(self, token):
+        # Caller holds the condition
+        viewer = self.viewers.get(token)
+        variant = self.variants.get(viewer.profile) if viewer is not None else None
+        if variant is None or variant.sequence <= viewer.sequence:
+            return None
+        viewer.dropped += variant.sequence - viewer.sequence - 1 if viewer.sequence else 0
+        viewer.sequence = variant.sequence
+        viewer.bytes_sent += len(variant.chunk)
+        viewer.frames_sent += 1
+        viewer.next_time = time.time() + viewer.interval
+        return variant.chunk
+
+    def get_stats(self):
+        with self.condition:
+            now = time.time()
+            viewers = []
+            for viewer in self.viewers.values():
+                elapsed = max(now - viewer.started, 1e-6)
+                viewers.append({
+                    "profile": self.variants[viewer.profile].name,
+                    "max_fps": round(1 / viewer.interval, 2) if viewer.interval else None,
+                    "fps": round(viewer.frames_sent / elapsed, 2),
+                    "frames_sent": viewer.frames_sent,
+                    "dropped": viewer.dropped,
+                    "bytes_sent": viewer.bytes_sent,
+                    "kbps": round(viewer.bytes_sent * 8 / 1000 / elapsed, 1)
+                })
+            return {
+                "encoder": encoder_name(),
+                "variants": {variant.name: {
+                    "viewers": variant.viewers,
+                    "encoded": variant.encoded,
+                    "encode_ms": variant.encode_ms,
+                    "chunk_bytes": len(variant.chunk) if variant.chunk else 0
+                } for variant in self.variants.values()},
+                "viewers": viewers,
+                "kbps": round(sum(viewer["kbps"] for viewer in viewers), 1)
+            }
+
+    def _pipeline_interval(self):
+        # Caller holds the condition; 0 unless every viewer has an FPS cap
+        intervals = [viewer.interval for viewer in self.viewers.values()]
+        return min(intervals) if intervals and all(intervals) else 0
+
+    def _run(self):
+        pipeline = get_pipeline(self.lane_id, self.video_path)
+        with self.condition:
+            interval = self._pipeline_interval()
+        token = pipeline.subscribe(interval)
+        sequence = 0
+        try:
+            while True:
+                with self.condition:
+                    if not self.viewers:
+                        break
+                    variants = list(self.variants.values())
+                    wanted_interval = self._pipeline_interval()
+                if wanted_interval != interval:
+                    interval = wanted_interval
+                    pipeline.set_interval(token, interval)
+
+                result = pipeline.wait_for_result(sequence, timeout=1)
+                if result is None:
+                    continue
+                sequence = result.sequence
+
+                chunks, resized = [], {}
+                for variant in variants:
+                    start_time = time.perf_counter()
+                    width, quality = variant.profile
+                    if width not in resized:
+                        resized[width] = resize_to_width(result.frame, width)
+                    buffer = encode_jpeg(resized[width], quality)
+                    chunks.append((variant, b''.join((CHUNK_HEADER, buffer, CHUNK_TRAILER)),
+                                   (time.perf_counter() - start_time) * 1000))
+                if not result.intact():
+                    # The pipeline reused the slot while we encoded; take the next frame
+                    continue
+
+                with self.condition:
+                    for variant, chunk, encode_ms in chunks:
+                        variant.chunk = chunk
+                        variant.sequence += 1
+                        variant.encoded += 1
+                        variant.encode_ms = round(variant.encode_ms * 0.9 + encode_ms * 0.1, 2)
+                    self.condition.notify_all()
+                    listeners = list(self.listeners)
+                for listener in listeners:
+                    listener()
+        except Exception as e:
+            print(f"Error in lane {self.lane_id} MJPEG broadcaster: {e}")
+            time.sleep(1)  # back off before the restart below
+        finally:
+            pipeline.unsubscribe(token)
+            with self.condition:
+                self.running = False
+                self.condition.notify_all()
+                # A viewer that arrived while we were shutting down gets a fresh thread
+                if self.viewers:
+                    self.running = True
+                    Thread(target=self._run, daemon=True).start()
+
+_broadcasters = {}
+_broadcasters_lock = Lock()
+
+def get_broadcaster(lane_id, video_path):
+    """Return the shared MJPEG broadcaster for a lane, creating it on first use"""
+    with _broadcasters_lock:
+        broadcaster = _broadcasters.get(lane_id)
+        if broadcaster is None:
+            broadcaster = MjpegBroadcaster(lane_id, video_path)
+            _broadcasters[lane_id] = broadcaster
+        return broadcaster
+
+def get_broadcasters():
+    with _broadcasters_lock:
+        return dict(_broadcasters)
@@ -0,0 +1,136 @@
+from threading import Thread, Lock
+import time
+from detection import detector, DETECTOR_BACKEND, DETECTOR_WEIGHTS, DETECTOR_THREADS, vehicle_classes
+from detectors import RemoteDetector, load_detector
+from inference_workers import INFERENCE_WORKERS
+
+# Models selectable through /switch_model/<model_type>
+MODEL_TYPES = {
+    "pretrained": {
+        "weights": DETECTOR_WEIGHTS,
+        "vehicle_classes": vehicle_classes
+    },
+    "custom": {
+        "weights": 'Models/yolov8n.pt',
+        "vehicle_classes": {0: "ambulance", 1: "car", 2: "bus", 3: "bike", 4: "truck", 5: "rickshaw"}
+    }
+}
+SWITCH_TIMEOUT = 120  # seconds a switch request waits for the new model to load
+
+class ModelRegistry:
+    """Double-buffered model slots shared by every lane pipeline.
+
+    The active slot serves inference; a switch loads the new model on a
+    background thread, warms it up with a dummy inference and only then swaps
+    it into the active slot, so lane threads and MJPEG streams keep running on
+    the old model meanwhile. The previous model stays in the standby slot,
+    which makes switching back immediate.
+
+    Preloaders (see `add_preloader`) ready the model wherever else it runs,
+    i.e. in inference worker processes, before the swap as well; their time
+    is part of the reported load_ms and warmup_ms. With `remote`, only the
+    workers hold models, and the slots get a weightless RemoteDetector.
+    """
+
+    def __init__(self, active, active_name, remote=False):
+        self.active = active
+        self.active_name = active_name
+        self.remote = remote
+        self.standby = None
+        self.standby_name = None
+        self.switch_lock = Lock()
+        self.last_switch = None
+        self.preloaders = []
+
+    def add_preloader(self, preload):
+        """`preload(spec, timeout)` loads and warms up a model elsewhere before it is swapped in;
+        it returns {"load_ms", "warmup_ms"}, or None if there was nothing to load"""
+        self.preloaders.append(preload)
+
+    def remove_preloader(self, preload):
+        if preload in self.preloaders:
+            self.preloaders.remove(preload)
+
+    def get(self):
+        # A single attribute read, so callers always see a complete model
+        return self.active
+
+    def get_spec(self, name=None):
+        """What a worker process needs to load the active (or `name`) model itself"""
+        name = name or self.active_name
+        config = MODEL_TYPES[name]
+        return {
+            "name": name,
+            "backend": DETECTOR_BACKEND,
+            "weights": config["weights"],
+            "vehicle_classes": config["vehicle_classes"]
+        }
+
+    def _load(self, name):
+        config = MODEL_TYPES[name]
+        return load_detector(DETECTOR_BACKEND, config["weights"], config["vehicle_classes"],
+                             threads=DETECTOR_THREADS)
+
+    def _prepare(self, name, report, deadline):
+        try:
+            if self.remote:
+                # Nothing to load here; the preloaders time the workers
+                detector = RemoteDetector(DETECTOR_BACKEND, MODEL_TYPES[name]["vehicle_classes"])
+                report.update({"detector": detector, "load_ms": 0.0, "warmup_ms": 0.0})
+            elif name == self.standby_name:
+                # Already loaded and warmed up when it was last active
+                report.update({"detector": self.standby, "load_ms": 0.0, "warmup_ms": 0.0})
+            else:
+                start_time = time.perf_counter()
+                new_detector = self._load(name)
+                report["load_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+
+                start_time = time.perf_counter()
+                new_detector.warmup()
+                report["warmup_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+                report["detector"] = new_detector
+
+            for preload in self.preloaders:
+                timings = preload(self.get_spec(name), max(deadline - time.time(), 0))
+                if timings is not None:
+                    report["workers_load_ms"] = timings["load_ms"]
+                    report["workers_warmup_ms"] = timings["warmup_ms"]
+                    report["load_ms"] = round(report["load_ms"] + timings["load_ms"], 2)
+                    report["warmup_ms"] = round(report["warmup_ms"] + timings["warmup_ms"], 2)
+        except Exception as e:
+            report["error"] = str(e)
+
+    def switch(self, name, timeout=SWITCH_TIMEOUT):
+        """Load `name` in the background and swap it in; returns a timing report"""
+        if name not in MODEL_TYPES:
+            raise ValueError(f"Unknown model type '{name}'")
+        with self.switch_lock:
+            if name == self.active_name:
+                return {"model": name, "load_ms": 0.0, "warmup_ms": 0.0, "swap_ms": 0.0, "unchanged": True}
+
+            report = {"model": name}
+            loader = Thread(target=self._prepare, args=(name, report, time.time() + timeout), daemon=True)
+            loader.start()
+            loader.join(timeout)
+            if loader.is_alive():
+                raise TimeoutError(f"{name} model did not load within {timeout} seconds")
+            if "error" in report:
+                raise RuntimeError(report["error"])
+
+            start_time = time.perf_counter()
+            self.standby, self.standby_name = self.active, self.active_name
+            self.active, self.active_name = report.pop("detector"), name
+            report["swap_ms"] = round((time.perf_counter() - start_time) * 1000, 4)
+            report["backend"] = self.active.backend
+            self.last_switch = dict(report, time=time.time())
+            return report
+
+    def get_status(self):
+        return {
+            "active": self.active_name,
+            "active_backend": self.active.backend,
+            "standby": self.standby_name,
+            "last_switch": self.last_switch
+        }
+
+model_registry = ModelRegistry(detector, "pretrained", remote=bool(INFERENCE_WORKERS))
@@ -0,0 +1,73 @@
+import cv2
+
+MOTION_WIDTH = 160  # frames are compared at this width
+PIXEL_THRESHOLD = 25  # grey-level change for a pixel to count as changed
+BLUR_KERNEL = (5, 5)
+
+class MotionGate:
+    """Cheap pre-filter deciding whether a frame is worth running the detector on.
+
+    The frame is downscaled, converted to grey and compared with the frame
+    the detector last ran on (optionally only inside a lane mask). If less
+    than `threshold` of the pixels changed, the previous detections can be
+    reused. Inference is still forced at least every `max_skip_seconds` so a
+    missed change can never hide a lane for long.
+    """
+
+    def __init__(self, threshold, max_skip_seconds, mask=None):
+        self.threshold = threshold
+        self.max_skip_seconds = max_skip_seconds
+        self.mask = mask
+        self.small_mask = None
+        self.reference = None
+        self.last_inference_time = 0
+        self.last_change = 0.0
+        self.stats = {"checks": 0, "skipped": 0, "forced": 0}
+
+    def set_mask(self, mask):
+        self.mask = mask
+        self.small_mask = None
+        self.reference = None
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(MOTION_WIDTH / width, 1.0)
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        gray = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if self.mask is not None and (self.small_mask is None or self.small_mask.shape != gray.shape):
+            self.small_mask = cv2.resize(self.mask, size, interpolation=cv2.INTER_NEAREST) > 0
+        return cv2.GaussianBlur(gray, BLUR_KERNEL, 0)
+
+    def should_infer(self, frame, now):
+        """True if the frame changed enough (or it has been too long) to run the detector"""
+        self.stats["checks"] += 1
+        gray = self._prepare(frame)
+        if self.reference is None or self.reference.shape != gray.shape:
+            self._accept(gray, now)
+            return True
+
+        changed = cv2.absdiff(gray, self.reference) > PIXEL_THRESHOLD
+        if self.small_mask is not None:
+            self.last_change = float(changed[self.small_mask].mean()) if self.small_mask.any() else 0.0
+        else:
+            self.last_change = float(changed.mean())
+
+        if self.last_change >= self.threshold:
+            self._accept(gray, now)
+            return True
+        if now - self.last_inference_time >= self.max_skip_seconds:
+            self.stats["forced"] += 1
+            self._accept(gray, now)
+            return True
+        self.stats["skipped"] += 1
+        return False
+
+    def _accept(self, gray, now):
+        self.reference = gray
+        self.last_inference_time = now
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["skip_rate"] = round(stats["skipped"] / stats["checks"], 3) if stats["checks"] else 0.0
+        stats["last_change"] = round(self.last_change, 4)
+        return stats
@@ -0,0 +1,87 @@
+import numpy as np
+
+# Vehicle types reported by the counter and stored in traffic_data.vehicle_type
+VEHICLE_TYPES = ("Cars", "Trucks", "Motorcycles", "Buses", "Emergency")
+EMERGENCY = VEHICLE_TYPES.index("Emergency")
+# Bin for classes that count as vehicles but have no reported type (e.g. rickshaw)
+OTHER_VEHICLE = len(VEHICLE_TYPES)
+NOT_A_VEHICLE = -1
+# Type table of detections already converted by to_vehicle_types()
+TYPED_VEHICLES = np.arange(OTHER_VEHICLE + 1)
+
+_TYPE_BY_CLASS_NAME = {
+    "ambulance": "Emergency",
+    "car": "Cars",
+    "motorbike": "Motorcycles",
+    "bike": "Motorcycles",
+    "bus": "Buses",
+    "truck": "Trucks"
+}
+
+class Detections:
+    """Boxes of one frame as whole NumPy arrays (xyxy, conf, cls)"""
+    __slots__ = ("xyxy", "conf", "cls")
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0))
+
+    @classmethod
+    def from_results(cls, results):
+        """Pull every box out of ultralytics results with one device transfer per result"""
+        xyxy, conf, class_ids = [], [], []
+        for r in results:
+            boxes = r.boxes.cpu().numpy()
+            xyxy.append(boxes.xyxy)
+            conf.append(boxes.conf)
+            class_ids.append(boxes.cls)
+        if not xyxy:
+            return cls.empty()
+        return cls(np.concatenate(xyxy), np.concatenate(conf), np.concatenate(class_ids))
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __getitem__(self, index):
+        return Detections(self.xyxy[index], self.conf[index], self.cls[index])
+
+def build_type_table(vehicle_classes):
+    """Map class id -> index into VEHICLE_TYPES (OTHER_VEHICLE / NOT_A_VEHICLE otherwise)"""
+    size = max(vehicle_classes) + 1 if vehicle_classes else 1
+    table = np.full(size, NOT_A_VEHICLE, dtype=np.int64)
+    for class_id, name in vehicle_classes.items():
+        vehicle_type = _TYPE_BY_CLASS_NAME.get(name)
+        table[class_id] = VEHICLE_TYPES.index(vehicle_type) if vehicle_type else OTHER_VEHICLE
+    return table
+
+def vehicle_type_ids(detections, type_table):
+    """Vehicle type index for every box, NOT_A_VEHICLE for unknown/out-of-table classes"""
+    cls = detections.cls
+    in_table = (cls >= 0) & (cls < len(type_table))
+    return np.where(in_table, type_table[np.clip(cls, 0, len(type_table) - 1)], NOT_A_VEHICLE)
+
+def filter_vehicles(detections, type_table):
+    return detections[vehicle_type_ids(detections, type_table) != NOT_A_VEHICLE]
+
+def to_vehicle_types(detections, type_table):
+    """Keep vehicle boxes only, with class ids replaced by vehicle type ids.
+
+    Detections converted this way look the same whatever model (and class
+    map) produced them; use TYPED_VEHICLES as their type table.
+    """
+    type_ids = vehicle_type_ids(detections, type_table)
+    keep = type_ids != NOT_A_VEHICLE
+    return Detections(detections.xyxy[keep], detections.conf[keep], type_ids[keep])
+
+def summarize_vehicles(detections, type_table):
+    """Return (vehicle_count, per-type counts dict, ambulance_detected) for one frame"""
+    type_ids = vehicle_type_ids(detections, type_table)
+    type_ids = type_ids[type_ids != NOT_A_VEHICLE]
+    per_type = np.bincount(type_ids, minlength=OTHER_VEHICLE + 1)
+    type_counts = dict(zip(VEHICLE_TYPES, per_type[:OTHER_VEHICLE].tolist()))
+    return int(len(type_ids)), type_counts, bool(per_type[EMERGENCY])
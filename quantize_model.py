@@ -0,0 +1,152 @@
+"""Build the INT8 detector and check it against the FP32 model on the lane videos.
+
+    python quantize_model.py --weights yolo12s.pt --mode static
+
+Static quantization is calibrated on frames sampled from videos/Lane_*.mp4;
+dynamic quantization only needs the weights. The quantized model is then run
+next to the FP32 ONNX model on a different set of lane frames and the
+latency and per-frame vehicle count agreement are reported. The result is
+written to a manifest next to the model; `detectors.create_detector` refuses
+the "onnx-int8" backend unless that manifest shows agreement of at least
+QUANTIZED_MIN_AGREEMENT (environment variable, 0.95 by default).
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+from detectors import (exported_path, quantized_manifest_path, OnnxDetector,
+                       QuantizedOnnxDetector, QUANTIZED_MIN_AGREEMENT, DEFAULT_IMGSZ)
+from postprocess import summarize_vehicles
+
+VIDEO_PATTERN = os.path.join("videos", "Lane_*.mp4")
+VEHICLE_CLASSES = {0: "ambulance", 2: "car", 3: "motorbike", 5: "bus", 7: "truck"}
+
+def sample_frames(count, offset=0.0):
+    """`count` frames spread evenly over all lane videos; `offset` (0-1) shifts the sample points"""
+    paths = sorted(glob.glob(VIDEO_PATTERN))
+    if not paths:
+        raise FileNotFoundError(f"No lane videos match {VIDEO_PATTERN}")
+    frames = []
+    per_video = max(count // len(paths), 1)
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for index in range(per_video):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int((index + offset) * total / per_video) % max(total, 1))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    return frames
+
+class LaneCalibrationReader:
+    """onnxruntime CalibrationDataReader feeding preprocessed lane frames one at a time"""
+
+    def __init__(self, detector, frames):
+        self.input_name = detector.input_name
+        self.batches = iter([detector.preprocess([frame])[0] for frame in frames])
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+    def rewind(self):
+        pass
+
+def quantize(weights, mode, calibration_frames, imgsz=DEFAULT_IMGSZ):
+    from onnxruntime.quantization import quantize_dynamic, quantize_static, QuantFormat, QuantType
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    source = exported_path(weights, OnnxDetector.backend)
+    if not os.path.exists(source):
+        from export_model import export
+        export(OnnxDetector.backend, weights, imgsz)
+    target = exported_path(weights, QuantizedOnnxDetector.backend)
+    # A new model invalidates the previous accuracy check until compare() reruns
+    manifest_path = quantized_manifest_path(weights)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    prepared = f"{os.path.splitext(target)[0]}.prep.onnx"
+    quant_pre_process(source, prepared, skip_symbolic_shape=True)
+
+    try:
+        if mode == "dynamic":
+            quantize_dynamic(prepared, target, weight_type=QuantType.QInt8)
+        else:
+            fp32 = OnnxDetector(source, VEHICLE_CLASSES, imgsz=imgsz)
+            reader = LaneCalibrationReader(fp32, sample_frames(calibration_frames))
+            quantize_static(prepared, target, reader, quant_format=QuantFormat.QDQ,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                            per_channel=True)
+    finally:
+        os.remove(prepared)
+    return target
+
+def time_predictions(detector, frames):
+    detector.warmup()
+    latencies, detections = [], []
+    for frame in frames:
+        start_time = time.perf_counter()
+        detections.append(detector.predict([frame])[0])
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return np.array(latencies), detections
+
+def compare(reference, candidate, frames):
+    """Latency and vehicle count agreement of `candidate` relative to `reference`"""
+    reference_latency, reference_detections = time_predictions(reference, frames)
+    candidate_latency, candidate_detections = time_predictions(candidate, frames)
+
+    agreements = []
+    for expected, actual in zip(reference_detections, candidate_detections):
+        expected_count, expected_types, _ = summarize_vehicles(expected, reference.type_table)
+        actual_count, actual_types, _ = summarize_vehicles(actual, candidate.type_table)
+        # Per-type counts, so swapping a car for a truck is not "agreement"
+        difference = sum(abs(expected_types[name] - actual_types[name]) for name in expected_types)
+        difference += abs((expected_count - sum(expected_types.values())) - (actual_count - sum(actual_types.values())))
+        agreements.append(1 - difference / max(expected_count, actual_count, 1))
+
+    return {
+        "frames": len(frames),
+        "fp32_latency_ms": round(float(reference_latency.mean()), 2),
+        "fp32_latency_p95_ms": round(float(np.percentile(reference_latency, 95)), 2),
+        "int8_latency_ms": round(float(candidate_latency.mean()), 2),
+        "int8_latency_p95_ms": round(float(np.percentile(candidate_latency, 95)), 2),
+        "speedup": round(float(reference_latency.mean() / max(candidate_latency.mean(), 1e-6)), 2),
+        "count_agreement": round(float(np.mean(agreements)), 4)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize the detector to INT8 and compare it with FP32")
+    parser.add_argument("--weights", default="yolo12s.pt")
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--calibration-frames", type=int, default=64)
+    parser.add_argument("--eval-frames", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    target = quantize(args.weights, args.mode, args.calibration_frames, args.imgsz)
+    print(f"Quantized model written to {target}")
+
+    reference = OnnxDetector(exported_path(args.weights, OnnxDetector.backend), VEHICLE_CLASSES,
+                             imgsz=args.imgsz, threads=args.threads)
+    candidate = QuantizedOnnxDetector(target, VEHICLE_CLASSES, imgsz=args.imgsz, threads=args.threads)
+    # Evaluate on frames between the calibration samples
+    report = compare(reference, candidate, sample_frames(args.eval_frames, offset=0.5))
+    report.update({
+        "mode": args.mode,
+        "weights": args.weights,
+        "min_agreement": QUANTIZED_MIN_AGREEMENT,
+        "approved": report["count_agreement"] >= QUANTIZED_MIN_AGREEMENT
+    })
+    with open(quantized_manifest_path(args.weights), "w") as f:
+        json.dump(report, f, indent=2)
+
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if not report["approved"]:
+        print(f"Count agreement {report['count_agreement']} is below {QUANTIZED_MIN_AGREEMENT}; "
+              "the onnx-int8 backend will not be used")
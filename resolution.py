@@ -0,0 +1,74 @@
+IMGSZ_LOW = 320
+IMGSZ_HIGH = 640
+DENSE_ENTER = 6  # vehicles in the lane before it switches to the high resolution
+DENSE_EXIT = 3  # ...and at or below which it may drop back to the low one
+AMBULANCE_HOLD = 10.0  # seconds the high resolution is kept after an ambulance was seen
+MIN_HOLD = 2.0  # seconds a chosen size is kept before it may change again
+OVERLOAD_ENTER = 0.3  # seconds of average queue + inference latency that mark the system as overloaded
+OVERLOAD_EXIT = 0.15
+LATENCY_SMOOTHING = 0.2
+
+class LoadMonitor:
+    """Smoothed request latency with hysteresis: `overloaded` turns on above
+    `enter` seconds and only turns off again below `exit` seconds."""
+
+    def __init__(self, enter=OVERLOAD_ENTER, exit=OVERLOAD_EXIT):
+        self.enter = enter
+        self.exit = exit
+        self.latency = 0.0
+        self.overloaded = False
+
+    def observe(self, latency):
+        self.latency = latency if self.latency == 0.0 else (
+            LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.latency)
+        if self.latency > self.enter:
+            self.overloaded = True
+        elif self.latency < self.exit:
+            self.overloaded = False
+        return self.overloaded
+
+class ResolutionPolicy:
+    """Chooses the detector input size for one lane.
+
+    An ambulance seen in the last AMBULANCE_HOLD seconds always gets the high
+    resolution. Otherwise an overloaded system drops to the low resolution,
+    and a lane runs at the high one only while it is dense. Density uses
+    separate enter/exit thresholds and every change is held for at least
+    MIN_HOLD seconds, so the size does not flap between batches.
+    """
+
+    def __init__(self, low=IMGSZ_LOW, high=IMGSZ_HIGH):
+        self.low = low
+        self.high = high
+        self.imgsz = high
+        self.reason = "initial"
+        self.dense = True
+        self.last_ambulance = None
+        self.last_change = None
+
+    def update(self, vehicle_count, ambulance_detected, overloaded, now):
+        """Feed the outcome of one inference; returns the size for the next one"""
+        if ambulance_detected:
+            self.last_ambulance = now
+        if vehicle_count >= DENSE_ENTER:
+            self.dense = True
+        elif vehicle_count <= DENSE_EXIT:
+            self.dense = False
+
+        if self.last_ambulance is not None and now - self.last_ambulance < AMBULANCE_HOLD:
+            imgsz, reason = self.high, "ambulance"
+        elif overloaded:
+            imgsz, reason = self.low, "overloaded"
+        elif self.dense:
+            imgsz, reason = self.high, "dense"
+        else:
+            imgsz, reason = self.low, "sparse"
+
+        # Ambulances switch up immediately; everything else waits out the hold time
+        if imgsz != self.imgsz and (reason == "ambulance" or self.last_change is None
+                                    or now - self.last_change >= MIN_HOLD):
+            self.imgsz = imgsz
+            self.last_change = now
+        if imgsz == self.imgsz:
+            self.reason = reason
+        return self.imgsz
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+
+class LaneRegion:
+    """Polygon region of interest for one lane, in pixel coordinates of a given frame size.
+
+    Inference runs on the polygon's bounding rectangle only; boxes are then
+    moved back to frame coordinates and kept only if their bottom centre (where
+    the vehicle touches the road) lies inside the polygon.
+    """
+
+    def __init__(self, polygon, frame_shape):
+        height, width = frame_shape[:2]
+        self.frame_shape = tuple(frame_shape[:2])
+        points = np.asarray(polygon, dtype=np.float32) * np.array([width, height], dtype=np.float32)
+        self.points = np.round(points).astype(np.int32).reshape(-1, 1, 2)
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(self.mask, [self.points], 255)
+        x, y, w, h = cv2.boundingRect(self.points)
+        self.x1, self.y1 = max(x, 0), max(y, 0)
+        self.x2, self.y2 = min(x + w, width), min(y + h, height)
+        self.offset = np.array([self.x1, self.y1, self.x1, self.y1], dtype=np.float32)
+
+    def crop(self, frame):
+        return np.ascontiguousarray(frame[self.y1:self.y2, self.x1:self.x2])
+
+    def contains(self, detections):
+        """Boolean mask of boxes whose bottom centre lies inside the polygon"""
+        height, width = self.mask.shape
+        xs = np.clip(((detections.xyxy[:, 0] + detections.xyxy[:, 2]) / 2).astype(np.int64), 0, width - 1)
+        ys = np.clip(detections.xyxy[:, 3].astype(np.int64), 0, height - 1)
+        return self.mask[ys, xs] > 0
+
+    def to_frame(self, detections):
+        """Move boxes detected on the crop back to frame coordinates and drop those outside"""
+        detections.xyxy += self.offset
+        return detections[self.contains(detections)]
+
+    def draw(self, frame):
+        cv2.polylines(frame, [self.points], True, (255, 255, 0), 1)
+        return frame
@@ -0,0 +1,197 @@
+"""Rollup tables kept up to date by the traffic_data writer.
+
+Every batch inserted into traffic_data is aggregated in Python and added to
+these tables with one upsert per table, in the same transaction as the
+insert, so analytics never has to scan the raw history:
+
+    traffic_rollup_minute / traffic_rollup_hour   samples, summed and peak lane counts per bucket
+    traffic_type_rollup_hour                      samples per vehicle type per hour
+    traffic_totals                                all-time samples per (vehicle type, action, priority)
+
+Rows are keyed on created_at, the time the sample was taken, truncated
+in UTC like the traffic_data partitions. A NULL vehicle_type or action is
+stored as MISSING_KEY, since key columns cannot hold NULL; readers that
+treated NULL differently from other values filter that bucket out.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+
+BUCKET_TABLES = {"minute": "traffic_rollup_minute", "hour": "traffic_rollup_hour"}
+LANE_COLUMNS = ("lane1", "lane2", "lane3", "lane4")
+ROLLUP_TABLES = (*BUCKET_TABLES.values(), "traffic_type_rollup_hour", "traffic_totals")
+MISSING_KEY = ""  # the writer always sets both, so only legacy rows have no vehicle_type or action
+
+def create_rollup_tables(cur):
+    """Create the rollup tables; returns the bucket tables whose lane peaks were rebuilt from traffic_data"""
+    rebuilt = []
+    for unit, table in BUCKET_TABLES.items():
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+        """, (table,))
+        existing = {row[0] for row in cur.fetchall()}
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TIMESTAMPTZ PRIMARY KEY,
+                samples INTEGER NOT NULL,
+                lane1 BIGINT NOT NULL,
+                lane2 BIGINT NOT NULL,
+                lane3 BIGINT NOT NULL,
+                lane4 BIGINT NOT NULL,
+                vehicles BIGINT NOT NULL,
+                max_count INTEGER NOT NULL,
+                ambulance_samples INTEGER NOT NULL,
+                lane1_max INTEGER NOT NULL DEFAULT 0,
+                lane2_max INTEGER NOT NULL DEFAULT 0,
+                lane3_max INTEGER NOT NULL DEFAULT 0,
+                lane4_max INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Per-lane peaks, added for the /api/traffic-series maxima; buckets
+        # from before that get theirs from the raw rows that are still kept
+        missing = [lane for lane in LANE_COLUMNS if existing and f"{lane}_max" not in existing]
+        if missing:
+            for lane in missing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {lane}_max INTEGER NOT NULL DEFAULT 0")
+            _rebuild_lane_max(cur, unit, table)
+            rebuilt.append(table)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS traffic_type_rollup_hour (
+            bucket TIMESTAMPTZ,
+            vehicle_type VARCHAR(50),
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (bucket, vehicle_type)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS traffic_totals (
+            vehicle_type VARCHAR(50),
+            action VARCHAR(50),
+            priority BOOLEAN,
+            samples BIGINT NOT NULL,
+            PRIMARY KEY (vehicle_type, action, priority)
+        )
+    """)
+    return rebuilt
+
+def _rebuild_lane_max(cur, unit, table):
+    cur.execute(f"""
+        UPDATE {table} AS t
+        SET lane1_max = d.lane1_max, lane2_max = d.lane2_max, lane3_max = d.lane3_max, lane4_max = d.lane4_max
+        FROM (
+            SELECT date_trunc('{unit}', created_at, 'UTC') AS bucket,
+                   COALESCE(MAX(lane1), 0) AS lane1_max, COALESCE(MAX(lane2), 0) AS lane2_max,
+                   COALESCE(MAX(lane3), 0) AS lane3_max, COALESCE(MAX(lane4), 0) AS lane4_max
+            FROM traffic_data
+            GROUP BY 1
+        ) AS d
+        WHERE t.bucket = d.bucket
+    """)
+
+def backfill_rollups(cur):
+    """Build the rollups from existing traffic_data rows, once, when they are still empty"""
+    cur.execute("SELECT EXISTS (SELECT 1 FROM traffic_totals)")
+    if cur.fetchone()[0]:
+        return False
+    for unit, table in BUCKET_TABLES.items():
+        cur.execute(f"""
+            INSERT INTO {table}
+            SELECT date_trunc('{unit}', created_at, 'UTC'), COUNT(*),
+                   COALESCE(SUM(lane1), 0), COALESCE(SUM(lane2), 0), COALESCE(SUM(lane3), 0),
+                   COALESCE(SUM(lane4), 0), COALESCE(SUM(count), 0), COALESCE(MAX(count), 0),
+                   COUNT(*) FILTER (WHERE action = 'Ambulance'),
+                   COALESCE(MAX(lane1), 0), COALESCE(MAX(lane2), 0), COALESCE(MAX(lane3), 0),
+                   COALESCE(MAX(lane4), 0)
+            FROM traffic_data
+            GROUP BY 1
+            ON CONFLICT (bucket) DO NOTHING
+        """)
+    cur.execute("""
+        INSERT INTO traffic_type_rollup_hour
+        SELECT date_trunc('hour', created_at, 'UTC'), COALESCE(vehicle_type, %(missing)s), COUNT(*)
+        FROM traffic_data
+        GROUP BY 1, 2
+        ON CONFLICT (bucket, vehicle_type) DO NOTHING
+    """, {"missing": MISSING_KEY})
+    cur.execute("""
+        INSERT INTO traffic_totals
+        SELECT COALESCE(vehicle_type, %(missing)s), COALESCE(action, %(missing)s), priority, COUNT(*)
+        FROM traffic_data
+        GROUP BY 1, 2, 3
+        ON CONFLICT (vehicle_type, action, priority) DO NOTHING
+    """, {"missing": MISSING_KEY})
+    return True
+
+def _bucket(created_at, unit):
+    if isinstance(created_at, str):
+        # Replayed from the writer's spill file
+        created_at = datetime.fromisoformat(created_at)
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    if unit == "hour":
+        return created_at.replace(minute=0, second=0, microsecond=0)
+    return created_at.replace(second=0, microsecond=0)
+
+def aggregate(columns, rows):
+    """Per-table {key: values} increments for a batch of traffic_data rows"""
+    # samples, lane1-4, vehicles, max_count, ambulance_samples, lane1_max-lane4_max
+    buckets = {unit: defaultdict(lambda: [0] * 12) for unit in BUCKET_TABLES}
+    types = defaultdict(int)
+    totals = defaultdict(int)
+    for row in rows:
+        sample = dict(zip(columns, row))
+        lanes = [int(sample[lane] or 0) for lane in LANE_COLUMNS]
+        vehicles = int(sample["count"] or 0)
+        ambulance = int(sample["action"] == "Ambulance")
+        for unit in BUCKET_TABLES:
+            values = buckets[unit][_bucket(sample["created_at"], unit)]
+            values[0] += 1
+            for index, lane in enumerate(lanes, 1):
+                values[index] += lane
+            values[5] += vehicles
+            values[6] = max(values[6], vehicles)
+            values[7] += ambulance
+            for index, lane in enumerate(lanes, 8):
+                values[index] = max(values[index], lane)
+        types[(_bucket(sample["created_at"], "hour"), sample["vehicle_type"] or MISSING_KEY)] += 1
+        totals[(sample["vehicle_type"] or MISSING_KEY, sample["action"] or MISSING_KEY, bool(sample["priority"]))] += 1
+    return buckets, types, totals
+
+def update_rollups(cur, columns, rows):
+    """Add a batch of just-inserted traffic_data rows to every rollup; one upsert per table.
+
+    Keys are aggregated first, because one INSERT ... ON CONFLICT cannot
+    update the same row twice.
+    """
+    buckets, types, totals = aggregate(columns, rows)
+    for unit, table in BUCKET_TABLES.items():
+        execute_values(cur, f"""
+            INSERT INTO {table} AS t
+                (bucket, samples, lane1, lane2, lane3, lane4, vehicles, max_count, ambulance_samples,
+                 lane1_max, lane2_max, lane3_max, lane4_max)
+            VALUES %s
+            ON CONFLICT (bucket) DO UPDATE SET
+                samples = t.samples + EXCLUDED.samples,
+                lane1 = t.lane1 + EXCLUDED.lane1,
+                lane2 = t.lane2 + EXCLUDED.lane2,
+                lane3 = t.lane3 + EXCLUDED.lane3,
+                lane4 = t.lane4 + EXCLUDED.lane4,
+                vehicles = t.vehicles + EXCLUDED.vehicles,
+                max_count = GREATEST(t.max_count, EXCLUDED.max_count),
+                ambulance_samples = t.ambulance_samples + EXCLUDED.ambulance_samples,
+                lane1_max = GREATEST(t.lane1_max, EXCLUDED.lane1_max),
+                lane2_max = GREATEST(t.lane2_max, EXCLUDED.lane2_max),
+                lane3_max = GREATEST(t.lane3_max, EXCLUDED.lane3_max),
+                lane4_max = GREATEST(t.lane4_max, EXCLUDED.lane4_max)
+        """, [(bucket, *values) for bucket, values in buckets[unit].items()])
+    execute_values(cur, """
+        INSERT INTO traffic_type_rollup_hour AS t (bucket, vehicle_type, samples)
+        VALUES %s
+        ON CONFLICT (bucket, vehicle_type) DO UPDATE SET samples = t.samples + EXCLUDED.samples
+    """, [(*key, samples) for key, samples in types.items()])
+    execute_values(cur, """
+        INSERT INTO traffic_totals AS t (vehicle_type, action, priority, samples)
+        VALUES %s
+        ON CONFLICT (vehicle_type, action, priority) DO UPDATE SET samples = t.samples + EXCLUDED.samples
+    """, [(*key, samples) for key, samples in totals.items()])
@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from threading import Condition
+import json
+import secrets
+
+STATE_HISTORY = 120  # versions kept for ?since= deltas (about two minutes of controller ticks)
+KEEPALIVE_INTERVAL = 15  # seconds between SSE comments on an idle stream, so dead clients are noticed
+
+class StateSnapshot:
+    """Versioned, pre-serialized snapshot of the dashboard state served by /state.
+
+    `publish()` is called once per controller tick with a dict of sections
+    (each a dict keyed by lane). A new version is only created when something
+    changed, and its JSON is built once, so every poller gets the same bytes.
+    `response()` answers 304 to a matching If-None-Match and, for
+    `since=<version>`, returns only the lanes that changed in each section.
+    The same deltas are pushed to Server-Sent Events streams (`event()`),
+    which wake up on `wait_for_change()` or through a listener.
+
+    Clients see versions as "<epoch>-<version>" cursors (the ETag, the
+    `version` field and the SSE id). The epoch is new for every snapshot
+    object, so after a restart a client's old cursor reads as unknown
+    (`parse_cursor()` gives None) and it gets the full snapshot, instead
+    of matching a new version that happens to have the same number.
+    """
+
+    def __init__(self, event_name="state", history=STATE_HISTORY):
+        self.event_name = event_name
+        self.epoch = secrets.token_hex(4)
+        self.condition = Condition()
+        self.listeners = []
+        self.version = 0
+        self.state = None
+        self.body = b'{}'
+        self.history = OrderedDict()
+        self.history_size = history
+        self.deltas = {}
+
+    @property
+    def cursor(self):
+        return self._cursor(self.version)
+
+    @property
+    def etag(self):
+        return f'"{self.cursor}"'
+
+    def _cursor(self, version):
+        return f"{self.epoch}-{version}"
+
+    def parse_cursor(self, value):
+        """Version from a `since` or Last-Event-ID cursor; None if malformed or from another epoch"""
+        epoch, _, version = (value or "").partition("-")
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(version)
+        except ValueError:
+            return None
+
+    def add_listener(self, callback):
+        """Call `callback()` from the publishing thread whenever a new version is stored"""
+        with self.condition:
+            self.listeners.append(callback)
+
+    def publish(self, state):
+        """Store `state` as a new version unless it equals the current one; returns the version"""
+        with self.condition:
+            if state == self.state:
+                return self.version
+            self.version += 1
+            self.state = state
+            self.body = json.dumps(dict(state, version=self.cursor)).encode()
+            self.history[self.version] = state
+            while len(self.history) > self.history_size:
+                self.history.popitem(last=False)
+            self.deltas = {}
+            self.condition.notify_all()
+            version, listeners = self.version, list(self.listeners)
+        for listener in listeners:
+            listener()
+        return version
+
+    def wait_for_change(self, version, timeout=KEEPALIVE_INTERVAL):
+        """Block until there is a version newer than `version`; False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.version > version, timeout=timeout)
+
+    def response(self, if_none_match=None, since=None):
+        """(status, body, etag) for a request; `since` is a version from parse_cursor().
+        Deltas fall back to the full snapshot when it is too old or unknown"""
+        with self.condition:
+            etag = self.etag
+            if if_none_match and etag in if_none_match:
+                return 304, b'', etag
+            return 200, self._body(since), etag
+
+    def event(self, since=None):
+        """(version, SSE message) bringing a client at `since` up to date; no message if it already is"""
+        with self.condition:
+            if since is not None and since == self.version:
+                return self.version, None
+            body = self._body(since).decode()
+            message = f"id: {self.cursor}\nevent: {self.event_name}\ndata: {body}\n\n"
+            return self.version, message.encode()
+
+    def _body(self, since):
+        # Caller holds the condition
+        if since is None or since not in self.history or since > self.version:
+            return self.body
+        body = self.deltas.get(since)
+        if body is None:
+            body = self.deltas[since] = json.dumps(self._delta(since)).encode()
+        return body
+
+    def _delta(self, since):
+        # Caller holds the condition
+        base = self.history[since]
+        delta = {"version": self.cursor, "since": self._cursor(since), "delta": True}
+        for section, values in self.state.items():
+            previous = base.get(section, {})
+            delta[section] = {key: value for key, value in values.items() if previous.get(key) != value}
+        return delta
+
+KEEPALIVE = b": keepalive\n\n"
+
+def event_stream(snapshot, since=None):
+    """Server-Sent Events body for threaded servers: one delta per new version,
+    coalescing any versions published while the previous message was sent"""
+    while True:
+        since, message = snapshot.event(since)
+        yield message if message is not None else KEEPALIVE
+        snapshot.wait_for_change(since)
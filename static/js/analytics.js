@@ -13,15 +13,33 @@ let ambulanceTimelineChart, performanceChart, confusionMatrixChart;
 
 // Store latest data
 let latestData = [];
-const DATA_REFRESH_INTERVAL = 3000; // Refresh every 3 seconds for live updates
+const DATA_REFRESH_INTERVAL = 3000; // Polling fallback for browsers without EventSource
+
+// History ranges are served pre-aggregated by /api/traffic-series; 'live' shows the latest rows
+const TIME_RANGES = {
+    '1h': { ms: 60 * 60 * 1000, bucket: '1m' },
+    '24h': { ms: 24 * 60 * 60 * 1000, bucket: '15m' },
+    '7d': { ms: 7 * 24 * 60 * 60 * 1000, bucket: '1h' }
+};
+let timeRange = 'live';
 
 // Initialize all charts when the page loads
 document.addEventListener('DOMContentLoaded', function() {
     initCharts();
-    fetchData(); // Initial data fetch
+    refreshData(); // Initial data fetch
+
+    document.getElementById('timeRange').addEventListener('change', event => {
+        timeRange = event.target.value;
+        refreshData();
+    });
     
-    // Set up periodic data refresh for live updates
-    setInterval(fetchData, DATA_REFRESH_INTERVAL);
+    // Refetch when the server reports a newly saved row, instead of on a timer
+    if (window.EventSource) {
+        const events = new EventSource('/api/traffic-data/events');
+        events.addEventListener('traffic-data', refreshData);
+    } else {
+        setInterval(refreshData, DATA_REFRESH_INTERVAL);
+    }
     
     // Update current time
     updateTime();
@@ -39,6 +57,13 @@ function loadLiveTraffic() {
     window.location.href = '/live_content';
 }
 
+function refreshData() {
+    fetchData();
+    if (timeRange !== 'live') {
+        fetchSeries();
+    }
+}
+
 // Fetch data from API
 async function fetchData() {
     try {
@@ -50,9 +75,12 @@ async function fetchData() {
         
         // Update all charts with new data
         if (data.trafficData && data.trafficData.length > 0) {
-            updateVehicleCountChart(data.trafficData);
-            updateLaneDistributionChart(data.trafficData);
-            updateVehicleTypeChart(data.vehicleTypes);
+            // With a history range selected these three charts come from fetchSeries()
+            if (timeRange === 'live') {
+                updateVehicleCountChart(data.trafficData);
+                updateLaneDistributionChart(data.trafficData);
+                updateVehicleTypeChart(data.vehicleTypes);
+            }
             updateAmbulanceDetection(data.trafficData);
             updatePerformanceCharts(data.trafficData, data.confusionMatrix);
             
@@ -75,6 +103,59 @@ async function fetchData() {
     }
 }
 
+// Fetch bucketed averages for the selected range; completed buckets are cached server-side
+async function fetchSeries() {
+    const range = timeRange;
+    const to = new Date();
+    const from = new Date(to.getTime() - TIME_RANGES[range].ms);
+    const params = new URLSearchParams({
+        from: from.toISOString(),
+        to: to.toISOString(),
+        bucket: TIME_RANGES[range].bucket
+    });
+    try {
+        const response = await fetch(`/api/traffic-series?${params}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+        const series = await response.json();
+        // Ignore the answer if another range was picked while it loaded
+        if (range === timeRange) {
+            updateSeriesCharts(series);
+        }
+    } catch (error) {
+        console.error('Error fetching traffic series:', error);
+    }
+}
+
+function formatBucketTime(time, bucketSeconds) {
+    const date = new Date(time);
+    if (bucketSeconds >= 3600) {
+        return date.toLocaleString([], { month: 'short', day: 'numeric', hour: '2-digit' });
+    }
+    return date.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+}
+
+function updateSeriesCharts(series) {
+    const labels = series.time.map(time => formatBucketTime(time, series.bucketSeconds));
+
+    vehicleCountChart.data.labels = labels;
+    vehicleCountChart.data.datasets[0].data = series.vehicles;
+    vehicleCountChart.update();
+
+    laneDistributionChart.data.labels = labels;
+    laneDistributionChart.data.datasets.forEach((dataset, index) => {
+        dataset.data = series.avg[`Lane${index + 1}`];
+    });
+    laneDistributionChart.update();
+
+    const vehicleTypes = {};
+    vehicleTypeChart.data.labels.forEach(type => {
+        vehicleTypes[type] = series.vehicleTypes[type] || 0;
+    });
+    updateVehicleTypeChart(vehicleTypes);
+}
+
 // Add a visual indicator for data updates
 function flashUpdateIndicator() {
     const indicator = document.getElementById('update-indicator');
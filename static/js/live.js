@@ -7,72 +7,93 @@ function updateStats() {
     document.getElementById('total-vehicles').textContent = total;
 }
 
-function updateTrafficLights() {
-    fetch('/traffic_states')
-        .then(response => response.json())
-        .then(states => {
-            for (let lane in states) {
-                const laneElement = document.querySelector(`.lane-card:nth-child(${lane})`);
-                const redLight = laneElement.querySelector('.light.red');
-                const yellowLight = laneElement.querySelector('.light.yellow');
-                const greenLight = laneElement.querySelector('.light.green');
-                const timer = laneElement.querySelector('.digital-timer');
-                const timerDisplay = timer.querySelector('span');
+// Last /state snapshot, patched in place by delta responses
+let stateVersion = null;
+let stateEtag = null;
+const dashboardState = {traffic_states: {}, vehicle_counts: {}, ambulance_status: {}};
 
-                redLight.classList.toggle('active', states[lane].color === 'red');
-                yellowLight.classList.toggle('active', states[lane].color === 'yellow');
-                greenLight.classList.toggle('active', states[lane].color === 'green');
-                
-                // Update timer color and value
-                timer.classList.toggle('green', states[lane].color === 'green');
-                timerDisplay.textContent = states[lane].timer.toString().padStart(2, '0');
+function renderTrafficLights(states) {
+    for (let lane in states) {
+        const laneElement = document.querySelector(`.lane-card:nth-child(${lane})`);
+        const redLight = laneElement.querySelector('.light.red');
+        const yellowLight = laneElement.querySelector('.light.yellow');
+        const greenLight = laneElement.querySelector('.light.green');
+        const timer = laneElement.querySelector('.digital-timer');
+        const timerDisplay = timer.querySelector('span');
 
-                // Update average wait time
-                const avgWait = Math.max(...Object.values(states).map(s => s.remaining_red || 0));
-                document.getElementById('avg-wait').textContent = `${avgWait}s`;
-            }
-        })
-        .catch(error => console.error('Error:', error));
+        redLight.classList.toggle('active', states[lane].color === 'red');
+        yellowLight.classList.toggle('active', states[lane].color === 'yellow');
+        greenLight.classList.toggle('active', states[lane].color === 'green');
+        
+        // Update timer color and value
+        timer.classList.toggle('green', states[lane].color === 'green');
+        timerDisplay.textContent = states[lane].timer.toString().padStart(2, '0');
+
+        // Update average wait time
+        const avgWait = Math.max(...Object.values(states).map(s => s.remaining_red || 0));
+        document.getElementById('avg-wait').textContent = `${avgWait}s`;
+    }
 }
 
-function updateVehicleCounts() {
-    fetch('/vehicle_counts')
-        .then(response => response.json())
-        .then(counts => {
-            Object.keys(counts).forEach(laneId => {
-                document.getElementById(`count-${laneId}`).textContent = counts[laneId];
-            });
-            updateStats();
-        })
-        .catch(error => console.error('Error:', error));
+function renderVehicleCounts(counts) {
+    Object.keys(counts).forEach(laneId => {
+        document.getElementById(`count-${laneId}`).textContent = counts[laneId];
+    });
+    updateStats();
 }
 
-function checkAmbulance() {
-    fetch('/ambulance_status')
-        .then(response => response.json())
-        .then(status => {
-            let emergencyCount = 0;
-            Object.keys(status).forEach(laneId => {
-                const indicator = document.getElementById(`ambulance-${laneId}`);
-                if (status[laneId]) {
-                    indicator.innerHTML = '<i class="fas fa-ambulance"></i> EMERGENCY';
-                    indicator.style.display = 'flex';
-                    emergencyCount++;
-                } else {
-                    indicator.style.display = 'none';
-                }
-            });
-            document.getElementById('emergency-count').textContent = emergencyCount;
+function renderAmbulance(status) {
+    let emergencyCount = 0;
+    Object.keys(status).forEach(laneId => {
+        const indicator = document.getElementById(`ambulance-${laneId}`);
+        if (status[laneId]) {
+            indicator.innerHTML = '<i class="fas fa-ambulance"></i> EMERGENCY';
+            indicator.style.display = 'flex';
+            emergencyCount++;
+        } else {
+            indicator.style.display = 'none';
+        }
+    });
+    document.getElementById('emergency-count').textContent = emergencyCount;
+}
+
+// Polling fallback, one request for signal state, counts and ambulance flags: 304 when nothing
+// changed, otherwise only the lanes that changed since our version
+function updateState() {
+    const url = stateVersion === null ? '/state' : `/state?since=${stateVersion}`;
+    const headers = stateEtag ? {'If-None-Match': stateEtag} : {};
+    fetch(url, {headers, cache: 'no-store'})
+        .then(response => {
+            if (response.status === 304) return null;
+            stateEtag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(update => {
+            if (update) applyState(update);
         })
         .catch(error => console.error('Error:', error));
 }
 
-// Initialize updates with error handling
-function initializeUpdates() {
-    updateTrafficLights();
-    updateVehicleCounts();
-    checkAmbulance();
+function applyState(update) {
+    Object.keys(dashboardState).forEach(section => {
+        if (update.delta) {
+            Object.assign(dashboardState[section], update[section] || {});
+        } else {
+            dashboardState[section] = update[section] || {};
+        }
+    });
+    stateVersion = update.version;
+    renderTrafficLights(dashboardState.traffic_states);
+    renderVehicleCounts(dashboardState.vehicle_counts);
+    renderAmbulance(dashboardState.ambulance_status);
 }
 
-setInterval(initializeUpdates, 1000);
-initializeUpdates();
\ No newline at end of file
+// The server pushes the same snapshot/deltas as they happen; the browser
+// reconnects on its own and resumes from the last version it saw
+if (window.EventSource) {
+    const events = new EventSource('/state/events');
+    events.addEventListener('state', event => applyState(JSON.parse(event.data)));
+} else {
+    setInterval(updateState, 1000);
+    updateState();
+}
@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest import mock
+from psycopg2.pool import PoolError
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ana
+
+class FakeCursor:
+    """Returns canned rows and records every statement it is given"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0]
+
+class FakeConnection:
+    closed = 0
+
+    def cursor(self, cursor_factory=None):
+        return mock.MagicMock()
+
+class FakePool:
+    """Like ThreadedConnectionPool, raises instead of waiting once every connection is out"""
+
+    def __init__(self, size):
+        self.free = [FakeConnection() for _ in range(size)]
+
+    def getconn(self):
+        if not self.free:
+            raise PoolError("connection pool exhausted")
+        return self.free.pop()
+
+    def putconn(self, conn, close=False):
+        self.free.append(conn)
+
+class TestPooledCursor(unittest.TestCase):
+    def setUp(self):
+        for patcher in (mock.patch.object(ana, "get_pool", lambda pool=FakePool(2): pool),
+                        mock.patch.object(ana, "_pool_slots", threading.BoundedSemaphore(2)),
+                        mock.patch.object(ana, "POOL_WAIT_TIMEOUT", 2)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def hold_connections(self, count, seconds):
+        """Threads that each keep a pooled cursor for `seconds`"""
+        holding = threading.Barrier(count + 1)
+
+        def hold():
+            with ana.pooled_cursor():
+                holding.wait()
+                time.sleep(seconds)
+
+        threads = [threading.Thread(target=hold) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        holding.wait()
+        return threads
+
+    def test_request_waits_for_a_free_connection(self):
+        threads = self.hold_connections(2, 0.2)
+        start_time = time.time()
+        with ana.pooled_cursor() as cur:
+            self.assertIsNotNone(cur)
+        self.assertGreaterEqual(time.time() - start_time, 0.1)
+        for thread in threads:
+            thread.join()
+
+    def test_wait_is_bounded(self):
+        ana.POOL_WAIT_TIMEOUT = 0.1
+        threads = self.hold_connections(2, 0.5)
+        with self.assertRaises(PoolError):
+            with ana.pooled_cursor():
+                pass
+        for thread in threads:
+            thread.join()
+        # Every slot was given back
+        with ana.pooled_cursor(), ana.pooled_cursor():
+            pass
+
+    def test_slot_released_when_query_fails(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                with ana.pooled_cursor():
+                    raise ValueError("bad query")
+        with ana.pooled_cursor(), ana.pooled_cursor():
+            pass
+
+class TestAnalyticsQueries(unittest.TestCase):
+    def test_vehicle_types_in_one_query(self):
+        cur = FakeCursor([{"vehicle_type": "Cars", "count": 12}, {"vehicle_type": "Buses", "count": 3}])
+        counts = ana.query_vehicle_types(cur)
+        self.assertEqual(len(cur.statements), 1)
+        self.assertIn("GROUP BY vehicle_type", cur.statements[0][0])
+        self.assertEqual(counts, {"Cars": 12, "Trucks": 0, "Motorcycles": 0, "Buses": 3, "Emergency": 0})
+
+    def test_confusion_matrix_in_one_query(self):
+        cur = FakeCursor([{"True Positive": 4, "False Positive": 1, "True Negative": 20, "False Negative": 2}])
+        matrix = ana.query_confusion_matrix(cur)
+        self.assertEqual(len(cur.statements), 1)
+        self.assertEqual(cur.statements[0][0].count("FILTER"), 4)
+        # Samples without an action are neither negatives nor positives
+        self.assertEqual(cur.statements[0][0].count("NOT IN ('Ambulance', %(missing)s)"), 2)
+        self.assertEqual(cur.statements[0][1], {"missing": ""})
+        self.assertEqual(matrix, [
+            {"name": "True Positive", "value": 4},
+            {"name": "False Positive", "value": 1},
+            {"name": "True Negative", "value": 20},
+            {"name": "False Negative", "value": 2}
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+import sys
+import os
+import numpy as np
+import requests
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Start the server first, e.g. `python asgi_app.py` (or `python app.py` to compare)
+BASE_URL = os.environ.get("LOAD_TEST_URL", "http://127.0.0.1:5000")
+CONNECTION_LEVELS = [10, 50, 100, 200]
+POLL_REQUESTS = 20
+STREAM_QUERY = "?width=320&quality=40&fps=2"
+
+class StreamClient(threading.Thread):
+    """Holds one MJPEG connection open and records the time to its first chunk"""
+
+    def __init__(self, lane_id, stop):
+        super().__init__(daemon=True)
+        self.url = f"{BASE_URL}/video_feed/{lane_id}{STREAM_QUERY}"
+        self.stop = stop
+        self.first_chunk_ms = None
+        self.bytes_read = 0
+        self.error = None
+
+    def run(self):
+        start_time = time.time()
+        try:
+            with requests.get(self.url, stream=True, timeout=30) as response:
+                for data in response.iter_content(chunk_size=4096):
+                    if self.first_chunk_ms is None:
+                        self.first_chunk_ms = (time.time() - start_time) * 1000
+                    self.bytes_read += len(data)
+                    if self.stop.is_set():
+                        break
+        except requests.RequestException as e:
+            self.error = e
+
+class TestAsgiLoad(unittest.TestCase):
+    def setUp(self):
+        try:
+            requests.get(f"{BASE_URL}/traffic_states", timeout=5)
+        except requests.ConnectionError:
+            self.skipTest("Server is not running. Please start the server first.")
+
+    def poll_latencies(self):
+        latencies = []
+        for _ in range(POLL_REQUESTS):
+            for endpoint in ('/traffic_states', '/vehicle_counts', '/ambulance_status'):
+                start_time = time.time()
+                response = requests.get(f"{BASE_URL}{endpoint}", timeout=30)
+                latencies.append((time.time() - start_time) * 1000)
+                self.assertEqual(response.status_code, 200)
+        return np.array(latencies)
+
+    def test_connections_vs_latency(self):
+        print("\nconnections | first chunk p50/p95 ms | status p50/p95 ms | stream errors")
+        for connections in CONNECTION_LEVELS:
+            stop = threading.Event()
+            clients = [StreamClient(index % 4 + 1, stop) for index in range(connections)]
+            for client in clients:
+                client.start()
+            deadline = time.time() + 30
+            while time.time() < deadline and any(c.first_chunk_ms is None and c.error is None for c in clients):
+                time.sleep(0.1)
+
+            latencies = self.poll_latencies()
+            stop.set()
+            for client in clients:
+                client.join(timeout=10)
+
+            first_chunks = np.array([c.first_chunk_ms for c in clients if c.first_chunk_ms is not None] or [np.nan])
+            errors = sum(1 for c in clients if c.error is not None)
+            print(f"{connections:11d} | {np.percentile(first_chunks, 50):8.1f} / {np.percentile(first_chunks, 95):8.1f}"
+                  f" | {np.percentile(latencies, 50):7.1f} / {np.percentile(latencies, 95):7.1f} | {errors}")
+
+            self.assertFalse(any(c.first_chunk_ms is None for c in clients), "Some streams never delivered a frame")
+            self.assertLess(np.percentile(latencies, 95), 1000,
+                            f"Status endpoints too slow with {connections} open streams")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+import time
+from datetime import datetime
+import psycopg2
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_writer import DbWriter
+
+# Nothing listens on port 1, so connecting fails straight away
+UNREACHABLE = dict(dbname="traffic", user="postgres", host="127.0.0.1", port=1, connect_timeout=1)
+
+class RecordingWriter(DbWriter):
+    """Writer whose database is a list; `down` makes it unreachable"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+        self.down = False
+
+    def _connect(self):
+        return not self.down
+
+    def _insert(self, rows):
+        if self.down:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.batches.append(list(rows))
+
+class TestDbWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.tmp.name, "spill.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_writer(self, cls=RecordingWriter, **kwargs):
+        options = dict(batch_size=3, flush_interval=0.05, spill_path=self.spill_path)
+        options.update(kwargs)
+        return cls("traffic_data", ("time", "count"), UNREACHABLE, **options)
+
+    def test_rows_are_written_in_batches(self):
+        writer = self.make_writer()
+        writer.start()
+        for count in range(7):
+            writer.submit(("10:00", count))
+        writer.close()
+        self.assertEqual([len(batch) for batch in writer.batches], [3, 3, 1])
+        stats = writer.get_stats()
+        self.assertEqual((stats["written"], stats["batches"], stats["queued"]), (7, 3, 0))
+
+    def test_idle_writer_flushes_after_flush_interval(self):
+        writer = self.make_writer(batch_size=100, flush_interval=0.2)
+        writer.start()
+        # Let the writer thread settle into waiting on an empty queue
+        time.sleep(0.1)
+        submitted = time.time()
+        writer.submit(("10:00", 1))
+        while not writer.batches and time.time() < submitted + 2:
+            time.sleep(0.01)
+        flushed = time.time()
+        self.assertEqual(writer.batches, [[("10:00", 1)]])
+        self.assertLess(flushed - submitted, 0.5)
+        writer.close()
+
+    def test_queue_is_bounded(self):
+        writer = self.make_writer(max_queue=2)
+        for count in range(5):
+            writer.submit(("10:00", count))
+        stats = writer.get_stats()
+        self.assertEqual((stats["queued"], stats["dropped"]), (2, 3))
+        writer.start()
+        writer.close()
+        self.assertEqual(writer.batches, [[("10:00", 3), ("10:00", 4)]])
+
+    def test_spilled_rows_are_replayed_first(self):
+        writer = self.make_writer()
+        writer.down = True
+        writer.start()
+        writer.submit(("10:00", 1, datetime(2025, 1, 1, 10, 0)))
+        deadline = time.time() + 5
+        while writer.get_stats()["spilled"] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        with open(self.spill_path) as spill:
+            self.assertEqual(json.loads(spill.readline()), ["10:00", 1, "2025-01-01T10:00:00"])
+
+        writer.down = False
+        writer.submit(("10:01", 2, datetime(2025, 1, 1, 10, 1)))
+        writer.close()
+        self.assertEqual(writer.batches[0], [("10:00", 1, "2025-01-01T10:00:00")])
+        self.assertEqual(writer.batches[1][0][:2], ("10:01", 2))
+        self.assertFalse(os.path.exists(self.spill_path))
+        self.assertEqual(writer.get_stats()["replayed"], 1)
+
+    def test_after_commit_sees_written_and_replayed_rows(self):
+        committed = []
+        writer = self.make_writer(after_commit=lambda columns, rows: committed.append((columns, list(rows))))
+        writer.down = True
+        writer.start()
+        writer.submit(("10:00", 1))
+        deadline = time.time() + 5
+        while writer.get_stats()["spilled"] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(committed, [])
+
+        writer.down = False
+        writer.submit(("10:01", 2))
+        writer.close()
+        self.assertEqual(committed, [(("time", "count"), [("10:00", 1)]), (("time", "count"), [("10:01", 2)])])
+
+    def test_unreachable_database_spills_without_blocking(self):
+        writer = self.make_writer(DbWriter)
+        writer.start()
+        start_time = time.perf_counter()
+        writer.submit(("10:00", 1))
+        self.assertLess(time.perf_counter() - start_time, 0.05)
+        writer.close()
+        stats = writer.get_stats()
+        self.assertEqual(stats["spilled"], 1)
+        self.assertFalse(stats["database_available"])
+        self.assertIsNotNone(stats["last_error"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detectors import (ExportedDetector, letterbox, exported_path, create_detector, check_quantized_model,
+                       quantized_manifest_path, QuantizationGateError)
+
+VEHICLES = {0: "ambulance", 2: "car", 3: "motorbike", 5: "bus", 7: "truck"}
+NUM_CLASSES = 80
+
+class FakeExportedDetector(ExportedDetector):
+    """Returns a canned raw YOLO output instead of running a graph"""
+
+    def __init__(self, output):
+        super().__init__(VEHICLES)
+        self.output = output
+
+    def run(self, batch):
+        return self.output
+
+def raw_output(anchors):
+    """Build a (1, 4 + classes, anchors) array from (cx, cy, w, h, class_id, score) tuples"""
+    output = np.zeros((1, 4 + NUM_CLASSES, len(anchors)), dtype=np.float32)
+    for index, (cx, cy, w, h, class_id, score) in enumerate(anchors):
+        output[0, :4, index] = (cx, cy, w, h)
+        output[0, 4 + class_id, index] = score
+    return output
+
+class TestExportedDetector(unittest.TestCase):
+    def test_letterbox_keeps_aspect_ratio(self):
+        image, ratio, (pad_x, pad_y) = letterbox(np.zeros((200, 400, 3), dtype=np.uint8), 640)
+        self.assertEqual(image.shape, (640, 640, 3))
+        self.assertAlmostEqual(ratio, 1.6)
+        self.assertEqual((pad_x, pad_y), (0, 160))
+
+    def test_boxes_mapped_back_to_frame(self):
+        detector = FakeExportedDetector(raw_output([(320, 320, 160, 80, 2, 0.9)]))
+        detections = detector.predict([np.zeros((200, 400, 3), dtype=np.uint8)])[0]
+        self.assertEqual(detections.cls.tolist(), [2])
+        np.testing.assert_allclose(detections.xyxy[0], [150, 75, 250, 125], atol=1e-3)
+
+    def test_nms_is_per_class_and_thresholded(self):
+        detector = FakeExportedDetector(raw_output([
+            (320, 320, 160, 80, 2, 0.9),
+            (322, 321, 160, 80, 2, 0.8),  # duplicate car, suppressed
+            (320, 320, 160, 80, 7, 0.6),  # same place, other class, kept
+            (100, 400, 50, 50, 5, 0.1)  # below confidence threshold
+        ]))
+        detections = detector.predict([np.zeros((640, 640, 3), dtype=np.uint8)])[0]
+        self.assertEqual(sorted(detections.cls.tolist()), [2, 7])
+
+    def test_exported_artifact_paths(self):
+        self.assertEqual(exported_path("yolo12s.pt", "onnx"), "yolo12s.onnx")
+        self.assertEqual(exported_path("yolo12s.pt", "openvino"), "yolo12s_openvino_model")
+        self.assertEqual(exported_path("yolo12s.pt", "ultralytics"), "yolo12s.pt")
+
+    def test_unknown_backend_rejected(self):
+        with self.assertRaises(ValueError):
+            create_detector("tensorrt", "yolo12s.pt", VEHICLES)
+
+class TestQuantizationGate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.weights = os.path.join(self.directory.name, "yolo12s.pt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_manifest(self, agreement):
+        with open(quantized_manifest_path(self.weights), "w") as f:
+            json.dump({"count_agreement": agreement}, f)
+
+    def test_missing_comparison_is_refused(self):
+        with self.assertRaises(QuantizationGateError):
+            check_quantized_model(self.weights)
+
+    def test_low_agreement_is_refused(self):
+        self.write_manifest(0.9)
+        with self.assertRaises(QuantizationGateError):
+            check_quantized_model(self.weights, min_agreement=0.95)
+        with self.assertRaises(QuantizationGateError):
+            create_detector("onnx-int8", self.weights, VEHICLES)
+
+    def test_sufficient_agreement_is_accepted(self):
+        self.write_manifest(0.97)
+        self.assertEqual(check_quantized_model(self.weights, min_agreement=0.95)["count_agreement"], 0.97)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+import subprocess
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_bus import FrameBus, frame_from
+
+SHAPE = (36, 64, 3)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestFrameBus(unittest.TestCase):
+    def setUp(self):
+        self.bus = FrameBus(4, SHAPE)
+
+    def tearDown(self):
+        self.bus.close()
+
+    def test_size_is_fixed(self):
+        expected = 4 * 8 + 4 * int(np.prod(SHAPE))
+        self.assertGreaterEqual(self.bus.nbytes, expected)
+        for sequence in range(1, 20):
+            self.bus.slot(sequence)[...] = sequence
+            self.bus.publish(sequence)
+        self.assertGreaterEqual(self.bus.nbytes, expected)
+
+    def test_slot_reuse_is_detected(self):
+        self.bus.slot(1)[...] = 1
+        self.bus.publish(1)
+        view = self.bus.view(1)
+        self.assertTrue(self.bus.intact(1))
+        # Sequence 5 lands in the same slot as 1
+        self.bus.slot(5)
+        self.assertFalse(self.bus.intact(1))
+        self.assertIsNone(self.bus.view(1))
+        self.bus.publish(5)
+        self.assertTrue(self.bus.intact(5))
+        self.assertTrue(np.shares_memory(view, self.bus.view(5)))
+
+    def test_located_view_maps_same_pixels(self):
+        self.bus.slot(2)[...] = np.arange(np.prod(SHAPE), dtype=np.uint8).reshape(SHAPE)
+        self.bus.publish(2)
+        crop = self.bus.view(2)[5:20, 10:40]
+        name, offset, shape, strides = self.bus.locate(crop)
+        self.assertEqual(name, self.bus.name)
+        mapped = frame_from(self.bus.memory.buf, offset, shape, strides)
+        np.testing.assert_array_equal(mapped, crop)
+        del mapped
+
+    def test_closed_bus_reports_no_frames(self):
+        self.bus.slot(1)[...] = 1
+        self.bus.publish(1)
+        held = self.bus.view(1)  # a reader still holding its frame
+        name = self.bus.name
+        self.bus.close()
+
+        self.assertTrue(self.bus.closed)
+        self.assertFalse(self.bus.intact(1))
+        self.assertIsNone(self.bus.view(1))
+        # The block is unlinked even while the reader holds its view
+        with self.assertRaises(FileNotFoundError):
+            FrameBus.attach(name, 4, SHAPE)
+        del held
+        self.bus.close()  # closing again is harmless
+
+    def test_foreign_frame_is_not_located(self):
+        self.assertIsNone(self.bus.locate(np.zeros(SHAPE, dtype=np.uint8)))
+
+    def test_unclosed_bus_is_unlinked_at_exit(self):
+        script = "from frame_bus import FrameBus; print(FrameBus(4, (36, 64, 3)).name)"
+        result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0)
+        self.assertNotIn("leaked", result.stderr)
+        with self.assertRaises(FileNotFoundError):
+            FrameBus.attach(result.stdout.strip(), 4, SHAPE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_source import FrameSource, HISTORY_SIZE
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIDEO_PATH = os.path.join(BASE_DIR, "videos", "Lane_1.mp4")
+
+class TestFrameSource(unittest.TestCase):
+    def setUp(self):
+        if not os.path.exists(VIDEO_PATH):
+            self.skipTest(f"Video file not found: {VIDEO_PATH}")
+        self.source = FrameSource(VIDEO_PATH)
+
+    def tearDown(self):
+        self.source.release()
+
+    def test_read_returns_newest_frame_without_blocking(self):
+        ret, frame = self.source.read()
+        self.assertTrue(ret)
+        time.sleep(0.5)
+
+        start_time = time.time()
+        ret, next_frame = self.source.read()
+        self.assertTrue(ret)
+        self.assertLess(time.time() - start_time, 0.05)
+        self.assertEqual(frame.shape, next_frame.shape)
+
+    def test_keeps_wall_clock_pace(self):
+        self.source.read()
+        time.sleep(2)
+        self.source.read()
+        # 2 seconds of wall clock should have moved the file ~2 seconds forward
+        stats = self.source.get_stats()
+        self.assertGreaterEqual(stats["position"], int(1.5 * stats["fps"]))
+        self.assertLessEqual(stats["position"], int(2.5 * stats["fps"]))
+
+    def test_decodes_only_what_the_consumer_needs(self):
+        self.source.set_consumer_interval(3)
+        self.source.read()
+        time.sleep(2)
+        stats = self.source.get_stats()
+        self.assertLess(stats["frames_decoded"], stats["frames_grabbed"])
+
+    def test_history_is_bounded(self):
+        self.source.read()
+        time.sleep(1)
+        history = self.source.get_history()
+        self.assertGreater(len(history), 0)
+        self.assertLessEqual(len(history), HISTORY_SIZE)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from unittest import mock
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import Detections
+from model_registry import model_registry
+from inference_scheduler import InferenceScheduler
+
+class FakeDetector:
+    """Returns one box per frame whose x1 is the frame's first pixel value, and records each batch"""
+    backend = "fake"
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+        self.batch_times = []
+
+    def input_size(self, imgsz):
+        return imgsz or 640
+
+    def predict_vehicles(self, frames, imgsz):
+        self.batches.append(len(frames))
+        self.batch_times.append(time.time())
+        if self.error is not None:
+            raise self.error
+        return [Detections([[float(frame[0, 0, 0]), 0, 10, 10]], [0.9], [2]) for frame in frames]
+
+class FakeWorker:
+    """Stands in for an InferenceWorker process; a preload takes `polls` checks to finish"""
+
+    def __init__(self, polls=2, timings=None, error=None):
+        self.polls = polls
+        self.timings = timings or {"load_ms": 10.0, "warmup_ms": 20.0}
+        self.error = error
+        self.preload_calls = 0
+        self.batches = 0
+        self.process = mock.Mock(**{"poll.return_value": None})
+
+    def preload(self, spec):
+        self.preload_calls += 1
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        if self.preload_calls < self.polls:
+            return {"loaded": False}
+        return dict(self.timings, loaded=True)
+
+    def predict_vehicles(self, frames, imgsz, spec, locations=None):
+        self.batches += 1
+        return [Detections([[float(frame[0, 0, 0]), 0, 10, 10]], [0.9], [2]) for frame in frames]
+
+    def close(self):
+        pass
+
+def make_frame(marker):
+    return np.full((8, 8, 3), marker, dtype=np.uint8)
+
+class TestInferenceScheduler(unittest.TestCase):
+    def setUp(self):
+        self.detector = FakeDetector()
+        patcher = mock.patch.object(model_registry, "active", self.detector)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.schedulers = []
+
+    def tearDown(self):
+        for scheduler in self.schedulers:
+            scheduler.close()
+
+    def make_scheduler(self, lanes, max_batch_size=4, max_wait=0.05):
+        scheduler = InferenceScheduler(max_batch_size=max_batch_size, max_wait=max_wait,
+                                       adaptive_imgsz=False, workers=0)
+        self.schedulers.append(scheduler)
+        for lane_id in range(1, lanes + 1):
+            scheduler.register_lane(lane_id)
+        return scheduler
+
+    def infer_all(self, scheduler, lanes):
+        """Submit one frame per lane from its own thread; returns {lane_id: result or exception}"""
+        results = {}
+
+        def infer(lane_id):
+            try:
+                results[lane_id] = scheduler.infer(lane_id, make_frame(lane_id * 10))
+            except Exception as e:
+                results[lane_id] = e
+
+        threads = [threading.Thread(target=infer, args=(lane_id,)) for lane_id in lanes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_batches_up_to_max_batch_size(self):
+        scheduler = self.make_scheduler(6, max_batch_size=4, max_wait=0.5)
+        results = self.infer_all(scheduler, range(1, 7))
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual(self.detector.batches, [4, 2])
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["batches"], 2)
+        self.assertEqual(stats["frames"], 6)
+
+    def test_dispatches_when_every_active_lane_submitted(self):
+        scheduler = self.make_scheduler(2, max_batch_size=4, max_wait=5)
+        start_time = time.time()
+        self.infer_all(scheduler, [1, 2])
+
+        self.assertEqual(self.detector.batches, [2])
+        self.assertLess(time.time() - start_time, 1)
+
+    def test_deadline_flushes_partial_batch(self):
+        scheduler = self.make_scheduler(3, max_batch_size=4, max_wait=0.05)
+        start_time = time.time()
+        result = scheduler.infer(1, make_frame(10))
+
+        self.assertEqual(self.detector.batches, [1])
+        self.assertGreaterEqual(self.detector.batch_times[0] - start_time, 0.05)
+        self.assertLess(self.detector.batch_times[0] - start_time, 1)
+        self.assertEqual(len(result), 1)
+
+    def test_results_are_routed_to_their_lane(self):
+        scheduler = self.make_scheduler(4)
+        results = self.infer_all(scheduler, range(1, 5))
+
+        self.assertEqual(self.detector.batches, [4])
+        for lane_id, result in results.items():
+            self.assertEqual(result.xyxy[0, 0], lane_id * 10)
+
+    def test_errors_reach_every_waiting_caller(self):
+        self.detector.error = RuntimeError("model failed")
+        scheduler = self.make_scheduler(3)
+        results = self.infer_all(scheduler, range(1, 4))
+
+        self.assertEqual(len(results), 3)
+        for result in results.values():
+            self.assertIsInstance(result, RuntimeError)
+            self.assertEqual(str(result), "model failed")
+
+        # The scheduler keeps serving after a failed batch
+        self.detector.error = None
+        results = self.infer_all(scheduler, range(1, 4))
+        self.assertEqual(sorted(result.xyxy[0, 0] for result in results.values()), [10, 20, 30])
+
+class TestWorkerPreload(unittest.TestCase):
+    def setUp(self):
+        for patcher in (mock.patch.object(model_registry, "active", FakeDetector()),
+                        mock.patch.object(model_registry, "preloaders", [])):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.workers = []
+        self.scheduler = None
+
+    def tearDown(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+    def start(self, *workers):
+        self.workers = list(workers)
+        pool = iter(self.workers)
+        patcher = mock.patch.object(InferenceScheduler, "_start_worker", lambda scheduler: next(pool))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = InferenceScheduler(adaptive_imgsz=False, workers=len(workers))
+        self.scheduler.register_lane(1)
+        return self.scheduler
+
+    def test_scheduler_registers_as_preloader(self):
+        scheduler = self.start(FakeWorker())
+        self.assertEqual(model_registry.preloaders, [scheduler.preload_workers])
+
+    def test_every_worker_preloads_before_returning(self):
+        scheduler = self.start(FakeWorker(polls=3, timings={"load_ms": 10.0, "warmup_ms": 50.0}),
+                               FakeWorker(polls=1, timings={"load_ms": 30.0, "warmup_ms": 5.0}))
+        timings = scheduler.preload_workers(model_registry.get_spec("custom"), 5)
+
+        self.assertEqual(timings, {"load_ms": 30.0, "warmup_ms": 50.0})
+        self.assertEqual([worker.preload_calls for worker in self.workers], [3, 1])
+
+    def test_batches_are_served_while_workers_load(self):
+        scheduler = self.start(FakeWorker(polls=5))
+        preloader = threading.Thread(target=scheduler.preload_workers, args=(model_registry.get_spec("custom"), 5))
+        preloader.start()
+        time.sleep(0.05)
+        result = scheduler.infer(1, make_frame(10))
+        self.assertTrue(preloader.is_alive())
+        preloader.join()
+
+        self.assertEqual(result.xyxy[0, 0], 10)
+        self.assertEqual(self.workers[0].batches, 1)
+        self.assertEqual(self.workers[0].preload_calls, 5)
+
+    def test_worker_error_fails_preload(self):
+        scheduler = self.start(FakeWorker(error="weights not found"))
+        with self.assertRaises(RuntimeError) as context:
+            scheduler.preload_workers(model_registry.get_spec("custom"), 5)
+        self.assertIn("weights not found", str(context.exception))
+        self.assertEqual(scheduler.preloads, [])
+
+    def test_preload_timeout(self):
+        scheduler = self.start(FakeWorker(polls=1000))
+        with self.assertRaises(TimeoutError):
+            scheduler.preload_workers(model_registry.get_spec("custom"), 0.2)
+        self.assertEqual(scheduler.preloads, [])
+
+    def test_close_unregisters_preloader(self):
+        scheduler = self.start(FakeWorker())
+        scheduler.close()
+        self.scheduler = None
+        self.assertEqual(model_registry.preloaders, [])
+
+    def test_nothing_to_preload_without_workers(self):
+        scheduler = InferenceScheduler(adaptive_imgsz=False, workers=0)
+        self.assertIsNone(scheduler.preload_workers(model_registry.get_spec("custom"), 1))
+
+if __name__ == "__main__":
+    unittest.main()
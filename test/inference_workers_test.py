@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_workers import preload_status
+
+SPEC = {"name": "custom", "backend": "ultralytics", "weights": "custom.pt", "vehicle_classes": {}}
+
+class TestPreloadStatus(unittest.TestCase):
+    def setUp(self):
+        self.detectors = {}
+        self.loading = {}
+        self.release = threading.Event()
+        self.started = []
+
+    def preload(self, spec, result):
+        self.started.append(spec["name"])
+        self.release.wait(5)
+        result.update(detector="new detector", timings={"load_ms": 12.5, "warmup_ms": 40.0})
+
+    def status(self):
+        return preload_status(SPEC, self.detectors, self.loading, self.preload)
+
+    def test_loads_in_background_once(self):
+        self.assertEqual(self.status(), {"loaded": False})
+        self.assertEqual(self.status(), {"loaded": False})
+        self.assertNotIn("custom", self.detectors)
+
+        self.release.set()
+        for _ in range(100):
+            if "detector" in self.loading["custom"]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.status(), {"loaded": True, "load_ms": 12.5, "warmup_ms": 40.0})
+        self.assertEqual(self.detectors["custom"], "new detector")
+        self.assertEqual(self.loading, {})
+        self.assertEqual(self.started, ["custom"])
+
+    def test_loaded_model_reports_immediately(self):
+        self.detectors["custom"] = "cached detector"
+        self.assertEqual(self.status(), {"loaded": True, "load_ms": 0.0, "warmup_ms": 0.0})
+        self.assertEqual(self.started, [])
+
+    def test_load_error_is_reported_and_can_be_retried(self):
+        self.loading["custom"] = {"error": "weights not found"}
+        self.assertEqual(self.status(), {"error": "weights not found"})
+        self.assertEqual(self.loading, {})
+        self.release.set()
+        self.assertEqual(self.status(), {"loaded": False})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import sys
+import os
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jpeg_encoder import (stream_profile, stream_fps, resize_to_width, encode_jpeg,
+                          DEFAULT_QUALITY, STREAM_WIDTHS, MAX_STREAM_FPS)
+
+class TestStreamProfile(unittest.TestCase):
+    def test_default_is_full_resolution(self):
+        self.assertEqual(stream_profile(), (None, DEFAULT_QUALITY))
+
+    def test_requests_snap_down_to_presets(self):
+        self.assertEqual(stream_profile(700, 70), (640, 60))
+        self.assertEqual(stream_profile(100, 5), (STREAM_WIDTHS[0], 40))
+
+    def test_fps_is_clamped(self):
+        self.assertIsNone(stream_fps())
+        self.assertEqual(stream_fps(1000), MAX_STREAM_FPS)
+        self.assertEqual(stream_fps(0), 0.1)
+
+class TestEncoding(unittest.TestCase):
+    def test_resize_keeps_aspect_ratio(self):
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        self.assertEqual(resize_to_width(frame, 640).shape, (360, 640, 3))
+        self.assertIs(resize_to_width(frame, None), frame)
+
+    def test_lower_quality_is_smaller(self):
+        rng = np.random.default_rng(0)
+        frame = cv2.GaussianBlur(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), (5, 5), 0)
+        high, low = encode_jpeg(frame, 95), encode_jpeg(frame, 40)
+        self.assertLess(len(low), len(high))
+        decoded = cv2.imdecode(np.frombuffer(bytes(high), dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, frame.shape)
+
+if __name__ == '__main__':
+    unittest.main()
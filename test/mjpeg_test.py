@@ -0,0 +1,165 @@
+import unittest
+import sys
+import os
+import time
+from threading import Condition
+from unittest import mock
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mjpeg
+from mjpeg import MjpegBroadcaster, MAX_VARIANTS
+
+class FakeResult:
+    def __init__(self, sequence, frame):
+        self.sequence = sequence
+        self.frame = frame
+
+    def intact(self):
+        return True
+
+class FakePipeline:
+    """Publishes frames only when the test pushes them"""
+
+    def __init__(self):
+        self.condition = Condition()
+        self.latest = None
+        self.subscribers = {}
+
+    def subscribe(self, interval=0):
+        with self.condition:
+            token = len(self.subscribers) + 1
+            self.subscribers[token] = interval
+            return token
+
+    def set_interval(self, token, interval):
+        with self.condition:
+            self.subscribers[token] = interval
+
+    def unsubscribe(self, token):
+        with self.condition:
+            self.subscribers.pop(token, None)
+
+    def push(self, value):
+        with self.condition:
+            sequence = self.latest.sequence + 1 if self.latest else 1
+            self.latest = FakeResult(sequence, np.full((120, 160, 3), value, dtype=np.uint8))
+            self.condition.notify_all()
+            return sequence
+
+    def wait_for_result(self, last_sequence, timeout=5):
+        with self.condition:
+            self.condition.wait_for(lambda: self.latest is not None and self.latest.sequence > last_sequence,
+                                    timeout=timeout)
+            if self.latest is not None and self.latest.sequence > last_sequence:
+                return self.latest
+            return None
+
+class TestMjpegBroadcaster(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = FakePipeline()
+        self.encoded = []
+        real_encode = mjpeg.encode_jpeg
+
+        def encode(frame, quality):
+            self.encoded.append((frame.shape[1], quality))
+            return real_encode(frame, quality)
+
+        for patcher in (mock.patch.object(mjpeg, "get_pipeline", lambda lane_id, video_path: self.pipeline),
+                        mock.patch.object(mjpeg, "encode_jpeg", encode)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.broadcaster = MjpegBroadcaster(1, "Lane_1.mp4")
+        self.tokens = []
+
+    def tearDown(self):
+        for token in self.tokens:
+            self.broadcaster.unsubscribe(token)
+
+    def subscribe(self, **profile):
+        token = self.broadcaster.subscribe(**profile)
+        self.tokens.append(token)
+        return token
+
+    def push_and_wait(self, value):
+        """Push a frame and wait until the broadcaster has encoded it"""
+        before = {name: variant["encoded"] for name, variant in self.broadcaster.get_stats()["variants"].items()}
+        self.pipeline.push(value)
+        for _ in range(500):
+            variants = self.broadcaster.get_stats()["variants"]
+            if all(variant["encoded"] > before.get(name, 0) for name, variant in variants.items()):
+                return
+            time.sleep(0.01)
+        self.fail("frame was not encoded")
+
+    def test_each_profile_encoded_once_per_frame(self):
+        for _ in range(3):
+            self.subscribe()
+        for _ in range(2):
+            self.subscribe(width=320, quality=60)
+        self.push_and_wait(10)
+        self.push_and_wait(20)
+
+        self.assertEqual(sorted(self.encoded), sorted([(160, 95), (160, 60)] * 2))
+        variants = self.broadcaster.get_stats()["variants"]
+        self.assertEqual({name: variant["viewers"] for name, variant in variants.items()},
+                         {"full@q95": 3, "320@q60": 2})
+
+    def test_viewers_share_one_bytes_object(self):
+        tokens = [self.subscribe() for _ in range(3)]
+        self.push_and_wait(10)
+
+        chunks = [self.broadcaster.take_chunk(token) for token in tokens]
+        self.assertIsInstance(chunks[0], bytes)
+        self.assertTrue(chunks[0].startswith(mjpeg.CHUNK_HEADER))
+        for chunk in chunks[1:]:
+            self.assertIs(chunk, chunks[0])
+        # Nothing new until the next frame
+        self.assertIsNone(self.broadcaster.take_chunk(tokens[0]))
+
+    def test_slow_viewer_skips_frames_without_blocking(self):
+        fast, slow = self.subscribe(), self.subscribe()
+        self.push_and_wait(1)
+        self.broadcaster.take_chunk(slow)
+
+        for value in range(2, 7):
+            self.push_and_wait(value)
+            self.assertIsNotNone(self.broadcaster.take_chunk(fast))
+
+        # The slow viewer never held up encoding, and only gets the newest frame
+        self.assertEqual(self.broadcaster.get_stats()["variants"]["full@q95"]["encoded"], 6)
+        newest = self.broadcaster.take_chunk(slow)
+        self.assertIsNone(self.broadcaster.take_chunk(slow))
+        viewers = self.broadcaster.get_stats()["viewers"]
+        self.assertEqual([viewer["dropped"] for viewer in viewers], [0, 4])
+        self.assertEqual([viewer["frames_sent"] for viewer in viewers], [5, 2])
+        self.assertIs(newest, self.broadcaster.variants[(None, 95)].chunk)
+
+    def test_variant_cap(self):
+        for width in (320, 480, 640, 960, 1280):
+            self.subscribe(width=width, quality=75)
+        self.push_and_wait(10)
+
+        variants = self.broadcaster.get_stats()["variants"]
+        self.assertEqual(len(variants), MAX_VARIANTS)
+        # The fifth profile shares the closest existing one
+        self.assertEqual(variants["960@q75"]["viewers"], 2)
+        self.assertEqual(len(self.encoded), MAX_VARIANTS)
+
+    def test_pipeline_released_when_last_viewer_leaves(self):
+        token = self.subscribe()
+        self.push_and_wait(10)
+        self.assertEqual(len(self.pipeline.subscribers), 1)
+
+        self.broadcaster.unsubscribe(token)
+        self.tokens.remove(token)
+        for _ in range(300):
+            if not self.pipeline.subscribers:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.pipeline.subscribers, {})
+
+if __name__ == "__main__":
+    unittest.main()
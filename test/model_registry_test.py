@@ -0,0 +1,175 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_registry
+from model_registry import ModelRegistry
+
+class StubDetector:
+    backend = "stub"
+
+    def __init__(self, weights, warmup_time=0.0):
+        self.weights = weights
+        self.warmup_time = warmup_time
+        self.warmed_up = False
+
+    def warmup(self):
+        time.sleep(self.warmup_time)
+        self.warmed_up = True
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.pretrained = StubDetector("pretrained.pt")
+        self.registry = ModelRegistry(self.pretrained, "pretrained")
+        self.loads = []
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+        self.load_error = None
+        patcher = mock.patch.object(model_registry, "load_detector", self.load_detector)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def load_detector(self, backend, weights, vehicle_classes, threads=None):
+        self.loads.append(weights)
+        time.sleep(self.load_time)
+        if self.load_error is not None:
+            raise self.load_error
+        return StubDetector(weights, self.warmup_time)
+
+    def test_switch_swaps_active_and_standby(self):
+        report = self.registry.switch("custom")
+
+        self.assertEqual(self.registry.active_name, "custom")
+        self.assertTrue(self.registry.get().warmed_up)
+        self.assertIs(self.registry.standby, self.pretrained)
+        self.assertEqual(self.registry.standby_name, "pretrained")
+        self.assertEqual(self.loads, [model_registry.MODEL_TYPES["custom"]["weights"]])
+        self.assertEqual(report["model"], "custom")
+        self.assertEqual(report["backend"], "stub")
+        self.assertEqual(self.registry.get_status()["last_switch"]["model"], "custom")
+
+    def test_switching_back_reuses_standby(self):
+        self.registry.switch("custom")
+        report = self.registry.switch("pretrained")
+
+        self.assertIs(self.registry.get(), self.pretrained)
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual((report["load_ms"], report["warmup_ms"]), (0.0, 0.0))
+
+    def test_switch_to_active_model_is_unchanged(self):
+        report = self.registry.switch("pretrained")
+        self.assertTrue(report["unchanged"])
+        self.assertEqual(self.loads, [])
+
+    def test_unknown_model_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.registry.switch("missing")
+        with self.assertRaises(KeyError):
+            self.registry.get_spec("missing")
+        self.assertIs(self.registry.get(), self.pretrained)
+
+    def test_reports_load_warmup_and_swap_times(self):
+        self.load_time = 0.05
+        self.warmup_time = 0.03
+        report = self.registry.switch("custom")
+
+        self.assertGreaterEqual(report["load_ms"], 50)
+        self.assertLess(report["load_ms"], 1000)
+        self.assertGreaterEqual(report["warmup_ms"], 30)
+        self.assertLess(report["warmup_ms"], 1000)
+        # The swap itself is two attribute assignments
+        self.assertLess(report["swap_ms"], 10)
+
+    def test_load_timeout_keeps_active_model(self):
+        self.load_time = 0.5
+        with self.assertRaises(TimeoutError):
+            self.registry.switch("custom", timeout=0.05)
+        self.assertIs(self.registry.get(), self.pretrained)
+        self.assertEqual(self.registry.active_name, "pretrained")
+
+    def test_load_error_keeps_active_model(self):
+        self.load_error = OSError("weights not found")
+        with self.assertRaises(RuntimeError) as context:
+            self.registry.switch("custom")
+        self.assertIn("weights not found", str(context.exception))
+        self.assertIs(self.registry.get(), self.pretrained)
+
+    def test_model_serves_until_swap(self):
+        # Lanes keep getting the old model while the new one loads
+        self.load_time = 0.2
+        switcher = threading.Thread(target=self.registry.switch, args=("custom",))
+        switcher.start()
+        time.sleep(0.05)
+        self.assertIs(self.registry.get(), self.pretrained)
+        switcher.join()
+        self.assertEqual(self.registry.active_name, "custom")
+
+    def test_preloaders_run_before_swap_and_count_in_timings(self):
+        calls = []
+
+        def preload(spec, timeout):
+            # Still serving on the old model while the workers load
+            calls.append((spec["name"], self.registry.active_name, timeout > 0))
+            return {"load_ms": 100.0, "warmup_ms": 200.0}
+
+        self.registry.add_preloader(preload)
+        report = self.registry.switch("custom")
+
+        self.assertEqual(calls, [("custom", "pretrained", True)])
+        self.assertEqual((report["workers_load_ms"], report["workers_warmup_ms"]), (100.0, 200.0))
+        self.assertGreaterEqual(report["load_ms"], 100.0)
+        self.assertGreaterEqual(report["warmup_ms"], 200.0)
+
+        # Switching back to the standby still has the workers make sure they hold it
+        report = self.registry.switch("pretrained")
+        self.assertEqual(calls[-1][0], "pretrained")
+        self.assertEqual(report["load_ms"], 100.0)
+
+    def test_preloader_failure_keeps_active_model(self):
+        def preload(spec, timeout):
+            raise TimeoutError("workers did not load custom")
+
+        self.registry.add_preloader(preload)
+        with self.assertRaises(RuntimeError):
+            self.registry.switch("custom")
+        self.assertIs(self.registry.get(), self.pretrained)
+
+    def test_remote_registry_loads_nothing_locally(self):
+        registry = ModelRegistry(model_registry.RemoteDetector("onnx", {}), "pretrained", remote=True)
+        registry.add_preloader(lambda spec, timeout: {"load_ms": 100.0, "warmup_ms": 200.0})
+        report = registry.switch("custom")
+
+        self.assertEqual(self.loads, [])
+        self.assertIsInstance(registry.get(), model_registry.RemoteDetector)
+        self.assertEqual(registry.get().vehicle_classes, model_registry.MODEL_TYPES["custom"]["vehicle_classes"])
+        self.assertEqual((report["load_ms"], report["warmup_ms"]), (100.0, 200.0))
+        with self.assertRaises(RuntimeError):
+            registry.get().predict([])
+
+    def test_removed_preloader_is_not_called(self):
+        calls = []
+
+        def preload(spec, timeout):
+            calls.append(spec["name"])
+
+        self.registry.add_preloader(preload)
+        self.registry.remove_preloader(preload)
+        self.registry.remove_preloader(preload)  # removing twice is harmless
+        self.registry.switch("custom")
+        self.assertEqual(calls, [])
+
+    def test_spec_describes_model(self):
+        spec = self.registry.get_spec("custom")
+        self.assertEqual(spec["name"], "custom")
+        self.assertEqual(spec["weights"], model_registry.MODEL_TYPES["custom"]["weights"])
+        self.assertEqual(spec["vehicle_classes"], model_registry.MODEL_TYPES["custom"]["vehicle_classes"])
+        self.assertEqual(self.registry.get_spec()["name"], "pretrained")
+
+if __name__ == "__main__":
+    unittest.main()
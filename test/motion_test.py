@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motion import MotionGate
+
+def blank_frame():
+    return np.full((360, 640, 3), 80, dtype=np.uint8)
+
+class TestMotionGate(unittest.TestCase):
+    def setUp(self):
+        self.gate = MotionGate(threshold=0.01, max_skip_seconds=10)
+
+    def test_static_scene_is_skipped(self):
+        self.assertTrue(self.gate.should_infer(blank_frame(), 0))
+        for second in range(1, 5):
+            self.assertFalse(self.gate.should_infer(blank_frame(), second))
+        self.assertEqual(self.gate.get_stats()["skipped"], 4)
+
+    def test_moving_vehicle_triggers_inference(self):
+        self.gate.should_infer(blank_frame(), 0)
+        frame = blank_frame()
+        frame[100:200, 200:350] = 255
+        self.assertTrue(self.gate.should_infer(frame, 1))
+
+    def test_inference_forced_after_max_skip(self):
+        self.gate.should_infer(blank_frame(), 0)
+        self.assertFalse(self.gate.should_infer(blank_frame(), 9))
+        self.assertTrue(self.gate.should_infer(blank_frame(), 10))
+        self.assertEqual(self.gate.get_stats()["forced"], 1)
+
+    def test_motion_outside_mask_is_ignored(self):
+        mask = np.zeros((360, 640), dtype=np.uint8)
+        mask[:, 320:] = 255
+        gate = MotionGate(threshold=0.01, max_skip_seconds=10, mask=mask)
+        gate.should_infer(blank_frame(), 0)
+        frame = blank_frame()
+        frame[100:200, 50:200] = 255
+        self.assertFalse(gate.should_infer(frame, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import Detections, build_type_table, filter_vehicles, summarize_vehicles
+
+COCO_VEHICLES = {0: "ambulance", 2: "car", 3: "motorbike", 5: "bus", 7: "truck"}
+CUSTOM_VEHICLES = {0: "ambulance", 1: "car", 2: "bus", 3: "bike", 4: "truck", 5: "rickshaw"}
+
+def make_detections(class_ids):
+    n = len(class_ids)
+    xyxy = np.tile(np.array([[10, 10, 50, 50]], dtype=np.float32), (n, 1))
+    return Detections(xyxy, np.full(n, 0.9), class_ids)
+
+class TestPostprocess(unittest.TestCase):
+    def test_summary_matches_per_box_loop(self):
+        table = build_type_table(COCO_VEHICLES)
+        detections = make_detections([2, 2, 3, 5, 7, 7, 7, 1, 9, 79])
+        vehicle_count, type_counts, ambulance = summarize_vehicles(detections, table)
+
+        self.assertEqual(vehicle_count, 7)
+        self.assertEqual(type_counts, {"Cars": 2, "Trucks": 3, "Motorcycles": 1, "Buses": 1, "Emergency": 0})
+        self.assertFalse(ambulance)
+
+    def test_ambulance_detected(self):
+        table = build_type_table(COCO_VEHICLES)
+        _, type_counts, ambulance = summarize_vehicles(make_detections([0, 2]), table)
+        self.assertTrue(ambulance)
+        self.assertEqual(type_counts["Emergency"], 1)
+
+    def test_untyped_vehicle_is_counted(self):
+        table = build_type_table(CUSTOM_VEHICLES)
+        vehicle_count, type_counts, _ = summarize_vehicles(make_detections([5, 3]), table)
+        self.assertEqual(vehicle_count, 2)
+        self.assertEqual(type_counts["Motorcycles"], 1)
+        self.assertEqual(sum(type_counts.values()), 1)
+
+    def test_empty_frame(self):
+        table = build_type_table(COCO_VEHICLES)
+        vehicle_count, type_counts, ambulance = summarize_vehicles(Detections.empty(), table)
+        self.assertEqual(vehicle_count, 0)
+        self.assertEqual(sum(type_counts.values()), 0)
+        self.assertFalse(ambulance)
+
+    def test_filter_keeps_box_arrays_aligned(self):
+        table = build_type_table(COCO_VEHICLES)
+        detections = make_detections([1, 2, 9, 7])
+        detections.xyxy[:, 0] = [1, 2, 3, 4]
+        vehicles = filter_vehicles(detections, table)
+        self.assertEqual(vehicles.cls.tolist(), [2, 7])
+        self.assertEqual(vehicles.xyxy[:, 0].tolist(), [2, 4])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resolution import (ResolutionPolicy, LoadMonitor, IMGSZ_LOW, IMGSZ_HIGH, DENSE_ENTER,
+                        DENSE_EXIT, MIN_HOLD, AMBULANCE_HOLD, OVERLOAD_ENTER, OVERLOAD_EXIT)
+
+class TestResolutionPolicy(unittest.TestCase):
+    def setUp(self):
+        self.policy = ResolutionPolicy()
+
+    def test_sparse_lane_drops_to_low_resolution(self):
+        self.assertEqual(self.policy.update(0, False, False, 0), IMGSZ_LOW)
+        self.assertEqual(self.policy.reason, "sparse")
+
+    def test_density_hysteresis(self):
+        self.policy.update(0, False, False, 0)
+        # Between the thresholds the lane keeps its current size
+        self.assertEqual(self.policy.update(DENSE_EXIT + 1, False, False, 10), IMGSZ_LOW)
+        self.assertEqual(self.policy.update(DENSE_ENTER, False, False, 20), IMGSZ_HIGH)
+        self.assertEqual(self.policy.update(DENSE_EXIT + 1, False, False, 30), IMGSZ_HIGH)
+        self.assertEqual(self.policy.update(DENSE_EXIT, False, False, 40), IMGSZ_LOW)
+
+    def test_changes_are_held(self):
+        self.policy.update(0, False, False, 0)
+        self.assertEqual(self.policy.update(DENSE_ENTER, False, False, MIN_HOLD / 2), IMGSZ_LOW)
+        self.assertEqual(self.policy.update(DENSE_ENTER, False, False, MIN_HOLD), IMGSZ_HIGH)
+
+    def test_overload_wins_over_density(self):
+        self.policy.update(DENSE_ENTER, False, False, 0)
+        self.assertEqual(self.policy.update(DENSE_ENTER, False, True, 10), IMGSZ_LOW)
+        self.assertEqual(self.policy.reason, "overloaded")
+
+    def test_ambulance_switches_up_immediately_and_is_held(self):
+        self.policy.update(0, False, True, 0)
+        self.assertEqual(self.policy.update(1, True, True, 0.1), IMGSZ_HIGH)
+        self.assertEqual(self.policy.update(0, False, True, AMBULANCE_HOLD / 2), IMGSZ_HIGH)
+        self.assertEqual(self.policy.update(0, False, True, AMBULANCE_HOLD + 1), IMGSZ_LOW)
+
+class TestLoadMonitor(unittest.TestCase):
+    def test_overload_hysteresis(self):
+        monitor = LoadMonitor()
+        self.assertTrue(monitor.observe(OVERLOAD_ENTER * 2))
+        # Still overloaded until the smoothed latency falls below the exit level
+        self.assertTrue(monitor.observe((OVERLOAD_ENTER + OVERLOAD_EXIT) / 2))
+        for _ in range(30):
+            monitor.observe(0.0)
+        self.assertFalse(monitor.overloaded)
+
+if __name__ == '__main__':
+    unittest.main()
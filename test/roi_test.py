@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import Detections
+from roi import LaneRegion
+
+FRAME_SHAPE = (400, 600, 3)
+# Triangle with its base along the bottom of the region: x 150-450, y 100-300
+TRIANGLE = [(0.25, 0.75), (0.75, 0.75), (0.5, 0.25)]
+
+def make_frame():
+    """Every pixel holds its own coordinates, so a crop shows where it came from"""
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint16)
+    frame[..., 0] = np.arange(FRAME_SHAPE[1])[None, :]
+    frame[..., 1] = np.arange(FRAME_SHAPE[0])[:, None]
+    return frame
+
+class TestLaneRegion(unittest.TestCase):
+    def setUp(self):
+        self.region = LaneRegion(TRIANGLE, FRAME_SHAPE)
+
+    def test_crop_is_polygon_bounding_rect(self):
+        crop = self.region.crop(make_frame())
+        self.assertEqual((self.region.x1, self.region.y1, self.region.x2, self.region.y2), (150, 100, 451, 301))
+        self.assertEqual(crop.shape[:2], (201, 301))
+        # The crop's top-left pixel is the frame pixel at the region's offset
+        self.assertEqual(crop[0, 0, :2].tolist(), [150, 100])
+
+    def test_crop_box_maps_back_to_frame(self):
+        frame = make_frame()
+        crop = self.region.crop(frame)
+        # A box found on the crop, around its bottom centre (inside the triangle)
+        x1, y1, x2, y2 = 130, 150, 170, 190
+        detections = Detections([[x1, y1, x2, y2]], [0.9], [2])
+
+        mapped = self.region.to_frame(detections)
+        self.assertEqual(len(mapped), 1)
+        fx1, fy1, fx2, fy2 = mapped.xyxy[0].astype(int).tolist()
+        self.assertEqual((fx1, fy1, fx2, fy2), (x1 + 150, y1 + 100, x2 + 150, y2 + 100))
+        # Same pixels on the crop and on the frame under the mapped box
+        np.testing.assert_array_equal(crop[y1:y2, x1:x2], frame[fy1:fy2, fx1:fx2])
+
+    def test_boxes_outside_polygon_are_dropped(self):
+        # Both inside the bounding rectangle; only the first one's bottom centre is inside the triangle
+        detections = Detections([[130, 150, 170, 190], [0, 0, 40, 40]], [0.9, 0.8], [2, 7])
+        mapped = self.region.to_frame(detections)
+        self.assertEqual(mapped.cls.tolist(), [2])
+        self.assertEqual(mapped.conf.tolist(), [np.float32(0.9)])
+
+    def test_contains_uses_bottom_centre(self):
+        # Top of the box outside the triangle, bottom centre inside
+        inside = Detections([[280, 120, 320, 280]], [0.9], [2])
+        # Box overlapping the triangle, bottom centre just outside its left edge
+        outside = Detections([[140, 200, 200, 250]], [0.9], [2])
+        self.assertTrue(self.region.contains(inside)[0])
+        self.assertFalse(self.region.contains(outside)[0])
+
+    def test_whole_frame_polygon_keeps_coordinates(self):
+        region = LaneRegion([(0, 0), (1, 0), (1, 1), (0, 1)], FRAME_SHAPE)
+        detections = region.to_frame(Detections([[10, 20, 30, 40]], [0.9], [2]))
+        self.assertEqual(detections.xyxy[0].tolist(), [10, 20, 30, 40])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timezone, timedelta
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rollups import BUCKET_TABLES, MISSING_KEY, aggregate, create_rollup_tables
+
+COLUMNS = ("lane1", "lane2", "lane3", "lane4", "count", "vehicle_type", "action", "priority", "created_at")
+
+def sample(minute, second, lanes, vehicle_type="Cars", action="Normal", priority=False):
+    return (*lanes, sum(lanes), vehicle_type, action, priority,
+            datetime(2025, 3, 1, 10, minute, second, tzinfo=timezone.utc))
+
+def utc(hour, minute=0):
+    return datetime(2025, 3, 1, hour, minute, tzinfo=timezone.utc)
+
+class TestRollupAggregate(unittest.TestCase):
+    def test_batch_is_summed_per_bucket(self):
+        rows = [
+            sample(0, 4, (1, 2, 3, 4)),
+            sample(0, 8, (2, 0, 0, 0), "Buses", "Ambulance", True),
+            sample(1, 0, (0, 0, 5, 0))
+        ]
+        buckets, types, totals = aggregate(COLUMNS, rows)
+
+        minute = buckets["minute"]
+        self.assertEqual(minute[utc(10, 0)], [2, 3, 2, 3, 4, 12, 10, 1, 2, 2, 3, 4])
+        self.assertEqual(minute[utc(10, 1)], [1, 0, 0, 5, 0, 5, 5, 0, 0, 0, 5, 0])
+        self.assertEqual(buckets["hour"], {utc(10): [3, 3, 2, 8, 4, 17, 10, 1, 2, 2, 5, 4]})
+
+        self.assertEqual(types, {(utc(10), "Cars"): 2, (utc(10), "Buses"): 1})
+        self.assertEqual(totals, {("Cars", "Normal", False): 2, ("Buses", "Ambulance", True): 1})
+
+    def test_missing_type_and_action_share_one_bucket(self):
+        row = list(sample(0, 0, (1, 0, 0, 0), vehicle_type=None, action=None))
+        _, types, totals = aggregate(COLUMNS, [row])
+        self.assertEqual(types, {(utc(10), MISSING_KEY): 1})
+        self.assertEqual(totals, {(MISSING_KEY, MISSING_KEY, False): 1})
+
+    def test_buckets_are_utc(self):
+        # 16:15 at +05:30 is 10:45 UTC, so it belongs to the 10:00 UTC hour
+        row = list(sample(0, 0, (1, 0, 0, 0)))
+        row[-1] = datetime(2025, 3, 1, 16, 15, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+        buckets, _, _ = aggregate(COLUMNS, [row])
+        self.assertEqual(list(buckets["hour"]), [utc(10)])
+
+    def test_spilled_rows_use_iso_timestamps(self):
+        row = list(sample(59, 59, (1, 0, 0, 0)))
+        row[-1] = row[-1].isoformat()
+        buckets, _, _ = aggregate(COLUMNS, [row])
+        self.assertEqual(list(buckets["minute"]), [utc(10, 59)])
+
+class SchemaCursor:
+    """Answers the information_schema lookup with `columns` and records every statement"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+    def fetchall(self):
+        return [(column,) for column in self.columns]
+
+    def matching(self, prefix):
+        return [statement for statement in self.statements if statement.startswith(prefix)]
+
+class TestCreateRollupTables(unittest.TestCase):
+    def test_lane_peaks_rebuilt_when_columns_are_added(self):
+        cur = SchemaCursor(["bucket", "samples", "lane1", "lane2", "lane3", "lane4", "vehicles", "max_count",
+                            "ambulance_samples"])
+        self.assertEqual(create_rollup_tables(cur), list(BUCKET_TABLES.values()))
+        self.assertEqual(len(cur.matching("ALTER TABLE traffic_rollup_minute ADD COLUMN")), 4)
+        updates = cur.matching("UPDATE")
+        self.assertEqual(len(updates), 2)
+        self.assertIn("date_trunc('minute', created_at, 'UTC')", updates[0])
+        self.assertIn("UPDATE traffic_rollup_hour", updates[1])
+
+    def test_new_and_current_tables_are_left_alone(self):
+        for columns in ([], ["bucket", "lane1", "lane1_max", "lane2_max", "lane3_max", "lane4_max"]):
+            cur = SchemaCursor(columns)
+            self.assertEqual(create_rollup_tables(cur), [])
+            self.assertEqual(cur.matching("ALTER"), [])
+            self.assertEqual(cur.matching("UPDATE"), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import sys
+import os
+import json
+import threading
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_snapshot import StateSnapshot, event_stream, KEEPALIVE
+
+def make_state(color="red", count=0):
+    return {
+        "traffic_states": {"1": {"color": color, "timer": 10}, "2": {"color": "red", "timer": 20}},
+        "vehicle_counts": {"1": count, "2": 0},
+        "ambulance_status": {"1": False, "2": False}
+    }
+
+class TestStateSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = StateSnapshot(history=3)
+
+    def test_version_only_bumps_on_change(self):
+        self.assertEqual(self.snapshot.publish(make_state()), 1)
+        self.assertEqual(self.snapshot.publish(make_state()), 1)
+        self.assertEqual(self.snapshot.publish(make_state(count=3)), 2)
+
+    def test_matching_etag_is_not_modified(self):
+        self.snapshot.publish(make_state())
+        status, body, etag = self.snapshot.response()
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["version"], self.snapshot.cursor)
+        self.assertEqual(self.snapshot.parse_cursor(json.loads(body)["version"]), 1)
+        self.assertEqual(self.snapshot.response(etag)[:2], (304, b''))
+        self.snapshot.publish(make_state(count=1))
+        self.assertEqual(self.snapshot.response(etag)[0], 200)
+
+    def test_delta_only_has_changed_lanes(self):
+        self.snapshot.publish(make_state())
+        self.snapshot.publish(make_state(color="green", count=4))
+        delta = json.loads(self.snapshot.response(since=1)[1])
+        self.assertTrue(delta["delta"])
+        self.assertEqual((delta["version"], delta["since"]), (self.snapshot.cursor, f"{self.snapshot.epoch}-1"))
+        self.assertEqual(delta["traffic_states"], {"1": {"color": "green", "timer": 10}})
+        self.assertEqual(delta["vehicle_counts"], {"1": 4})
+        self.assertEqual(delta["ambulance_status"], {})
+
+    def test_unknown_since_gets_full_snapshot(self):
+        for count in range(5):
+            self.snapshot.publish(make_state(count=count))
+        for since in (1, 99, None):
+            full = json.loads(self.snapshot.response(since=since)[1])
+            self.assertNotIn("delta", full)
+            self.assertEqual(full["vehicle_counts"], {"1": 4, "2": 0})
+
+    def test_cursor_from_another_process_gets_full_snapshot(self):
+        for count in range(3):
+            self.snapshot.publish(make_state(count=count))
+        # A restarted server numbers its versions from 1 again
+        restarted = StateSnapshot(history=3)
+        for count in range(3):
+            restarted.publish(make_state(color="green", count=count))
+        etag, cursor = self.snapshot.etag, self.snapshot.cursor
+
+        self.assertNotEqual(restarted.etag, etag)
+        self.assertEqual(restarted.response(etag)[0], 200)
+        self.assertIsNone(restarted.parse_cursor(cursor))
+        full = json.loads(restarted.response(etag, restarted.parse_cursor(cursor))[1])
+        self.assertNotIn("delta", full)
+        self.assertEqual(full["traffic_states"]["1"]["color"], "green")
+        _, message = restarted.event(restarted.parse_cursor(cursor))
+        self.assertNotIn(b'"delta"', message)
+
+class TestStateEvents(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = StateSnapshot(history=3)
+        self.snapshot.publish(make_state())
+
+    def parse(self, message):
+        fields = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+        return self.snapshot.parse_cursor(fields["id"]), fields["event"], json.loads(fields["data"])
+
+    def test_first_event_is_full_then_deltas(self):
+        version, message = self.snapshot.event()
+        self.assertEqual(self.parse(message)[:2], (1, "state"))
+        self.snapshot.publish(make_state(count=2))
+        version, message = self.snapshot.event(version)
+        event_id, _, data = self.parse(message)
+        self.assertEqual((event_id, version), (2, 2))
+        self.assertEqual(data["vehicle_counts"], {"1": 2})
+        self.assertEqual(self.snapshot.event(version), (2, None))
+
+    def test_stream_wakes_on_publish(self):
+        stream = event_stream(self.snapshot, since=self.snapshot.parse_cursor(self.snapshot.cursor))
+        listener_calls = []
+        self.snapshot.add_listener(lambda: listener_calls.append(self.snapshot.version))
+        publisher = threading.Timer(0.05, self.snapshot.publish, (make_state(color="green"),))
+        publisher.start()
+        # Already up to date, so the first message is a keepalive; the next arrives with the publish
+        self.assertEqual(next(stream), KEEPALIVE)
+        event_id, _, data = self.parse(next(stream))
+        publisher.join()
+        self.assertEqual(event_id, 2)
+        self.assertEqual(list(data["traffic_states"]), ["1"])
+        self.assertEqual(listener_calls, [2])
+
+    def test_bad_event_id_is_ignored(self):
+        for value in (None, "", "abc", "1", f"{self.snapshot.epoch}-x"):
+            self.assertIsNone(self.snapshot.parse_cursor(value))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import Detections, build_type_table, VEHICLE_TYPES
+from tracker import VehicleTracker, CountingLine, box_iou
+
+VEHICLES = {0: "ambulance", 2: "car", 3: "motorbike", 5: "bus", 7: "truck"}
+FRAME_SIZE = (1000, 1000)
+
+def car_at(y, x=100, class_id=2, conf=0.9):
+    return Detections([[x, y, x + 50, y + 50]], [conf], [class_id])
+
+class TestTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = VehicleTracker(CountingLine((0.0, 0.5), (1.0, 0.5)), build_type_table(VEHICLES))
+
+    def test_box_iou(self):
+        boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float32)
+        iou = box_iou(boxes, boxes)
+        self.assertAlmostEqual(float(iou[0, 0]), 1.0)
+        self.assertAlmostEqual(float(iou[0, 1]), 1 / 3, places=5)
+
+    def test_vehicle_counted_once_when_crossing(self):
+        total = np.zeros(len(VEHICLE_TYPES) + 1, dtype=np.int64)
+        for step in range(20):
+            total += self.tracker.update(car_at(400 + step * 10), step * 0.1, FRAME_SIZE)
+        self.assertEqual(int(total[VEHICLE_TYPES.index("Cars")]), 1)
+        self.assertEqual(int(total.sum()), 1)
+
+    def test_ambulance_follows_track_type(self):
+        self.tracker.update(car_at(300, class_id=0), 0.0, FRAME_SIZE)
+        self.assertTrue(self.tracker.ambulance_present())
+
+        # A car read as an ambulance once keeps its majority type
+        other = VehicleTracker(CountingLine((0.0, 0.5), (1.0, 0.5)), build_type_table(VEHICLES))
+        for step in range(3):
+            other.update(car_at(300), step * 0.5, FRAME_SIZE)
+        other.update(car_at(300, class_id=0), 1.5, FRAME_SIZE)
+        self.assertFalse(other.ambulance_present())
+
+        # Gone from the latest update, though its track is still kept
+        self.tracker.update(Detections.empty(), 0.5, FRAME_SIZE)
+        self.assertEqual(len(self.tracker.tracks), 1)
+        self.assertFalse(self.tracker.ambulance_present())
+
+    def test_parked_vehicle_is_not_counted(self):
+        total = 0
+        for step in range(50):
+            total += int(self.tracker.update(car_at(300), step * 0.5, FRAME_SIZE).sum())
+        self.assertEqual(total, 0)
+        self.assertEqual(self.tracker.queue_length(), 1)
+
+    def test_prediction_bridges_sparse_detections(self):
+        # After a missed detection the car has moved 40 px, too far for plain IoU
+        for step in range(4):
+            self.tracker.update(car_at(100 + step * 20), step * 1.0, FRAME_SIZE)
+        self.tracker.update(Detections.empty(), 4.0, FRAME_SIZE)
+        self.tracker.update(car_at(100 + 5 * 20), 5.0, FRAME_SIZE)
+        self.assertEqual(len(self.tracker.tracks), 1)
+
+    def test_counter_interval_counts_crossing(self):
+        # Detections 3 s apart, the counter's interval: the boxes never overlap
+        tracker = VehicleTracker(CountingLine((0.0, 0.5), (1.0, 0.5)), build_type_table(VEHICLES), max_age=7.5)
+        total = 0
+        for step in range(4):
+            total += int(tracker.update(car_at(300 + step * 180), step * 3.0, FRAME_SIZE).sum())
+        self.assertEqual(total, 1)
+        self.assertEqual(len(tracker.tracks), 1)
+
+    def test_sparse_detections_keep_vehicles_apart(self):
+        tracker = VehicleTracker(CountingLine((0.0, 0.5), (1.0, 0.5)), build_type_table(VEHICLES), max_age=7.5)
+        for step in range(3):
+            y = 200 + step * 150
+            detections = Detections([[100, y, 150, y + 50], [700, y, 750, y + 50]], [0.9, 0.9], [2, 2])
+            tracker.update(detections, step * 3.0, FRAME_SIZE)
+        self.assertEqual(len(tracker.tracks), 2)
+        self.assertEqual(sorted(int(track.box[0]) for track in tracker.tracks), [100, 700])
+
+    def test_distant_detection_starts_new_track(self):
+        self.tracker.update(car_at(100), 0.0, FRAME_SIZE)
+        self.tracker.update(car_at(900, x=900), 0.5, FRAME_SIZE)
+        self.assertEqual(len(self.tracker.tracks), 2)
+
+    def test_low_confidence_only_extends_tracks(self):
+        self.tracker.update(car_at(100, conf=0.3), 0.0, FRAME_SIZE)
+        self.assertEqual(len(self.tracker.tracks), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+from datetime import date, datetime, timezone
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from traffic_schema import partition_name, ensure_partitions, drop_expired_partitions, maintain_partitions
+
+class FakeCursor:
+    """Answers the pg_inherits lookup with `partitions` and records every statement"""
+
+    def __init__(self, partitions=()):
+        self.partitions = list(partitions)
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def fetchall(self):
+        return [(name,) for name in self.partitions]
+
+    def created(self):
+        return [sql.split()[5] for sql, _ in self.statements if sql.startswith("CREATE TABLE")]
+
+    def dropped(self):
+        return [sql.split()[-1] for sql, _ in self.statements if sql.startswith("DROP TABLE")]
+
+class TestPartitions(unittest.TestCase):
+    def test_day_partitions_cover_utc_days(self):
+        cur = FakeCursor()
+        ensure_partitions(cur, date(2025, 2, 28), date(2025, 3, 1))
+        self.assertEqual(cur.created(), ["traffic_data_p20250228", "traffic_data_p20250301"])
+        self.assertEqual(cur.statements[1][1], (datetime(2025, 3, 1, tzinfo=timezone.utc),
+                                                datetime(2025, 3, 2, tzinfo=timezone.utc)))
+
+    def test_only_expired_day_partitions_are_dropped(self):
+        cur = FakeCursor([partition_name(date(2025, 1, day)) for day in (1, 2, 3)] + ["traffic_data_default"])
+        dropped = drop_expired_partitions(cur, retention_days=30, today=date(2025, 2, 2))
+        self.assertEqual(dropped, ["traffic_data_p20250101", "traffic_data_p20250102"])
+        self.assertEqual(cur.dropped(), dropped)
+
+    def test_expired_rows_are_deleted_from_default_partition(self):
+        cur = FakeCursor(["traffic_data_default"])
+        self.assertEqual(drop_expired_partitions(cur, retention_days=30, today=date(2025, 2, 2)), [])
+        deletes = [(sql, params) for sql, params in cur.statements if sql.startswith("DELETE")]
+        self.assertEqual(deletes, [("DELETE FROM traffic_data_default WHERE created_at < %s",
+                                    (datetime(2025, 1, 3, tzinfo=timezone.utc),))])
+
+    def test_maintenance_creates_partitions_ahead(self):
+        cur = FakeCursor()
+        maintain_partitions(cur, today=date(2025, 3, 1))
+        self.assertEqual(cur.created(), [partition_name(date(2025, 2, 28)), partition_name(date(2025, 3, 1)),
+                                         partition_name(date(2025, 3, 2)), partition_name(date(2025, 3, 3))])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from traffic_series import (SeriesCache, SeriesError, invalidate_rows, parse_time, parse_window, query_series,
+                            series_response, MAX_POINTS)
+
+NOW = datetime(2025, 3, 1, 12, 7, 30, tzinfo=timezone.utc)
+
+def utc(hour, minute=0, day=1):
+    return datetime(2025, 3, day, hour, minute, tzinfo=timezone.utc)
+
+class FakeCursor:
+    """Returns one rollup row per bucket of the queried range and records the ranges"""
+
+    def __init__(self):
+        self.ranges = []
+
+    def execute(self, sql, params):
+        self.params = params
+        self.ranges.append((params["start"], params["end"]))
+
+    def fetchall(self):
+        rows, moment = [], self.params["start"]
+        while moment < self.params["end"]:
+            rows.append({"time": moment, "samples": 2, "lane1": 4, "lane2": 0, "lane3": 6, "lane4": 1,
+                         "lane1_max": 3, "lane2_max": 0, "lane3_max": 5, "lane4_max": 1,
+                         "vehicles": 11, "ambulance": 0})
+            moment += self.params["step"]
+        return rows
+
+class TestWindow(unittest.TestCase):
+    def test_window_is_aligned_to_buckets(self):
+        start, end, bucket = parse_window("2025-03-01T10:07:00Z", "2025-03-01T11:52:00+00:00", "15m", NOW)
+        self.assertEqual((start, end, bucket), (utc(10), utc(12), "15m"))
+
+    def test_defaults_to_last_hour(self):
+        start, end, bucket = parse_window(None, None, None, NOW)
+        self.assertEqual((start, end, bucket), (utc(11, 7), utc(12, 8), "1m"))
+
+    def test_long_windows_get_coarser_buckets(self):
+        start, end, bucket = parse_window("2025-02-01T00:00:00Z", "2025-03-01T00:00:00Z", "1m", NOW)
+        self.assertEqual(bucket, "1h")
+        self.assertLessEqual((end - start) / timedelta(hours=1), MAX_POINTS)
+
+    def test_javascript_iso_strings(self):
+        # Date.toISOString(), as sent by static/analytics.js
+        start, end, _ = parse_window("2025-03-01T10:00:00.000Z", "2025-03-01T11:00:00.000Z", "1m", NOW)
+        self.assertEqual((start, end), (utc(10), utc(11)))
+        self.assertEqual(parse_time("2025-03-01T10:00:00z", None), utc(10))
+
+    def test_offset_sent_unencoded(self):
+        start, _, _ = parse_window("2025-03-01T15:30:00 05:30", "2025-03-01T12:00:00Z", "1h", NOW)
+        self.assertEqual(start, utc(10))
+
+    def test_bad_parameters(self):
+        for args in (("yesterday", None, None), ("2025-03-01T12:00:00Z", "2025-03-01T11:00:00Z", None),
+                     (None, None, "2m")):
+            with self.assertRaises(SeriesError):
+                parse_window(*args, now=NOW)
+
+class TestSeriesCache(unittest.TestCase):
+    def test_only_unfinished_buckets_are_queried_again(self):
+        cache, cur = SeriesCache(), FakeCursor()
+        points = query_series(cur, utc(11), utc(12, 15), "15m", cache, NOW)
+        self.assertEqual(len(points), 5)
+        self.assertEqual(points[0]["avg"], [2.0, 0.0, 3.0, 0.5])
+        self.assertEqual(points[0]["max"], [3, 0, 5, 1])
+
+        # 12:00-12:15 was still open, so it is the only bucket fetched again
+        points = query_series(cur, utc(11), utc(12, 15), "15m", cache, NOW + timedelta(minutes=1))
+        self.assertEqual(len(points), 5)
+        self.assertEqual(cur.ranges[-1], (utc(12), utc(12, 15)))
+        self.assertEqual(cache.get_stats()["hits"], 4)
+
+    def test_committed_rows_invalidate_their_buckets(self):
+        cache, cur = SeriesCache(), FakeCursor()
+        query_series(cur, utc(11), utc(12), "15m", cache, NOW)
+        query_series(cur, utc(11), utc(12), "1h", cache, NOW)
+
+        # A row replayed from the spill file for 11:20 drops the 15m and 1h buckets holding it
+        invalidate_rows(("intersection", "created_at"), [("main", "2025-03-01T11:20:00+00:00")], cache)
+        self.assertEqual(cache.get_stats()["invalidated"], 2)
+        query_series(cur, utc(11), utc(12), "15m", cache, NOW)
+        self.assertEqual(cur.ranges[-1], (utc(11, 15), utc(12)))
+        query_series(cur, utc(11), utc(12), "1h", cache, NOW)
+        self.assertEqual(cur.ranges[-1], (utc(11), utc(12)))
+
+    def test_query_overlapping_a_commit_is_not_cached(self):
+        cache, cur = SeriesCache(), FakeCursor()
+        fetchall = cur.fetchall
+
+        def commit_during_query():
+            invalidate_rows(("created_at",), [(utc(11, 5),)], cache)
+            return fetchall()
+
+        cur.fetchall = commit_during_query
+        query_series(cur, utc(11), utc(12), "15m", cache, NOW)
+        self.assertEqual(cache.get_stats()["buckets"], 0)
+
+    def test_response_is_column_oriented(self):
+        points = query_series(FakeCursor(), utc(10), utc(12), "1h", SeriesCache(), NOW)
+        body = series_response(points, {"Cars": 3}, utc(10), utc(12), "1h")
+        self.assertEqual(body["time"], [utc(10).isoformat(), utc(11).isoformat()])
+        self.assertEqual(body["avg"]["Lane3"], [3.0, 3.0])
+        self.assertEqual(body["bucketSeconds"], 3600)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+import itertools
+import cv2
+import numpy as np
+from postprocess import Detections, vehicle_type_ids, OTHER_VEHICLE, EMERGENCY
+
+HIGH_CONFIDENCE = 0.5  # detections that may start tracks (first association pass)
+LOW_CONFIDENCE = 0.1  # weaker detections only keep existing tracks alive (second pass)
+MATCH_IOU = 0.3
+MIN_HITS = 2  # detections before a track is reported
+MAX_TRACK_AGE = 2.0  # seconds a track survives without a matching detection
+MAX_SPEED = 0.15  # frame diagonals per second a vehicle may move between sparse detections
+VELOCITY_SMOOTHING = 0.5
+QUEUE_SPEED = 0.02  # frame diagonals per second; slower tracks count as queued
+FLOW_WIDTH = 320  # frames are downscaled to this width before optical flow
+FLOW_GRID = 3  # points per box side sampled for optical flow
+MAX_LOST_FRACTION = 0.5  # above this share of lost boxes, ask for a fresh detection
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU matrix between two (N, 4) xyxy arrays"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+def greedy_match(iou, threshold):
+    """Pair rows and columns by descending IoU; returns (row, col) pairs above threshold"""
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols])
+    used_rows, used_cols, pairs = set(), set(), []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            pairs.append((row, col))
+    return pairs
+
+class CountingLine:
+    """Segment in normalized frame coordinates; a track centre crossing it is counted once"""
+
+    def __init__(self, start, end):
+        self.start = np.asarray(start, dtype=np.float32)
+        self.end = np.asarray(end, dtype=np.float32)
+
+    def crossed(self, previous, current, frame_size):
+        """Whether the move from `previous` to `current` (pixel centres) crosses the line"""
+        scale = np.asarray(frame_size, dtype=np.float32)
+        a, b = self.start * scale, self.end * scale
+        direction = b - a
+
+        def side(point):
+            offset = point - a
+            return direction[0] * offset[1] - direction[1] * offset[0]
+
+        side_previous, side_current = side(previous), side(current)
+        if side_previous * side_current >= 0:
+            return False
+        # Only count crossings within the segment, not its infinite extension
+        fraction = side_previous / (side_previous - side_current)
+        crossing = previous + fraction * (current - previous)
+        along = np.dot(crossing - a, direction) / max(np.dot(direction, direction), 1e-6)
+        return 0 <= along <= 1
+
+class Track:
+    __slots__ = ("track_id", "box", "velocity", "type_votes", "hits", "last_update", "counted")
+
+    def __init__(self, track_id, box, type_id, timestamp):
+        self.track_id = track_id
+        self.box = box
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.type_votes = np.zeros(OTHER_VEHICLE + 1, dtype=np.int64)
+        self.type_votes[type_id] += 1
+        self.hits = 1
+        self.last_update = timestamp
+        self.counted = False
+
+    @property
+    def type_id(self):
+        return int(np.argmax(self.type_votes))
+
+    @property
+    def center(self):
+        return np.array([(self.box[0] + self.box[2]) / 2, (self.box[1] + self.box[3]) / 2])
+
+    def predict(self, timestamp):
+        return self.box + self.velocity * (timestamp - self.last_update)
+
+class VehicleTracker:
+    """IoU tracker with ByteTrack-style two-pass association and constant-velocity
+    prediction, so tracks survive between sparse detections.
+
+    Detections left over by the IoU passes are matched to the nearest
+    remaining track within MAX_SPEED of its predicted position, which covers
+    detections seconds apart (the counter's interval) where boxes of a
+    moving vehicle no longer overlap.
+
+    `update()` returns the number of new line crossings per vehicle type, which
+    makes counts true throughput instead of re-counting every box every frame.
+    """
+
+    def __init__(self, counting_line, type_table, max_age=MAX_TRACK_AGE):
+        self.counting_line = counting_line
+        self.type_table = type_table
+        self.max_age = max_age
+        self.tracks = []
+        self.ids = itertools.count(1)
+        self.frame_size = (1, 1)
+        self.timestamp = None
+
+    def update(self, detections, timestamp, frame_size):
+        """Associate one frame of detections; returns per-type crossing counts (array)"""
+        self.frame_size = frame_size
+        self.timestamp = timestamp
+        crossings = np.zeros(OTHER_VEHICLE + 1, dtype=np.int64)
+        type_ids = vehicle_type_ids(detections, self.type_table)
+        keep = type_ids >= 0
+        detections, type_ids = detections[keep], type_ids[keep]
+
+        predicted = np.array([track.predict(timestamp) for track in self.tracks], dtype=np.float32).reshape(-1, 4)
+        unmatched_tracks = list(range(len(self.tracks)))
+        high = np.flatnonzero(detections.conf >= HIGH_CONFIDENCE)
+        low = np.flatnonzero((detections.conf >= LOW_CONFIDENCE) & (detections.conf < HIGH_CONFIDENCE))
+
+        matches = []
+        unmatched_high = high
+        for candidates in (high, low):
+            if len(candidates) == 0 or not unmatched_tracks:
+                continue
+            iou = box_iou(predicted[unmatched_tracks], detections.xyxy[candidates])
+            pairs = greedy_match(iou, MATCH_IOU)
+            matches.extend((unmatched_tracks[row], candidates[col]) for row, col in pairs)
+            matched_rows = {row for row, _ in pairs}
+            if candidates is high:
+                matched_cols = {col for _, col in pairs}
+                unmatched_high = np.array([det for col, det in enumerate(high) if col not in matched_cols], dtype=np.int64)
+            unmatched_tracks = [track for row, track in enumerate(unmatched_tracks) if row not in matched_rows]
+
+        if len(unmatched_high) and unmatched_tracks:
+            pairs = greedy_match(self._distance_score(predicted[unmatched_tracks], unmatched_tracks,
+                                                      detections.xyxy[unmatched_high], timestamp), 0)
+            matches.extend((unmatched_tracks[row], unmatched_high[col]) for row, col in pairs)
+            matched_cols = {col for _, col in pairs}
+            unmatched_high = np.array([det for col, det in enumerate(unmatched_high) if col not in matched_cols],
+                                      dtype=np.int64)
+
+        for track_index, det_index in matches:
+            track = self.tracks[track_index]
+            previous_center = track.center
+            box = detections.xyxy[det_index]
+            elapsed = timestamp - track.last_update
+            if elapsed > 0:
+                velocity = (box - track.box) / elapsed
+                track.velocity = VELOCITY_SMOOTHING * velocity + (1 - VELOCITY_SMOOTHING) * track.velocity
+            track.box = box
+            track.type_votes[type_ids[det_index]] += 1
+            track.hits += 1
+            track.last_update = timestamp
+            if (not track.counted and track.hits >= MIN_HITS
+                    and self.counting_line.crossed(previous_center, track.center, frame_size)):
+                track.counted = True
+                crossings[track.type_id] += 1
+
+        for det_index in unmatched_high.tolist():
+            self.tracks.append(Track(next(self.ids), detections.xyxy[det_index], type_ids[det_index], timestamp))
+
+        self.tracks = [track for track in self.tracks if timestamp - track.last_update <= self.max_age]
+        return crossings
+
+    def _distance_score(self, predicted, track_indices, boxes, timestamp):
+        """1 for a detection centred on a track's prediction, down to 0 at the farthest it could have moved"""
+        elapsed = np.array([timestamp - self.tracks[index].last_update for index in track_indices], dtype=np.float32)
+        reach = np.maximum(MAX_SPEED * float(np.hypot(*self.frame_size)) * elapsed, 1e-6)
+        predicted_centers = (predicted[:, :2] + predicted[:, 2:]) / 2
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        distance = np.linalg.norm(predicted_centers[:, None, :] - centers[None, :, :], axis=2)
+        return 1 - distance / reach[:, None]
+
+    def active_tracks(self):
+        return [track for track in self.tracks if track.hits >= MIN_HITS]
+
+    def queue_length(self):
+        """Confirmed tracks that are (nearly) standing still"""
+        diagonal = float(np.hypot(*self.frame_size))
+        queued = 0
+        for track in self.active_tracks():
+            speed = np.hypot(track.velocity[0] + track.velocity[2], track.velocity[1] + track.velocity[3]) / 2
+            if speed / diagonal < QUEUE_SPEED:
+                queued += 1
+        return queued
+
+    def ambulance_present(self):
+        """Whether a track seen in the latest update is an emergency vehicle.
+
+        New tracks count too, so priority is not held back a detection
+        interval, but a track's type is its majority vote: a vehicle misread
+        as an ambulance in one frame does not trigger it.
+        """
+        return any(track.type_id == EMERGENCY for track in self.tracks if track.last_update == self.timestamp)
+
+
+class OpticalFlowPropagator:
+    """Moves the last detected boxes to new frames with sparse Lucas-Kanade
+    optical flow, so the stream can show boxes on frames the detector skipped.
+
+    Each box is shifted by the median motion of a small grid of points inside
+    it; `lost` turns True when too many boxes could not be followed.
+    """
+
+    def __init__(self):
+        self.previous_gray = None
+        self.detections = Detections.empty()
+        self.scale = 1.0
+        self.lost = True
+
+    def _gray(self, frame):
+        height, width = frame.shape[:2]
+        self.scale = min(FLOW_WIDTH / width, 1.0)
+        small = cv2.resize(frame, (int(width * self.scale), int(height * self.scale)),
+                           interpolation=cv2.INTER_AREA) if self.scale < 1.0 else frame
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def reset(self, frame, detections):
+        """Start following `detections`, which were detected on `frame`"""
+        self.previous_gray = self._gray(frame)
+        self.detections = detections
+        self.lost = False
+
+    def _grid_points(self, boxes):
+        steps = (np.arange(FLOW_GRID, dtype=np.float32) + 0.5) / FLOW_GRID
+        fx, fy = np.meshgrid(steps, steps)
+        fx, fy = fx.reshape(1, -1), fy.reshape(1, -1)
+        x = boxes[:, 0:1] + (boxes[:, 2:3] - boxes[:, 0:1]) * fx
+        y = boxes[:, 1:2] + (boxes[:, 3:4] - boxes[:, 1:2]) * fy
+        return np.stack([x, y], axis=-1).astype(np.float32)
+
+    def propagate(self, frame):
+        """Return the boxes moved onto `frame` (unchanged if the flow failed)"""
+        gray = self._gray(frame)
+        if self.previous_gray is None or len(self.detections) == 0 or gray.shape != self.previous_gray.shape:
+            self.previous_gray = gray
+            return self.detections
+
+        boxes = self.detections.xyxy * self.scale
+        points = self._grid_points(boxes)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, points.reshape(-1, 1, 2), None)
+        self.previous_gray = gray
+
+        shift = (moved.reshape(points.shape) - points)
+        valid = status.reshape(points.shape[:2]).astype(bool)
+        shift[~valid] = np.nan
+        tracked = valid.any(axis=1)
+        median = np.zeros((len(boxes), 2), dtype=np.float32)
+        if tracked.any():
+            median[tracked] = np.nanmedian(shift[tracked], axis=1)
+        self.lost = (~tracked).mean() > MAX_LOST_FRACTION
+
+        offsets = np.tile(median / self.scale, 2)
+        self.detections = Detections(self.detections.xyxy + offsets, self.detections.conf, self.detections.cls)
+        return self.detections
@@ -0,0 +1,152 @@
+"""traffic_data as a time-series table: one partition per UTC day.
+
+    created_at      TIMESTAMPTZ, the partition key (samples are stored in UTC)
+    intersection    which controller wrote the row (INTERSECTION_ID)
+    processing_ms   NUMERIC latency instead of "50ms" strings
+    priority        BOOLEAN instead of "TRUE"/"FALSE" strings
+
+Partitions are created a few days ahead and dropped once older than
+TRAFFIC_RETENTION_DAYS by `maintain_partitions()`, which the app runs at
+startup and then every MAINTENANCE_INTERVAL. Dropping a partition is a
+metadata operation, not a DELETE; the rollup tables keep the aggregated
+history. Rows outside every day partition (clock skew, or late rows for
+a day that never had a partition) land in traffic_data_default, where the
+expired ones are deleted instead.
+
+`migrate_legacy_table()` converts the original unpartitioned VARCHAR
+table in place, in the caller's transaction.
+"""
+from datetime import datetime, timedelta, timezone
+import os
+import re
+
+RETENTION_DAYS = int(os.environ.get("TRAFFIC_RETENTION_DAYS", 30))
+PARTITION_DAYS_AHEAD = 2
+MAINTENANCE_INTERVAL = 3600  # seconds
+PARTITION_PATTERN = re.compile(r"^traffic_data_p(\d{8})$")
+DEFAULT_PARTITION = "traffic_data_default"
+
+def partition_name(day):
+    return f"traffic_data_p{day:%Y%m%d}"
+
+def today_utc():
+    return datetime.now(timezone.utc).date()
+
+def create_traffic_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS traffic_data (
+            id BIGSERIAL,
+            intersection VARCHAR(50) NOT NULL DEFAULT 'main',
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            lane1 INTEGER,
+            lane2 INTEGER,
+            lane3 INTEGER,
+            lane4 INTEGER,
+            count INTEGER,
+            processing_ms NUMERIC(10, 2),
+            vehicle_type VARCHAR(50),
+            vehicle_count INTEGER,
+            precision FLOAT,
+            recall FLOAT,
+            f1_score FLOAT,
+            action VARCHAR(50),
+            priority BOOLEAN NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # Created on the parent, so every partition gets them
+    cur.execute("CREATE INDEX IF NOT EXISTS traffic_data_created_at_idx ON traffic_data (created_at)")
+    cur.execute("""CREATE INDEX IF NOT EXISTS traffic_data_intersection_created_at_idx
+                   ON traffic_data (intersection, created_at)""")
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF traffic_data DEFAULT")
+
+def ensure_partitions(cur, first_day, last_day):
+    """Create the day partitions from first_day to last_day (inclusive) that do not exist yet"""
+    day = first_day
+    while day <= last_day:
+        start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF traffic_data
+            FOR VALUES FROM (%s) TO (%s)
+        """, (start, start + timedelta(days=1)))
+        day += timedelta(days=1)
+
+def list_partitions(cur):
+    """{day: partition name} of the existing day partitions"""
+    cur.execute("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'traffic_data'
+    """)
+    partitions = {}
+    for (name,) in cur.fetchall():
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions[datetime.strptime(match.group(1), "%Y%m%d").date()] = name
+    return partitions
+
+def drop_expired_partitions(cur, retention_days=RETENTION_DAYS, today=None):
+    """Drop day partitions entirely older than the retention window, and delete
+    the default partition's rows from before it; returns the dropped names"""
+    cutoff = (today or today_utc()) - timedelta(days=retention_days)
+    dropped = []
+    for day, name in sorted(list_partitions(cur).items()):
+        if day < cutoff:
+            cur.execute(f"DROP TABLE IF EXISTS {name}")
+            dropped.append(name)
+    cur.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < %s",
+                (datetime(cutoff.year, cutoff.month, cutoff.day, tzinfo=timezone.utc),))
+    return dropped
+
+def maintain_partitions(cur, retention_days=RETENTION_DAYS, today=None):
+    today = today or today_utc()
+    ensure_partitions(cur, today - timedelta(days=1), today + timedelta(days=PARTITION_DAYS_AHEAD))
+    return drop_expired_partitions(cur, retention_days, today)
+
+def is_legacy_table(cur):
+    """True if traffic_data is the original, unpartitioned table"""
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = 'traffic_data' AND relkind IN ('r', 'p')")
+    row = cur.fetchone()
+    return row is not None and row[0] == 'r'
+
+def migrate_legacy_table(cur, derived_tables=()):
+    """Move rows of an unpartitioned traffic_data into the partitioned schema.
+
+    Legacy created_at values are local timestamps and are read in the
+    session time zone. `derived_tables` (the rollups) are dropped so that
+    they are rebuilt from the migrated rows. Returns the number of rows
+    moved, or None if there was nothing to migrate.
+    """
+    if not is_legacy_table(cur):
+        return None
+    cur.execute("ALTER TABLE traffic_data RENAME TO traffic_data_legacy")
+    # Free the names the new table's key and id sequence are created with
+    cur.execute("ALTER INDEX IF EXISTS traffic_data_pkey RENAME TO traffic_data_legacy_pkey")
+    cur.execute("ALTER SEQUENCE IF EXISTS traffic_data_id_seq RENAME TO traffic_data_legacy_id_seq")
+    create_traffic_table(cur)
+
+    cur.execute("""
+        SELECT (MIN(created_at)::timestamptz AT TIME ZONE 'UTC')::date,
+               (MAX(created_at)::timestamptz AT TIME ZONE 'UTC')::date
+        FROM traffic_data_legacy
+    """)
+    first_day, last_day = cur.fetchone()
+    if first_day is not None:
+        ensure_partitions(cur, first_day, last_day)
+    cur.execute("""
+        INSERT INTO traffic_data
+            (created_at, lane1, lane2, lane3, lane4, count, processing_ms, vehicle_type,
+             vehicle_count, precision, recall, f1_score, action, priority)
+        SELECT COALESCE(created_at::timestamptz, now()), lane1, lane2, lane3, lane4, count,
+               NULLIF(regexp_replace(processing_time, '[^0-9.]', '', 'g'), '')::numeric,
+               vehicle_type, vehicle_count, precision, recall, f1_score, action,
+               COALESCE(UPPER(priority) = 'TRUE', FALSE)
+        FROM traffic_data_legacy
+        ORDER BY id
+    """)
+    migrated = cur.rowcount
+    cur.execute("DROP TABLE traffic_data_legacy")
+    for table in derived_tables:
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+    return migrated
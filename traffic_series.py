@@ -0,0 +1,218 @@
+"""Downsampled traffic series for the analytics charts, read from the rollups.
+
+`query_series(cur, start, end, bucket)` returns one point per bucket
+between `start` and `end`, with the average and peak count of each lane,
+the average total, and the ambulance samples. Buckets of less than an hour
+are built from traffic_rollup_minute and longer ones from
+traffic_rollup_hour, so the work depends on the number of buckets, not on
+how many raw rows the window spans. A window that would need more than
+MAX_POINTS buckets is served at the next coarser bucket size.
+
+Buckets that ended more than SETTLE_TIME ago, the writer's flush interval
+plus a margin, are cached per (bucket size, start), and only the buckets
+after the newest cached one are queried again. Rows committed later than
+that, e.g. replayed from the writer's spill file, drop the cached buckets
+they fall into through `invalidate_rows()`, the writer's after_commit hook.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+import re
+from db_writer import FLUSH_INTERVAL
+
+BUCKETS = OrderedDict([("1m", 60), ("5m", 300), ("15m", 900), ("1h", 3600), ("6h", 21600), ("1d", 86400)])
+MAX_POINTS = 1000
+MAX_WINDOW = timedelta(days=400)
+DEFAULT_WINDOW = timedelta(hours=1)
+CACHE_SIZE = 50000  # buckets, a few hundred bytes each
+SETTLE_MARGIN = 30  # seconds for a due batch to be written and committed
+# How long after its end a bucket may still receive rows from the writer's regular batches
+SETTLE_TIME = timedelta(seconds=FLUSH_INTERVAL + SETTLE_MARGIN)
+ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)  # buckets are aligned to UTC midnight
+LANES = ("lane1", "lane2", "lane3", "lane4")
+SERIES_QUERY = """
+    SELECT date_bin(%(step)s, bucket, %(origin)s) AS time,
+           SUM(samples) AS samples,
+           SUM(lane1) AS lane1, SUM(lane2) AS lane2, SUM(lane3) AS lane3, SUM(lane4) AS lane4,
+           MAX(lane1_max) AS lane1_max, MAX(lane2_max) AS lane2_max,
+           MAX(lane3_max) AS lane3_max, MAX(lane4_max) AS lane4_max,
+           SUM(vehicles) AS vehicles, SUM(ambulance_samples) AS ambulance
+    FROM {table}
+    WHERE bucket >= %(start)s AND bucket < %(end)s
+    GROUP BY 1
+    ORDER BY 1
+"""
+TYPES_QUERY = """
+    SELECT vehicle_type, SUM(samples) AS count FROM traffic_type_rollup_hour
+    WHERE bucket >= %(start)s AND bucket < %(end)s
+    GROUP BY vehicle_type
+"""
+
+class SeriesError(ValueError):
+    """Bad from/to/bucket parameters"""
+
+def parse_time(value, default):
+    """ISO 8601 timestamp (naive ones are taken as UTC)"""
+    if not value:
+        return default
+    # A '+' in the UTC offset arrives as a space when the client did not URL-encode it
+    value = re.sub(r" (\d{2}:?\d{2})$", r"+\1", value.strip())
+    # Date.toISOString() ends in 'Z', which fromisoformat() only accepts from Python 3.11
+    value = re.sub(r"[zZ]$", "+00:00", value)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise SeriesError(f"Invalid timestamp: {value}")
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+def parse_window(start, end, bucket, now=None):
+    """(start, end, bucket name) aligned to whole buckets, coarsened to at most MAX_POINTS"""
+    now = now or datetime.now(timezone.utc)
+    end = parse_time(end, now)
+    start = parse_time(start, end - DEFAULT_WINDOW)
+    if start >= end:
+        raise SeriesError("'from' must be before 'to'")
+    if end - start > MAX_WINDOW:
+        raise SeriesError(f"Window is longer than {MAX_WINDOW.days} days")
+    if bucket and bucket not in BUCKETS:
+        raise SeriesError(f"Invalid bucket {bucket}; use one of {', '.join(BUCKETS)}")
+
+    names = list(BUCKETS)
+    index = names.index(bucket) if bucket else 0
+    seconds = (end - start).total_seconds()
+    while index < len(names) - 1 and seconds / BUCKETS[names[index]] > MAX_POINTS:
+        index += 1
+    bucket = names[index]
+    return align(start, bucket), align(end, bucket, up=True), bucket
+
+def align(moment, bucket, up=False):
+    step = BUCKETS[bucket]
+    offset = (moment - ORIGIN).total_seconds()
+    buckets = -(-offset // step) if up else offset // step
+    return ORIGIN + timedelta(seconds=buckets * step)
+
+def _point(row):
+    samples = int(row["samples"] or 0)
+
+    def average(total):
+        return round(float(total) / samples, 2) if samples else None
+
+    return {
+        "time": row["time"],
+        "samples": samples,
+        "avg": [average(row[lane]) for lane in LANES],
+        "max": [int(row[f"{lane}_max"]) for lane in LANES],
+        "vehicles": average(row["vehicles"]),
+        "ambulance": int(row["ambulance"] or 0)
+    }
+
+class SeriesCache:
+    """Points of completed buckets, keyed on (bucket name, bucket start); LRU-bounded.
+
+    `generation` changes on every invalidation, so a query that read the
+    rollups before rows were committed does not cache what it read.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.lock = Lock()
+        self.points = OrderedDict()
+        self.size = size
+        self.generation = 0
+        self.hits = 0
+        self.stored = 0
+        self.invalidated = 0
+
+    def cached_prefix(self, bucket, start, end):
+        """Points of the leading run of cached buckets, the start of the first uncached one and the generation"""
+        step = timedelta(seconds=BUCKETS[bucket])
+        points = []
+        with self.lock:
+            while start < end and (bucket, start) in self.points:
+                point = self.points[(bucket, start)]
+                self.points.move_to_end((bucket, start))
+                if point is not None:
+                    points.append(point)
+                start += step
+                self.hits += 1
+            return points, start, self.generation
+
+    def store(self, bucket, start, end, points, completed_before, generation):
+        """Cache every completed bucket in [start, end), empty ones included, so they are not queried again"""
+        step = timedelta(seconds=BUCKETS[bucket])
+        by_time = {point["time"]: point for point in points}
+        with self.lock:
+            if generation != self.generation:
+                # Rows were committed while this was queried; the points may predate them
+                return
+            moment = start
+            while moment < end and moment + step <= completed_before:
+                self.points[(bucket, moment)] = by_time.get(moment)
+                self.points.move_to_end((bucket, moment))
+                moment += step
+                self.stored += 1
+            while len(self.points) > self.size:
+                self.points.popitem(last=False)
+
+    def invalidate(self, first, last):
+        """Forget the cached buckets of every size that contain a moment in [first, last]"""
+        with self.lock:
+            stale = [key for key in self.points
+                     if key[1] <= last and key[1] + timedelta(seconds=BUCKETS[key[0]]) > first]
+            for key in stale:
+                del self.points[key]
+            self.generation += 1
+            self.invalidated += len(stale)
+
+    def get_stats(self):
+        with self.lock:
+            return {"buckets": len(self.points), "hits": self.hits, "stored": self.stored,
+                    "invalidated": self.invalidated}
+
+series_cache = SeriesCache()
+
+def invalidate_rows(columns, rows, cache=series_cache):
+    """DbWriter after_commit hook: drop the cached buckets a committed batch of traffic_data rows falls into"""
+    index = columns.index("created_at")
+    # Rows replayed from the spill file carry ISO strings
+    moments = [parse_time(row[index], None) if isinstance(row[index], str) else row[index] for row in rows]
+    moments = [moment for moment in moments if moment is not None]
+    if moments:
+        cache.invalidate(min(moments), max(moments))
+
+def query_series(cur, start, end, bucket, cache=series_cache, now=None):
+    """Points for the aligned window [start, end) at `bucket` size; see parse_window()"""
+    now = now or datetime.now(timezone.utc)
+    points, query_start, generation = cache.cached_prefix(bucket, start, end)
+    if query_start < end:
+        table = "traffic_rollup_minute" if BUCKETS[bucket] < 3600 else "traffic_rollup_hour"
+        cur.execute(SERIES_QUERY.format(table=table), {
+            "step": timedelta(seconds=BUCKETS[bucket]),
+            "origin": ORIGIN,
+            "start": query_start,
+            "end": end
+        })
+        fresh = [_point(row) for row in cur.fetchall()]
+        cache.store(bucket, query_start, end, fresh, now - SETTLE_TIME, generation)
+        points.extend(fresh)
+    return points
+
+def query_type_totals(cur, start, end):
+    """Samples per vehicle type in the window, at hour resolution"""
+    cur.execute(TYPES_QUERY, {"start": align(start, "1h"), "end": end})
+    return {row["vehicle_type"]: int(row["count"]) for row in cur.fetchall()}
+
+def series_response(points, types, start, end, bucket):
+    """Column-oriented JSON body, which keeps long series compact"""
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "bucket": bucket,
+        "bucketSeconds": BUCKETS[bucket],
+        "time": [point["time"].isoformat() for point in points],
+        "samples": [point["samples"] for point in points],
+        "avg": {f"Lane{index}": [point["avg"][index - 1] for point in points] for index in range(1, 5)},
+        "max": {f"Lane{index}": [point["max"][index - 1] for point in points] for index in range(1, 5)},
+        "vehicles": [point["vehicles"] for point in points],
+        "ambulance": [point["ambulance"] for point in points],
+        "vehicleTypes": types
+    }
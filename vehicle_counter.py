@@ -1,6 +1,9 @@
 from threading import Thread, Lock
-import cv2
-from detection import model, vehicle_classes
+from detection import vehicle_type_table
+from postprocess import summarize_vehicles, VEHICLE_TYPES
+from lane_pipeline import get_pipeline, stop_pipelines
+from tracker import VehicleTracker, CountingLine, MAX_TRACK_AGE
+from lane_config import COUNTER_DETECTION_INTERVAL, get_counting_line
 import time
 import random
 
@@ -10,8 +13,12 @@ class VehicleCounter:
         self.ambulance_present = {}
         self.lock = Lock()
         self.running = True
-        self.detection_interval = 3
-        self.last_detection_time = {}
+        self.threads = []
+        self.lane_ids = []
+        self.detection_interval = COUNTER_DETECTION_INTERVAL
+        # Tracked per-lane throughput (line crossings) and stationary queue length
+        self.throughput = {}
+        self.queue_lengths = {}
         # Add vehicle type tracking
         self.vehicle_type_counts = {
             "Cars": 0,
@@ -20,21 +27,36 @@ class VehicleCounter:
             "Buses": 0,
             "Emergency": 0
         }
+        # Called whenever a lane's count or ambulance flag changes
+        self.listeners = []
+
+    def add_listener(self, callback):
+        with self.lock:
+            self.listeners.append(callback)
 
     def start_counting(self, video_paths):
         self.threads = []
+        self.lane_ids = list(range(1, len(video_paths) + 1))
         for lane_id, video_path in enumerate(video_paths, 1):
-            self.last_detection_time[lane_id] = 0
             self.ambulance_present[str(lane_id)] = False
             self.counts[str(lane_id)] = 0  # Initialize counts
+            self.throughput[str(lane_id)] = 0
+            self.queue_lengths[str(lane_id)] = 0
             thread = Thread(target=self._count_vehicles, args=(lane_id, video_path))
             thread.daemon = True
             thread.start()
             self.threads.append(thread)
 
     def _count_vehicles(self, lane_id, video_path):
-        cap = cv2.VideoCapture(video_path)
+        # Results come from the shared lane pipeline, so the counter never runs
+        # its own capture or inference alongside the MJPEG viewers
+        pipeline = get_pipeline(lane_id, video_path)
+        token = pipeline.subscribe(self.detection_interval)
+        # Tracks must outlive a missed detection at the counter's interval
+        tracker = VehicleTracker(CountingLine(*get_counting_line(lane_id)), vehicle_type_table,
+                                 max_age=max(MAX_TRACK_AGE, 2.5 * self.detection_interval))
         reset_time = time.time()
+        sequence = 0
         
         while self.running:
             current_time = time.time()
@@ -44,59 +66,43 @@ class VehicleCounter:
                 with self.lock:
                     for vehicle_type in self.vehicle_type_counts:
                         self.vehicle_type_counts[vehicle_type] = 0
+                    self.throughput[str(lane_id)] = 0
                 reset_time = current_time
                 
-            if current_time - self.last_detection_time.get(lane_id, 0) >= self.detection_interval:
-                ret, frame = cap.read()
-                if not ret:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                
-                ambulance_detected = False
-                results = model(frame)
-                vehicle_count = 0
-                
-                # Track vehicle types
-                vehicle_types_detected = {
-                    "Cars": 0,
-                    "Trucks": 0,
-                    "Motorcycles": 0,
-                    "Buses": 0,
-                    "Emergency": 0
-                }
-
-                for r in results:
-                    for box in r.boxes:
-                        class_id = int(box.cls.item())
-                        if class_id in vehicle_classes:
-                            vehicle_count += 1
-                            
-                            # Map class_id to vehicle type
-                            if class_id == 0:  # ambulance
-                                ambulance_detected = True
-                                vehicle_types_detected["Emergency"] += 1
-                            elif class_id == 2:  # car
-                                vehicle_types_detected["Cars"] += 1
-                            elif class_id == 3:  # motorbike
-                                vehicle_types_detected["Motorcycles"] += 1
-                            elif class_id == 5:  # bus
-                                vehicle_types_detected["Buses"] += 1
-                            elif class_id == 7:  # truck
-                                vehicle_types_detected["Trucks"] += 1
+            result = pipeline.wait_for_result(sequence, timeout=1)
+            if result is None:
+                continue
+            sequence = result.sequence
+            if not result.detected:
+                # Propagated boxes are only for display; count on real detections
+                continue
 
-                with self.lock:
-                    self.counts[str(lane_id)] = vehicle_count
-                    self.ambulance_present[str(lane_id)] = ambulance_detected
-                    
-                    # Update vehicle type counts
-                    for vehicle_type, count in vehicle_types_detected.items():
-                        if count > 0:
-                            self.vehicle_type_counts[vehicle_type] += count
-
-                self.last_detection_time[lane_id] = current_time
-                
-            time.sleep(0.1)
-        cap.release()
+            vehicle_count, _, _ = summarize_vehicles(result.detections, vehicle_type_table)
+
+            # Vehicle types are counted once per track when it crosses the
+            # counting line, not once per frame it is visible in
+            height, width = result.frame.shape[:2]
+            crossings = tracker.update(result.detections, result.timestamp, (width, height))
+            queue_length = tracker.queue_length()
+            ambulance_detected = tracker.ambulance_present()
+
+            with self.lock:
+                changed = (self.counts.get(str(lane_id)) != vehicle_count or
+                           self.ambulance_present.get(str(lane_id)) != ambulance_detected)
+                self.counts[str(lane_id)] = vehicle_count
+                self.ambulance_present[str(lane_id)] = ambulance_detected
+                self.queue_lengths[str(lane_id)] = queue_length
+                self.throughput[str(lane_id)] += int(crossings.sum())
+
+                # Update vehicle type counts
+                for vehicle_type, count in zip(VEHICLE_TYPES, crossings.tolist()):
+                    if count > 0:
+                        self.vehicle_type_counts[vehicle_type] += count
+                listeners = list(self.listeners) if changed else []
+
+            for listener in listeners:
+                listener()
+        pipeline.unsubscribe(token)
 
     def get_counts(self):
         with self.lock:
@@ -110,16 +116,29 @@ class VehicleCounter:
         with self.lock:
             return dict(self.vehicle_type_counts)
 
+    def get_throughput(self):
+        with self.lock:
+            return dict(self.throughput)
+
+    def get_queue_lengths(self):
+        with self.lock:
+            return dict(self.queue_lengths)
+
     def stop(self):
+        """Stop counting along with the lane pipelines it started, freeing their frame buses"""
         self.running = False
         for thread in self.threads:
             thread.join()
+        stop_pipelines(self.lane_ids)
 
 vehicle_counter = VehicleCounter()
 
 def start_vehicle_counting(video_paths):
     vehicle_counter.start_counting(video_paths)
 
+def add_counts_listener(callback):
+    vehicle_counter.add_listener(callback)
+
 def get_vehicle_counts():
     return vehicle_counter.get_counts()
 
@@ -129,5 +148,11 @@ def get_ambulance_status():
 def get_vehicle_type_counts():
     return vehicle_counter.get_vehicle_type_counts()
 
+def get_throughput():
+    return vehicle_counter.get_throughput()
+
+def get_queue_lengths():
+    return vehicle_counter.get_queue_lengths()
+
 def stop_vehicle_counting():
     vehicle_counter.stop()
\ No newline at end of file